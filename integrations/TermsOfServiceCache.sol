@@ -0,0 +1,59 @@
+// SPDX-License-Identifier: GPL-3.0
+
+pragma solidity ^0.8.24;
+
+import {ITermsOfService} from "../src/TermsOfService.sol";
+
+/**
+ * Cache terms of service checks of integrating contracts for one transaction.
+ *
+ * - Vaults that check the same sender from several hooks of one transaction,
+ *   e.g. deposit and its internal hooks, call canAddressProceed only once
+ *
+ * - The result is kept in EIP-1153 transient storage of the calling contract,
+ *   keyed by (terms of service contract, sender), and is gone after the transaction
+ *
+ * - Only accepted results are cached, so a sender who signs the terms of service
+ *   later in the same transaction is checked again
+ *
+ * - A terms of service update in the middle of the same transaction is not seen
+ *
+ * Needs solc 0.8.24+ and a chain with the Cancun upgrade.
+ */
+library TermsOfServiceCache {
+
+    // Transient storage slot of (termsOfService, sender) is keccak256(abi.encode(CACHE_NAMESPACE, termsOfService, sender))
+    bytes32 internal constant CACHE_NAMESPACE = keccak256("TermsOfServiceCache");
+
+    function canAddressProceed(ITermsOfService termsOfService, address sender) internal returns (bool accepted) {
+        bytes32 slot = keccak256(abi.encode(CACHE_NAMESPACE, termsOfService, sender));
+        assembly {
+            accepted := tload(slot)
+        }
+        if (!accepted) {
+            accepted = termsOfService.canAddressProceed(sender);
+            if (accepted) {
+                assembly {
+                    tstore(slot, 1)
+                }
+            }
+        }
+    }
+}
+
+/**
+ * Base for contracts that require their callers to have accepted the terms of service.
+ */
+abstract contract TermsOfServiceConsumer {
+
+    ITermsOfService public immutable termsOfService;
+
+    constructor(ITermsOfService _termsOfService) {
+        termsOfService = _termsOfService;
+    }
+
+    modifier onlyTermsOfServiceAccepted() {
+        require(TermsOfServiceCache.canAddressProceed(termsOfService, msg.sender), "Terms of service not accepted");
+        _;
+    }
+}
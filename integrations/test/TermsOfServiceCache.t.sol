@@ -0,0 +1,132 @@
+// SPDX-License-Identifier: GPL-3.0
+
+pragma solidity ^0.8.24;
+
+import "forge-std/Test.sol";
+
+import "@openzeppelin/utils/cryptography/ECDSA.sol";
+
+import {ITermsOfService, TermsOfService} from "../../src/TermsOfService.sol";
+import {TermsOfServiceCache, TermsOfServiceConsumer} from "../TermsOfServiceCache.sol";
+
+/**
+ * Vault running the terms of service check from several hooks of one deposit.
+ */
+contract MockVault is TermsOfServiceConsumer {
+
+    constructor(ITermsOfService _termsOfService) TermsOfServiceConsumer(_termsOfService) {
+    }
+
+    function depositUncached(uint256 hooks) external {
+        for (uint256 i = 0; i < hooks; i++) {
+            require(termsOfService.canAddressProceed(msg.sender), "Terms of service not accepted");
+        }
+    }
+
+    function depositCached(uint256 hooks) external {
+        for (uint256 i = 0; i < hooks; i++) {
+            require(TermsOfServiceCache.canAddressProceed(termsOfService, msg.sender), "Terms of service not accepted");
+        }
+    }
+
+    function deposit() external onlyTermsOfServiceAccepted {
+    }
+
+    function canProceedCached(address sender) external returns (bool) {
+        return TermsOfServiceCache.canAddressProceed(termsOfService, sender);
+    }
+
+    function signBetweenChecks(address signer, bytes32 hash, bytes calldata signature) external returns (bool before, bool afterSigning) {
+        before = TermsOfServiceCache.canAddressProceed(termsOfService, signer);
+        termsOfService.signTermsOfServiceBehalf(signer, hash, signature, "");
+        afterSigning = TermsOfServiceCache.canAddressProceed(termsOfService, signer);
+    }
+
+    function isCached(address sender) external view returns (bool cached) {
+        bytes32 slot = keccak256(abi.encode(TermsOfServiceCache.CACHE_NAMESPACE, termsOfService, sender));
+        assembly {
+            cached := tload(slot)
+        }
+    }
+}
+
+/**
+ * Gas of repeated checks with and without the cache.
+ *
+ * Transient storage and warm storage slots last for the whole test function,
+ * unless each call is run as its own transaction. The integrations profile sets
+ * `isolate = true`, run::
+ *
+ *     FOUNDRY_PROFILE=integrations forge test -vv
+ */
+contract TermsOfServiceCacheTest is Test {
+
+    TermsOfService tos;
+    MockVault vault;
+    bytes32 acceptanceMessageHash;
+    address user;
+    uint256 userKey;
+
+    function setUp() public {
+        tos = new TermsOfService();
+        bytes memory message = "I agree on Terms of Service";
+        acceptanceMessageHash = ECDSA.toEthSignedMessageHash(message);
+        tos.updateTermsOfService(1, acceptanceMessageHash, string(message));
+
+        (user, userKey) = makeAddrAndKey("user");
+        sign(user, userKey);
+
+        vault = new MockVault(tos);
+    }
+
+    function sign(address signer, uint256 key) internal {
+        (uint8 v, bytes32 r, bytes32 s) = vm.sign(key, acceptanceMessageHash);
+        tos.signTermsOfServiceBehalf(signer, acceptanceMessageHash, abi.encodePacked(r, s, v), "");
+    }
+
+    function measure(bool cached, uint256 hooks) internal returns (uint256 gasUsed) {
+        vm.prank(user);
+        uint256 start = gasleft();
+        if (cached) {
+            vault.depositCached(hooks);
+        } else {
+            vault.depositUncached(hooks);
+        }
+        gasUsed = start - gasleft();
+    }
+
+    function test_isolated() public {
+        vault.canProceedCached(user);
+        assertFalse(vault.isCached(user), "Run with --isolate, see foundry.toml");
+    }
+
+    function test_repeatedChecksGas() public {
+        uint256[4] memory hooks = [uint256(1), 2, 4, 8];
+        for (uint256 i = 0; i < hooks.length; i++) {
+            uint256 uncached = measure(false, hooks[i]);
+            uint256 cached = measure(true, hooks[i]);
+            emit log_named_uint(string.concat("uncached, hooks ", vm.toString(hooks[i])), uncached);
+            emit log_named_uint(string.concat("cached, hooks ", vm.toString(hooks[i])), cached);
+            if (hooks[i] > 1) {
+                assertLt(cached, uncached);
+            }
+        }
+    }
+
+    function test_modifier() public {
+        vm.prank(user);
+        vault.deposit();
+
+        vm.prank(makeAddr("stranger"));
+        vm.expectRevert("Terms of service not accepted");
+        vault.deposit();
+    }
+
+    function test_acceptLaterInSameTransaction() public {
+        (address stranger, uint256 strangerKey) = makeAddrAndKey("stranger");
+        (uint8 v, bytes32 r, bytes32 s) = vm.sign(strangerKey, acceptanceMessageHash);
+        (bool before, bool afterSigning) = vault.signBetweenChecks(stranger, acceptanceMessageHash, abi.encodePacked(r, s, v));
+        assertFalse(before);
+        assertTrue(afterSigning);
+    }
+}
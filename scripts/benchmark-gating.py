@@ -0,0 +1,74 @@
+"""Load benchmark for the in-memory acceptance gate.
+
+- Deploys TermsOfService from `terms_of_service/artifacts/LegacyTermsOfService.json` to an in-process eth-tester chain,
+  standing in for a local dev chain. Lookups use the same functions and events on both layouts
+
+- Compares `AcceptanceGate.can_address_proceed` against `canAddressProceed` eth_call
+
+Run::
+
+    python scripts/benchmark-gating.py
+"""
+
+import asyncio
+import json
+import random
+import time
+
+from eth_account import Account
+from web3 import AsyncWeb3
+from web3.providers.eth_tester import AsyncEthereumTesterProvider
+
+from terms_of_service.abi import ABI_PATH
+from terms_of_service.acceptance_message import TRADING_STRATEGY_ACCEPTANCE_MESSAGE, get_signing_hash, sign_terms_of_service
+from terms_of_service.gating import AcceptanceGate
+
+SIGNER_COUNT = 200
+LOOKUP_COUNT = 100_000
+RPC_LOOKUP_COUNT = 500
+
+
+async def main():
+    web3 = AsyncWeb3(AsyncEthereumTesterProvider())
+    # Bytecode of the earlier deployments, the current contract is built with forge and tested with Ape
+    artifact = json.loads((ABI_PATH / "LegacyTermsOfService.json").read_text())
+    Contract = web3.eth.contract(abi=artifact["abi"], bytecode=artifact["bytecode"]["object"])
+    deployer = (await web3.eth.accounts)[0]
+    receipt = await web3.eth.wait_for_transaction_receipt(await Contract.constructor().transact({"from": deployer}))
+    tos = web3.eth.contract(address=receipt["contractAddress"], abi=artifact["abi"])
+
+    message = TRADING_STRATEGY_ACCEPTANCE_MESSAGE.format(version=1, date="2024-03-20")
+    await tos.functions.updateTermsOfService(1, get_signing_hash(message), message).transact({"from": deployer})
+
+    users = [Account.create() for _ in range(SIGNER_COUNT)]
+    for user in users[0:SIGNER_COUNT // 2]:
+        message_hash, signature = sign_terms_of_service(user, message)
+        await tos.functions.signTermsOfServiceBehalf(user.address, message_hash, signature, b"").transact({"from": deployer})
+
+    addresses = [u.address for u in users]
+
+    started = time.perf_counter()
+    gate = AcceptanceGate(web3, tos.address)
+    await gate.start()
+    print(f"Loaded {len(gate.state.accepted):,} signers from logs in {time.perf_counter() - started:.2f} s")
+
+    lookups = random.choices(addresses, k=LOOKUP_COUNT)
+    started = time.perf_counter()
+    for address in lookups:
+        gate.can_address_proceed(address)
+    gate_rate = LOOKUP_COUNT / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for address in lookups[0:RPC_LOOKUP_COUNT]:
+        await tos.functions.canAddressProceed(address).call()
+    rpc_rate = RPC_LOOKUP_COUNT / (time.perf_counter() - started)
+
+    await gate.stop()
+
+    print(f"AcceptanceGate: {gate_rate:,.0f} checks/s")
+    print(f"canAddressProceed eth_call: {rpc_rate:,.0f} checks/s")
+    print(f"Speedup: {gate_rate / rpc_rate:,.0f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
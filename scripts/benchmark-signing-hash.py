@@ -0,0 +1,60 @@
+"""Compare acceptance message hashing throughput.
+
+- :py:func:`get_signing_hash` with the `eth_hash` backend picked at import, as the baseline
+- `eth_account` `encode_defunct` based hashing
+- :py:func:`get_signing_hash` with each installed `eth_hash` backend
+
+Run::
+
+    python scripts/benchmark-signing-hash.py
+"""
+
+import datetime
+import random
+import timeit
+
+from eth_account.messages import _hash_eip191_message, encode_defunct
+from eth_hash.auto import keccak
+from eth_hash.backends import SUPPORTED_BACKENDS
+from eth_hash.main import Keccak256
+from eth_hash.utils import load_backend
+
+from terms_of_service import acceptance_message
+from terms_of_service.acceptance_message import generate_acceptance_message, get_signing_hash
+
+MESSAGE_COUNT = 10_000
+ROUNDS = 5
+
+messages = [
+    generate_acceptance_message(
+        version,
+        datetime.datetime(2024, 1, 1),
+        f"https://example.com/tos/{version}",
+        random.randbytes(32),
+    )
+    for version in range(MESSAGE_COUNT)
+]
+
+
+def measure(func) -> float:
+    """Hashes per second, best of `ROUNDS`."""
+    return MESSAGE_COUNT / min(timeit.repeat(lambda: [func(m) for m in messages], number=1, repeat=ROUNDS))
+
+
+baseline = measure(get_signing_hash)
+default_backend = type(keccak.hasher.__self__).__name__
+results = {"eth_account": measure(lambda m: _hash_eip191_message(encode_defunct(text=m)))}
+
+for name in SUPPORTED_BACKENDS:
+    try:
+        backend = Keccak256(load_backend(name))
+    except ImportError:
+        continue
+    acceptance_message._get_keccak = lambda: backend
+    assert get_signing_hash(messages[0]) == _hash_eip191_message(encode_defunct(text=messages[0]))
+    results[f"get_signing_hash, {name}"] = measure(get_signing_hash)
+
+print(f"Messages: {MESSAGE_COUNT:,}")
+print(f"get_signing_hash, {default_backend} (baseline): {baseline:,.0f} hashes/s")
+for name, rate in results.items():
+    print(f"{name}: {rate:,.0f} hashes/s, {rate / baseline:.2f}x baseline")
@@ -0,0 +1,262 @@
+"""Benchmark suite for TermsOfService and the Python helpers.
+
+- Gas used by every public function of `TermsOfService.sol`: cold and warm accounts,
+  EOA and EIP-1271 signers, different metadata sizes and batch sizes
+
+- Wall-clock throughput of acceptance message generation, hashing and signing,
+  and of checking acceptances of many addresses per address and with the batch views
+
+- Accounts, hashes and metadata are fixed, so gas numbers of two runs of the same commit are equal
+  and any gas difference between commits comes from the contract
+
+- Writes a JSON report, to be compared between commits with `scripts/compare-benchmarks.py`
+
+Run on the local test network::
+
+    BENCHMARK_REPORT=benchmark-report.json ape run benchmark
+
+The baseline report must come from a commit that has this script,
+e.g. the commit your branch starts from, checked out in a separate worktree::
+
+    git worktree add ../tos-baseline <baseline-commit>
+    (cd ../tos-baseline && BENCHMARK_REPORT=$OLDPWD/benchmark-baseline.json ape run benchmark)
+    python scripts/compare-benchmarks.py benchmark-baseline.json benchmark-report.json
+"""
+
+import datetime
+import json
+import os
+import platform
+import subprocess
+import timeit
+
+from ape import accounts, chain, project
+from ape.contracts import ContractContainer
+from eth_account import Account
+from eth_account.messages import encode_typed_data
+from ethpm_types import ContractType
+from hexbytes import HexBytes
+
+from terms_of_service.acceptance_message import generate_acceptance_message, get_signing_hash, get_typed_acceptance_data, sign_terms_of_service
+from terms_of_service.bulk_check import check_addresses, check_addresses_batch
+from terms_of_service.bulk_signing import generate_private_keys
+from terms_of_service.merkle import AcceptanceMerkleTree
+
+#: EIP-1271 wallet accepting any signature: `isValidSignature` always returns the magic value
+MOCK_ERC1271_WALLET = ContractContainer(ContractType.model_validate({
+    "contractName": "MockERC1271Wallet",
+    "deploymentBytecode": {"bytecode": "0x6010600c60003960106000f3631626ba7e60e01b60005260206000f3"},
+    "runtimeBytecode": {"bytecode": "0x631626ba7e60e01b60005260206000f3"},
+    "abi": [],
+}))
+
+METADATA_SIZES = [0, 32, 256, 1024]
+
+BATCH_SIZES = [1, 10, 50]
+
+#: How many times each Python helper is called per round
+THROUGHPUT_CALLS = 2_000
+
+THROUGHPUT_ROUNDS = 5
+
+#: How many addresses are checked per round in the bulk check throughput, counted as calls
+BULK_CHECK_ADDRESSES = 500
+
+#: Terms of service text hash, fixed so messages, signatures and calldata gas are the same on every run
+TEXT_HASH = b"\x5a" * 32
+
+
+def make_message(version: int) -> str:
+    return generate_acceptance_message(
+        version,
+        datetime.datetime(2024, 1, 1),
+        "https://example.com/terms-of-service",
+        TEXT_HASH,
+    )
+
+
+def make_users(count: int, seed: int) -> list:
+    """Seeded accounts, a different seed for each group so the groups do not share accounts."""
+    return [Account.from_key(key) for key in generate_private_keys(count, seed)]
+
+
+def make_metadata(size: int) -> bytes:
+    # Non-zero bytes, calldata gas depends on the zero byte count
+    return b"\xab" * size
+
+
+def benchmark_gas() -> dict[str, int]:
+    deployer = accounts.test_accounts[0]
+    relayer = accounts.test_accounts[1]
+    gas = {}
+
+    tos = deployer.deploy(project.TermsOfService)
+    gas["deploy"] = tos.receipt.gas_used
+
+    # Version 1 writes latestAcceptanceMessageHash from zero, later versions overwrite it
+    message_1 = make_message(1)
+    hash_1 = get_signing_hash(message_1)
+    gas["updateTermsOfService:first"] = tos.updateTermsOfService(1, hash_1, message_1, sender=deployer).gas_used
+
+    # Accounts that have never signed anything write a new bitmap slot
+    for user, size in zip(make_users(len(METADATA_SIZES), seed=1), METADATA_SIZES):
+        message_hash, signature = sign_terms_of_service(user, message_1)
+        tx = tos.signTermsOfServiceBehalf(user.address, message_hash, signature, make_metadata(size), sender=relayer)
+        gas[f"signTermsOfServiceBehalf:eoa:cold:metadata_{size}"] = tx.gas_used
+
+    wallet = deployer.deploy(MOCK_ERC1271_WALLET)
+    gas["signTermsOfServiceBehalf:eip1271:cold"] = tos.signTermsOfServiceBehalf(wallet.address, hash_1, b"\x01" * 65, b"", sender=relayer).gas_used
+
+    own = accounts.test_accounts[2]
+    signature = own.sign_message(message_1).encode_rsv()
+    gas["signTermsOfServiceOwn:eoa:cold"] = tos.signTermsOfServiceOwn(hash_1, signature, b"", sender=own).gas_used
+
+    batch_users = {}
+    for size in BATCH_SIZES:
+        users = batch_users[size] = make_users(size, seed=100 + size)
+        signed = [sign_terms_of_service(u, message_1) for u in users]
+        tx = tos.signTermsOfServiceBehalfBatch([u.address for u in users], hash_1, [s for _, s in signed], [b""] * size, sender=relayer)
+        gas[f"signTermsOfServiceBehalfBatch:eoa:cold:batch_{size}"] = tx.gas_used
+        gas[f"signTermsOfServiceBehalfBatch:eoa:cold:batch_{size}:per_signer"] = tx.gas_used // size
+
+    message_2 = make_message(2)
+    hash_2 = get_signing_hash(message_2)
+    gas["updateTermsOfService:later"] = tos.updateTermsOfService(2, hash_2, message_2, sender=deployer).gas_used
+
+    # Accounts that signed version 1 already have a non-zero bitmap slot
+    warm_user = batch_users[BATCH_SIZES[-1]][0]
+    message_hash, signature = sign_terms_of_service(warm_user, message_2)
+    gas["signTermsOfServiceBehalf:eoa:warm"] = tos.signTermsOfServiceBehalf(warm_user.address, message_hash, signature, b"", sender=relayer).gas_used
+    gas["signTermsOfServiceBehalf:eip1271:warm"] = tos.signTermsOfServiceBehalf(wallet.address, hash_2, b"\x01" * 65, b"", sender=relayer).gas_used
+    signature = own.sign_message(message_2).encode_rsv()
+    gas["signTermsOfServiceOwn:eoa:warm"] = tos.signTermsOfServiceOwn(hash_2, signature, b"", sender=own).gas_used
+
+    users = batch_users[BATCH_SIZES[-1]][1:11]
+    signed = [sign_terms_of_service(u, message_2) for u in users]
+    tx = tos.signTermsOfServiceBehalfBatch([u.address for u in users], hash_2, [s for _, s in signed], [b""] * len(users), sender=relayer)
+    gas["signTermsOfServiceBehalfBatch:eoa:warm:batch_10"] = tx.gas_used
+
+    # Signers who have already signed are skipped
+    tx = tos.signTermsOfServiceBehalfBatch([u.address for u in users], hash_2, [s for _, s in signed], [b""] * len(users), sender=relayer)
+    gas["signTermsOfServiceBehalfBatch:already_signed:batch_10"] = tx.gas_used
+
+    # Views, as eth_call gas estimates
+    signer = warm_user.address
+    gas["canAddressProceed"] = tos.canAddressProceed.estimate_gas_cost(signer)
+    gas["canProceed"] = tos.canProceed.estimate_gas_cost(sender=own)
+    gas["hasAcceptedHash"] = tos.hasAcceptedHash.estimate_gas_cost(signer, hash_1)
+    gas["hasAcceptedVersion"] = tos.hasAcceptedVersion.estimate_gas_cost(signer, 1)
+    gas["acceptances"] = tos.acceptances.estimate_gas_cost(signer, hash_1)
+    gas["acceptedVersions"] = tos.acceptedVersions.estimate_gas_cost(signer, 0)
+    gas["getTextHash"] = tos.getTextHash.estimate_gas_cost(1)
+    gas["versions"] = tos.versions.estimate_gas_cost(1)
+    gas["latestTermsOfServiceVersion"] = tos.latestTermsOfServiceVersion.estimate_gas_cost()
+    gas["latestAcceptanceMessageHash"] = tos.latestAcceptanceMessageHash.estimate_gas_cost()
+    gas["owner"] = tos.owner.estimate_gas_cost()
+    gas["ACCEPTANCE_TYPEHASH"] = tos.ACCEPTANCE_TYPEHASH.estimate_gas_cost()
+    gas["eip712Domain"] = tos.eip712Domain.estimate_gas_cost()
+
+    # Batch views, compare per_address to canAddressProceed
+    batch_addresses = [u.address for u in batch_users[BATCH_SIZES[-1]]]
+    gas[f"canAddressesProceed:batch_{len(batch_addresses)}"] = batch_gas = tos.canAddressesProceed.estimate_gas_cost(batch_addresses)
+    gas[f"canAddressesProceed:batch_{len(batch_addresses)}:per_address"] = batch_gas // len(batch_addresses)
+    gas[f"hasAcceptedVersionBatch:batch_{len(batch_addresses)}"] = tos.hasAcceptedVersionBatch.estimate_gas_cost(batch_addresses, 1)
+
+    # EIP-712 typed version, compared to the free text updateTermsOfService:later
+    typed_data = get_typed_acceptance_data(3, TEXT_HASH, datetime.datetime(2024, 1, 1), "https://example.com/terms-of-service", chain.chain_id, tos.address)
+    typed_args = (3, typed_data["message"]["textHash"], typed_data["message"]["date"], HexBytes(typed_data["message"]["linkHash"]))
+    gas["getTypedAcceptanceHash"] = tos.getTypedAcceptanceHash.estimate_gas_cost(*typed_args)
+    gas["updateTermsOfServiceTyped"] = tos.updateTermsOfServiceTyped(*typed_args, sender=deployer).gas_used
+    signature = own.sign_message(encode_typed_data(full_message=typed_data)).encode_rsv()
+    gas["signTermsOfServiceOwn:eoa:warm:typed"] = tos.signTermsOfServiceOwn(tos.latestAcceptanceMessageHash(), signature, b"", sender=own).gas_used
+
+    # Off-chain acceptances attested with a Merkle root
+    tree = AcceptanceMerkleTree((u.address, tos.latestAcceptanceMessageHash()) for u in batch_users[BATCH_SIZES[-1]])
+    proof = tree.get_proof(batch_users[BATCH_SIZES[-1]][0].address, tos.latestAcceptanceMessageHash())
+    gas["addAttestationRoot"] = tos.addAttestationRoot(tree.root, sender=deployer).gas_used
+    gas["attestationRoots"] = tos.attestationRoots.estimate_gas_cost(tree.root)
+    gas["hasAttestedHash"] = tos.hasAttestedHash.estimate_gas_cost(batch_users[BATCH_SIZES[-1]][0].address, tos.latestAcceptanceMessageHash(), tree.root, proof)
+    gas[f"canAddressProceedWithProof:leaves_{len(tree)}"] = tos.canAddressProceedWithProof.estimate_gas_cost(batch_users[BATCH_SIZES[-1]][0].address, tree.root, proof)
+    gas["removeAttestationRoot"] = tos.removeAttestationRoot(tree.root, sender=deployer).gas_used
+
+    # Migrate all version 1 and 2 signers to a new deployment
+    migrated = deployer.deploy(project.TermsOfService)
+    migrated.updateTermsOfService(1, hash_1, message_1, sender=deployer)
+    migrated.updateTermsOfService(2, hash_2, message_2, sender=deployer)
+    tx = migrated.importAcceptances(tos.address, [u.address for u in batch_users[BATCH_SIZES[-1]]], sender=deployer)
+    gas[f"importAcceptances:batch_{BATCH_SIZES[-1]}"] = tx.gas_used
+
+    gas["transferOwnership"] = migrated.transferOwnership(relayer, sender=deployer).gas_used
+    gas["renounceOwnership"] = migrated.renounceOwnership(sender=relayer).gas_used
+
+    # Fail loudly when a new public function is added without a benchmark
+    benchmarked = {name.split(":")[0] for name in gas}
+    functions = {abi.name for abi in project.TermsOfService.contract_type.abi if abi.type == "function"}
+    missing = functions - benchmarked
+    assert not missing, f"Functions without gas benchmark: {missing}"
+
+    return gas
+
+
+def benchmark_bulk_check() -> dict[str, float]:
+    """Addresses checked per second with the per-address and the batch view paths, best of rounds."""
+    deployer = accounts.test_accounts[0]
+    web3 = chain.provider.web3
+    tos = deployer.deploy(project.TermsOfService)
+    message = make_message(1)
+    tos.updateTermsOfService(1, get_signing_hash(message), message, sender=deployer)
+    addresses = [u.address for u in make_users(BULK_CHECK_ADDRESSES, seed=2)]
+
+    # No Multicall3 on the local test network, so check_addresses makes one eth_call per address
+    cases = {
+        "check_addresses": lambda: check_addresses(web3, tos.address, addresses),
+        "check_addresses_batch": lambda: check_addresses_batch(web3, tos.address, addresses),
+    }
+
+    return {
+        f"{name}:addresses_{BULK_CHECK_ADDRESSES}": BULK_CHECK_ADDRESSES / min(timeit.repeat(func, number=1, repeat=THROUGHPUT_ROUNDS))
+        for name, func in cases.items()
+    }
+
+
+def benchmark_throughput() -> dict[str, float]:
+    """Calls per second of the Python helpers, best of rounds."""
+    user = make_users(1, seed=3)[0]
+    message = make_message(1)
+    date = datetime.datetime(2024, 1, 1)
+    hash = TEXT_HASH
+
+    cases = {
+        "generate_acceptance_message": lambda: generate_acceptance_message(1, date, "https://example.com/terms-of-service", hash),
+        "get_signing_hash": lambda: get_signing_hash(message),
+        "sign_terms_of_service": lambda: sign_terms_of_service(user, message),
+    }
+
+    return {
+        name: THROUGHPUT_CALLS / min(timeit.repeat(func, number=THROUGHPUT_CALLS, repeat=THROUGHPUT_ROUNDS))
+        for name, func in cases.items()
+    }
+
+
+def main():
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    report = {
+        "commit": commit,
+        "python": platform.python_version(),
+        "gas": benchmark_gas(),
+        "throughput": benchmark_throughput() | benchmark_bulk_check(),
+    }
+
+    output = os.environ.get("BENCHMARK_REPORT", "benchmark-report.json")
+    with open(output, "wt") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+    for name, value in sorted(report["gas"].items()):
+        print(f"{name}: {value:,} gas")
+    for name, value in sorted(report["throughput"].items()):
+        print(f"{name}: {value:,.0f} calls/s")
+    print(f"Report written to {output}")
@@ -0,0 +1,62 @@
+"""Compare two benchmark reports written by `scripts/benchmark.py`.
+
+- Any gas increase is a regression
+
+- Throughput drop larger than `--tolerance` is a regression, as wall-clock numbers are noisy
+
+Exits with status 1 if there are regressions.
+
+The baseline report must be written by `scripts/benchmark.py` of an earlier commit that has it,
+see the module docstring there. Commits made before the benchmark suite have no report to compare against.
+
+Run::
+
+    python scripts/compare-benchmarks.py benchmark-baseline.json benchmark-report.json
+"""
+
+import argparse
+import json
+import sys
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare benchmark reports")
+    parser.add_argument("baseline", help="Report of the earlier commit")
+    parser.add_argument("current", help="Report of the commit under test")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative throughput drop")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    print(f"Comparing {baseline.get('commit')} -> {current.get('commit')}")
+    regressions = []
+
+    for name in sorted(baseline["gas"].keys() | current["gas"].keys()):
+        old = baseline["gas"].get(name)
+        new = current["gas"].get(name)
+        if old is None or new is None:
+            print(f"{name}: {old} -> {new}")
+            continue
+        if new != old:
+            print(f"{name}: {old:,} -> {new:,} gas ({new - old:+,})")
+        if new > old:
+            regressions.append(name)
+
+    for name in sorted(baseline["throughput"].keys() & current["throughput"].keys()):
+        old = baseline["throughput"][name]
+        new = current["throughput"][name]
+        change = new / old - 1
+        print(f"{name}: {old:,.0f} -> {new:,.0f} calls/s ({change:+.1%})")
+        if change < -args.tolerance:
+            regressions.append(name)
+
+    if regressions:
+        print(f"Regressions: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,83 +1,162 @@
-"""Update terms of service"""
+"""Update terms of service on all chains at once.
 
-import os
-import json
-import sys
-from pathlib import Path
-from terms_of_service.acceptance_message import TRADING_STRATEGY_ACCEPTANCE_MESSAGE, get_signing_hash
-from web3 import Web3, HTTPProvider
-from web3.middleware import geth_poa_middleware, construct_sign_and_send_raw_middleware
-from eth_account import Account
-
-
-def get_abi_by_filename(fname: str) -> dict:
-    """Reads a embedded ABI file and returns it.
-
-    Example::
-
-        abi = get_abi_by_filename("ERC20Mock.json")
-
-    You are most likely interested in the keys `abi` and `bytecode` of the JSON file.
-
-    Loaded ABI files are cache in in-process memory to speed up future loading.
+- Connects to all chains concurrently, prepares and signs `updateTermsOfService`
+  for each chain and waits for all receipts together
 
-    Any results are cached.
+- Chains and contract addresses come from :py:mod:`terms_of_service.deployments`
 
-    :param web3: Web3 instance
-    :param fname: `JSON filename from supported contract lists <https://github.com/tradingstrategy-ai/web3-ethereum-defi/tree/master/eth_defi/abi>`_.
-    :return: Full contract interface, including `bytecode`.
-    """
+- TOS version is automatically picked from the smart contract of each chain
 
-    here = Path(__file__).resolve().parent
-    abi_path = here / ".." / "abi" / Path(fname)
-    with open(abi_path, "rt", encoding="utf-8") as f:
-        abi = json.load(f)
-    return abi["abi"]
+Example::
 
+    export TOS_DATE=2024-03-20
+    export DEPLOY_PRIVATE_KEY=
+    export JSON_RPC_POLYGON=
+    export JSON_RPC_ETHEREUM=
+    python scripts/update.py polygon ethereum
 
-assert os.environ.get("DEPLOY_PRIVATE_KEY"), "Set DEPLOY_PRIVATE_KEY env"
-assert os.environ.get("JSON_RPC_POLYGON"), "Set JSON_RPC_POLYGON env"
-assert os.environ.get("CONTRACT_ADDRESS"), "Set $CONTRACT_ADDRESS env"
-assert os.environ.get("TOS_DATE"), "Set $TOS_DATE env"
+Run without chain arguments to update all chains.
 
-web3 = Web3(HTTPProvider(os.environ["JSON_RPC_POLYGON"]))
-account = Account.from_key(os.environ["DEPLOY_PRIVATE_KEY"])
-web3.middleware_onion.add(construct_sign_and_send_raw_middleware(account))
-web3.middleware_onion.inject(geth_poa_middleware, layer=0)
+Set `CONTRACT_ADDRESS` to update a contract not listed in the deployments, e.g. a fresh test deployment.
+It needs exactly one chain argument.
+"""
 
-abi = get_abi_by_filename("TermsOfService.json")
-Contract = web3.eth.contract(abi=abi)
-contract = Contract(os.environ["CONTRACT_ADDRESS"])
-
-current_version = contract.functions.latestTermsOfServiceVersion().call()
-version = current_version + 1
-
-date = os.environ["TOS_DATE"]
-new_line_escaped_msg = TRADING_STRATEGY_ACCEPTANCE_MESSAGE.format(
-    version=version,
-    date=date,
-)
-
-acceptance_message_hash = get_signing_hash(new_line_escaped_msg)
-acceptance_message = f"{new_line_escaped_msg}"
-terms_of_service_version = str(version)
-gas = web3.eth.get_balance(account.address) / 10**18
-
-new_line = "\n"
-escaped_new_line = "\\n"
-
-print(f"Deployer: {account.address}")
-print(f"Contract: {contract.address}")
-print(f"Acceptance message: {acceptance_message.replace(new_line, escaped_new_line)}")
-print(f"Acceptance hash: {acceptance_message_hash.hex()}")
-print(f"Version: {version}")
-print(f"Date: {date}")
-print(f"Gas balance: {gas}")
+import argparse
+import asyncio
+import dataclasses
+import os
+import sys
 
-confirm = input("Confirm send tx [y/n] ")
-if confirm != "y":
-    sys.exit(1)
+from eth_account import Account
+from eth_account.signers.local import LocalAccount
+from web3 import AsyncHTTPProvider, AsyncWeb3
+from web3.middleware import async_geth_poa_middleware
 
-tx_hash = contract.functions.updateTermsOfService(version, acceptance_message_hash, acceptance_message).transact({"from": account.address})
-print("Confirming ", tx_hash.hex())
-web3.eth.wait_for_transaction_receipt(tx_hash)
+from terms_of_service.abi import get_contract
+from terms_of_service.acceptance_message import TRADING_STRATEGY_ACCEPTANCE_MESSAGE, get_signing_hash
+from terms_of_service.deployments import DEPLOYMENTS, Deployment
+
+
+async def prepare(deployment: Deployment, account: LocalAccount, date: str) -> dict:
+    """Read the current version and sign the update transaction for one chain."""
+    web3 = AsyncWeb3(AsyncHTTPProvider(os.environ[deployment.json_rpc_env]))
+    if deployment.poa:
+        web3.middleware_onion.inject(async_geth_poa_middleware, layer=0)
+
+    contract = get_contract(web3, deployment.address)
+
+    try:
+        current_version, nonce, balance, chain_id = await asyncio.gather(
+            contract.functions.latestTermsOfServiceVersion().call(),
+            web3.eth.get_transaction_count(account.address),
+            web3.eth.get_balance(account.address),
+            web3.eth.chain_id,
+        )
+    except Exception as e:
+        raise RuntimeError(f"Could not read contract {contract.address} on {deployment.name}") from e
+
+    assert chain_id == deployment.chain_id, f"{deployment.json_rpc_env} points to chain {chain_id}, expected {deployment.chain_id}"
+
+    version = current_version + 1
+    acceptance_message = TRADING_STRATEGY_ACCEPTANCE_MESSAGE.format(
+        version=version,
+        date=date,
+    )
+    acceptance_message_hash = get_signing_hash(acceptance_message)
+
+    tx = await contract.functions.updateTermsOfService(version, acceptance_message_hash, acceptance_message).build_transaction({
+        "from": account.address,
+        "nonce": nonce,
+        "chainId": chain_id,
+    })
+    signed = account.sign_transaction(tx)
+
+    return {
+        "deployment": deployment,
+        "web3": web3,
+        "contract": contract,
+        "version": version,
+        "acceptance_message": acceptance_message,
+        "acceptance_message_hash": acceptance_message_hash,
+        "gas": balance / 10**18,
+        "signed": signed,
+    }
+
+
+async def send(update: dict):
+    """Broadcast a prepared update and wait for its receipt."""
+    web3 = update["web3"]
+    name = update["deployment"].name
+    tx_hash = await web3.eth.send_raw_transaction(update["signed"].rawTransaction)
+    print(f"{name}: confirming {tx_hash.hex()}")
+    receipt = await web3.eth.wait_for_transaction_receipt(tx_hash, timeout=600)
+    assert receipt["status"] == 1, f"{name}: transaction {tx_hash.hex()} failed"
+    print(f"{name}: confirmed in block {receipt['blockNumber']}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Update terms of service on all chains")
+    parser.add_argument("chains", nargs="*", help=f"Chains to update: {', '.join(DEPLOYMENTS)}. Default to all.")
+    args = parser.parse_args()
+
+    for chain in args.chains:
+        assert chain in DEPLOYMENTS, f"Unknown chain {chain}, we have {', '.join(DEPLOYMENTS)}"
+
+    deployments = [DEPLOYMENTS[c] for c in (args.chains or DEPLOYMENTS)]
+
+    if os.environ.get("CONTRACT_ADDRESS"):
+        assert len(args.chains) == 1, "CONTRACT_ADDRESS can be used with one chain only"
+        deployments = [dataclasses.replace(deployments[0], address=os.environ["CONTRACT_ADDRESS"])]
+
+    assert os.environ.get("DEPLOY_PRIVATE_KEY"), "Set DEPLOY_PRIVATE_KEY env"
+    assert os.environ.get("TOS_DATE"), "Set TOS_DATE env"
+    for deployment in deployments:
+        assert os.environ.get(deployment.json_rpc_env), f"Set {deployment.json_rpc_env} env"
+
+    account = Account.from_key(os.environ["DEPLOY_PRIVATE_KEY"])
+    date = os.environ["TOS_DATE"]
+
+    results = await asyncio.gather(*[prepare(d, account, date) for d in deployments], return_exceptions=True)
+    failed = [(d, e) for d, e in zip(deployments, results) if isinstance(e, BaseException)]
+    for deployment, e in failed:
+        print(f"{deployment.name}: could not prepare the update: {e}")
+    if failed:
+        sys.exit(1)
+    updates = results
+
+    new_line = "\n"
+    escaped_new_line = "\\n"
+
+    print(f"Deployer: {account.address}")
+    print(f"Date: {date}")
+    for update in updates:
+        print("")
+        print(f"Chain: {update['deployment'].name}")
+        print(f"Contract: {update['contract'].address}")
+        print(f"Acceptance message: {update['acceptance_message'].replace(new_line, escaped_new_line)}")
+        print(f"Acceptance hash: {update['acceptance_message_hash'].hex()}")
+        print(f"Version: {update['version']}")
+        print(f"Gas balance: {update['gas']}")
+
+    confirm = input("Confirm send txs [y/n] ")
+    if confirm != "y":
+        sys.exit(1)
+
+    # One failing chain must not hide the outcome of the others,
+    # as their transactions are already broadcast
+    results = await asyncio.gather(*[send(u) for u in updates], return_exceptions=True)
+
+    print("")
+    for update, result in zip(updates, results):
+        name = update["deployment"].name
+        if isinstance(result, BaseException):
+            print(f"{name}: FAILED: {result}")
+        else:
+            print(f"{name}: updated to version {update['version']}")
+
+    if any(isinstance(r, BaseException) for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
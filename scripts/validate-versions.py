@@ -0,0 +1,63 @@
+"""Check the terms of service versions of all chains against a local manifest.
+
+- The manifest is built with :py:class:`terms_of_service.registry.TermsOfServiceManifest`,
+  e.g. after `scripts/update.py` has published a new version
+
+- Reads `versions(uint16)` of every chain with one Multicall3 call, all chains concurrently
+
+Example::
+
+    export JSON_RPC_POLYGON=
+    export JSON_RPC_ETHEREUM=
+    python scripts/validate-versions.py tos-manifest.sqlite polygon ethereum
+
+Run without chain arguments to check all chains.
+"""
+
+import argparse
+import os
+import sys
+
+from web3 import HTTPProvider, Web3
+from web3.middleware import geth_poa_middleware
+
+from terms_of_service.deployments import DEPLOYMENTS
+from terms_of_service.registry import TermsOfServiceManifest, validate_deployments
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate on-chain terms of service versions")
+    parser.add_argument("manifest", help="SQLite manifest file")
+    parser.add_argument("chains", nargs="*", help=f"Chains to check: {', '.join(DEPLOYMENTS)}. Default to all.")
+    args = parser.parse_args()
+
+    for chain in args.chains:
+        assert chain in DEPLOYMENTS, f"Unknown chain {chain}, we have {', '.join(DEPLOYMENTS)}"
+
+    web3s = {}
+    for name in args.chains or DEPLOYMENTS:
+        deployment = DEPLOYMENTS[name]
+        assert os.environ.get(deployment.json_rpc_env), f"Set {deployment.json_rpc_env} env"
+        web3 = Web3(HTTPProvider(os.environ[deployment.json_rpc_env]))
+        if deployment.poa:
+            web3.middleware_onion.inject(geth_poa_middleware, layer=0)
+        web3s[name] = web3
+
+    manifest = TermsOfServiceManifest(args.manifest)
+    results = validate_deployments(manifest, web3s)
+
+    for result in results:
+        print(f"{result.name}: latest version {result.latest_version}, {'OK' if result.ok else 'FAILED'}")
+        if result.missing:
+            print(f"  Not published: {', '.join(map(str, result.missing))}")
+        for version, onchain_hash in result.mismatched.items():
+            print(f"  Version {version} hash mismatch: on-chain {onchain_hash.hex()}, manifest {manifest.get_version(version).acceptance_message_hash.hex()}")
+        if result.unknown:
+            print(f"  Not in manifest: {', '.join(map(str, result.unknown))}")
+
+    if not all(r.ok for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,13 @@ import "@openzeppelin/access/Ownable.sol";
 // verification of smart contract signatures
 import "@openzeppelin/utils/cryptography/SignatureChecker.sol";
 
+// Support https://eips.ethereum.org/EIPS/eip-712
+// typed acceptance messages
+import "@openzeppelin/utils/cryptography/EIP712.sol";
+
+// Proofs of acceptances collected off-chain
+import "@openzeppelin/utils/cryptography/MerkleProof.sol";
+
 
 /**
  * Minimal MVP interface
@@ -17,23 +24,46 @@ interface ITermsOfService {
     function signTermsOfServiceBehalf(address signer, bytes32 hash, bytes calldata signature, bytes calldata metadata) external;
 }
 
+/**
+ * Read acceptances from an earlier TermsOfService deployment when migrating
+ */
+interface ILegacyTermsOfService {
+    function versions(uint16 version) external view returns (bytes32 acceptanceMessageHash);
+    function hasAcceptedHash(address account, bytes32 acceptanceMessageHash) external view returns (bool accepted);
+}
+
 /**
  * Terms of service acceptance tracker
  *
  * Manage signatures of users of different versions of terms of service.
  */
-contract TermsOfService is Ownable, ITermsOfService {
+contract TermsOfService is EIP712, Ownable, ITermsOfService {
 
     // OpenZeppelin lib supporting smart contract based signing as opposite to EOA signing
     using SignatureChecker for address;
 
-    // Terms of service acceptances
     //
-    // Account can and may need to accept multiple terms of services.
-    // Each terms of service is identified by its hash of text.
-    // The acceptance is a message that signs this terms of service version.
+    // EIP-712 struct signed in the typed acceptance mode
+    //
+    // - textHash: hash of the terms of service file
+    // - date: publication date as UNIX timestamp
+    // - linkHash: keccak256 of the URL where the terms of service was published
     //
-    mapping(address account => mapping(bytes32 acceptanceMessageHash => bool accepted)) public acceptances;
+    bytes32 public constant ACCEPTANCE_TYPEHASH = keccak256("Acceptance(uint16 version,bytes32 textHash,uint64 date,bytes32 linkHash)");
+
+    //
+    // What is the version numbe of current terms of service version
+    //
+    // Declared first, so it is packed to the same storage slot
+    // with Ownable owner. EIP712 is inherited before Ownable, so
+    // its storage does not end up between the two.
+    //
+    uint16 public latestTermsOfServiceVersion;
+
+    //
+    // What is the hash of currently active terms of service version
+    //
+    bytes32 public latestAcceptanceMessageHash;
 
     //
     // Published terms of services
@@ -44,27 +74,75 @@ contract TermsOfService is Ownable, ITermsOfService {
     //
     mapping(uint16 version => bytes32 acceptanceMessageHash) public versions;
 
+    // Terms of service acceptances
     //
-    // What is the hash of currently active terms of service version
+    // Account can and may need to accept multiple terms of services.
+    // Each accepted version is a bit in a per-account bitmap, 256 versions per storage slot.
     //
-    bytes32 public latestAcceptanceMessageHash;
+    // One storage read tells if an account has accepted a version,
+    // and accepting a new version usually writes to an already non-zero slot.
+    //
+    mapping(address account => mapping(uint256 bucket => uint256 bitmap)) public acceptedVersions;
 
     //
-    // What is the version numbe of current terms of service version
+    // Merkle roots of acceptances collected off-chain, e.g. in a web app
     //
-    uint16 public latestTermsOfServiceVersion;
+    // The owner attests that each leaf account has accepted the leaf acceptance message hash,
+    // so users do not need to pay for `signTermsOfServiceBehalf`.
+    //
+    // Leaf is keccak256(bytes.concat(keccak256(abi.encode(account, acceptanceMessageHash)))),
+    // pairs are hashed sorted, as expected by OpenZeppelin MerkleProof.
+    //
+    mapping(bytes32 root => bool active) public attestationRoots;
 
     // Add a new terms of service version
-    event UpdateTermsOfService(uint16 version, bytes32 acceptanceMessageHash, string acceptanceMessage);
+    event UpdateTermsOfService(uint16 indexed version, bytes32 indexed acceptanceMessageHash, string acceptanceMessage);
+
+    // Add a new terms of service version accepted with an EIP-712 typed signature
+    event UpdateTermsOfServiceTyped(uint16 indexed version, bytes32 indexed acceptanceMessageHash, bytes32 textHash, uint64 date, bytes32 linkHash);
+
+    // User accepted a specific terms of service version.
+    //
+    // Signer, version and hash are topics, so the history of one address
+    // can be queried with an eth_getLogs topic filter.
+    //
+    event Signed(address indexed signer, uint16 indexed version, bytes32 indexed hash, bytes metadata);
+
+    // Owner published a Merkle root of off-chain acceptances
+    event AttestationRootAdded(bytes32 root);
 
-    // User accepted a specific terms of service version
-    event Signed(address signer, uint16 version, bytes32 hash, bytes metadata);
+    // Owner withdrew a Merkle root
+    event AttestationRootRemoved(bytes32 root);
 
-    constructor() Ownable() {
+    constructor() EIP712("TermsOfService", "1") Ownable() {
     }
 
+    /**
+     * Has an account accepted any version published with this acceptance message hash.
+     *
+     * There is no reverse lookup from hashes to versions, so `updateTermsOfService`
+     * writes only one new storage slot. Versions are scanned from the latest down,
+     * which is a few storage reads for the handful of versions a deployment publishes.
+     *
+     * A hash can be published again as a later version, as with the earlier deployments,
+     * so all versions with the hash are checked.
+     */
     function hasAcceptedHash(address account, bytes32 acceptanceMessageHash) public view returns (bool accepted) {
-        return acceptances[account][acceptanceMessageHash];
+        for (uint16 version = latestTermsOfServiceVersion; version > 0; version--) {
+            if (versions[version] == acceptanceMessageHash && _hasAcceptedVersion(account, version)) {
+                return true;
+            }
+        }
+        return false;
+    }
+
+    /**
+     * Same as hasAcceptedHash.
+     *
+     * Kept for the compatibility with the earlier acceptances(account, hash) public mapping.
+     */
+    function acceptances(address account, bytes32 acceptanceMessageHash) public view returns (bool accepted) {
+        return hasAcceptedHash(account, acceptanceMessageHash);
     }
 
     function getTextHash(uint16 version) public view returns (bytes32 hash) {
@@ -74,7 +152,27 @@ contract TermsOfService is Ownable, ITermsOfService {
     function hasAcceptedVersion(address account, uint16 version) public view returns (bool accepted) {
         bytes32 hash = versions[version];
         require(hash != bytes32(0), "No such version");
-        return hasAcceptedHash(account, hash);
+        return _hasAcceptedVersion(account, version);
+    }
+
+    function _hasAcceptedVersion(address account, uint16 version) internal view returns (bool accepted) {
+        return (acceptedVersions[account][version >> 8] & (uint256(1) << (version & 0xff))) != 0;
+    }
+
+    /**
+     * Record that an account accepted a version.
+     *
+     * @return newlyAccepted false if the account had already accepted the version
+     */
+    function _markAccepted(address account, uint16 version) internal returns (bool newlyAccepted) {
+        uint256 bucket = version >> 8;
+        uint256 bit = uint256(1) << (version & 0xff);
+        uint256 bitmap = acceptedVersions[account][bucket];
+        if ((bitmap & bit) != 0) {
+            return false;
+        }
+        acceptedVersions[account][bucket] = bitmap | bit;
+        return true;
     }
 
     /**
@@ -85,12 +183,42 @@ contract TermsOfService is Ownable, ITermsOfService {
      *
      */
     function updateTermsOfService(uint16 version, bytes32 acceptanceMessageHash, string calldata acceptanceMessage) public onlyOwner {
+        _updateTermsOfService(version, acceptanceMessageHash);
+        emit UpdateTermsOfService(version, acceptanceMessageHash, acceptanceMessage);
+    }
+
+    /**
+     * Update to the new terms of service version, accepted with EIP-712 typed signatures.
+     *
+     * The acceptance message hash is the EIP-712 digest of the `Acceptance` struct,
+     * so users sign short structured data instead of a free text message,
+     * and the event carries fixed size fields instead of the message text.
+     *
+     * Signatures are then submitted with `signTermsOfServiceBehalf` as usual.
+     */
+    function updateTermsOfServiceTyped(uint16 version, bytes32 textHash, uint64 date, bytes32 linkHash) public onlyOwner {
+        bytes32 acceptanceMessageHash = getTypedAcceptanceHash(version, textHash, date, linkHash);
+        _updateTermsOfService(version, acceptanceMessageHash);
+        emit UpdateTermsOfServiceTyped(version, acceptanceMessageHash, textHash, date, linkHash);
+    }
+
+    /**
+     * EIP-712 digest of a typed acceptance, bound to this contract and chain.
+     */
+    function getTypedAcceptanceHash(uint16 version, bytes32 textHash, uint64 date, bytes32 linkHash) public view returns (bytes32 hash) {
+        return _hashTypedDataV4(keccak256(abi.encode(ACCEPTANCE_TYPEHASH, version, textHash, date, linkHash)));
+    }
+
+    function _updateTermsOfService(uint16 version, bytes32 acceptanceMessageHash) internal {
         require(version == latestTermsOfServiceVersion + 1, "Versions must be updated incrementally");
+        // Same rule as the earlier deployments, so their version history can be replayed
+        // for `importAcceptances`. An earlier hash can be published again, and its
+        // acceptances are then recorded for the new version only.
+        // The latest hash starts as zero, so an empty hash cannot be the first version.
         require(acceptanceMessageHash != latestAcceptanceMessageHash, "Setting the same terms of service twice");
         latestAcceptanceMessageHash = acceptanceMessageHash;
         latestTermsOfServiceVersion = version;
         versions[version] = acceptanceMessageHash;
-        emit UpdateTermsOfService(version, acceptanceMessageHash, acceptanceMessage);
     }
 
     /**
@@ -106,8 +234,79 @@ contract TermsOfService is Ownable, ITermsOfService {
      * the latest terms of service.
      */
     function canAddressProceed(address sender) public view returns (bool accepted) {
-        require(latestAcceptanceMessageHash != bytes32(0), "Terms of service not initialised");
-        return hasAcceptedHash(sender, latestAcceptanceMessageHash);
+        uint16 version = latestTermsOfServiceVersion;
+        require(version != 0, "Terms of service not initialised");
+        return _hasAcceptedVersion(sender, version);
+    }
+
+    /**
+     * Batch version of canAddressProceed.
+     *
+     * @return accepted Bitmap where bit (i % 256) of word (i / 256) is set if accounts[i] has accepted the latest version
+     */
+    function canAddressesProceed(address[] calldata accounts) external view returns (uint256[] memory accepted) {
+        uint16 version = latestTermsOfServiceVersion;
+        require(version != 0, "Terms of service not initialised");
+        return _acceptedBitmap(accounts, version);
+    }
+
+    /**
+     * Batch version of hasAcceptedVersion.
+     *
+     * @return accepted Bitmap where bit (i % 256) of word (i / 256) is set if accounts[i] has accepted the version
+     */
+    function hasAcceptedVersionBatch(address[] calldata accounts, uint16 version) external view returns (uint256[] memory accepted) {
+        require(versions[version] != bytes32(0), "No such version");
+        return _acceptedBitmap(accounts, version);
+    }
+
+    function _acceptedBitmap(address[] calldata accounts, uint16 version) internal view returns (uint256[] memory accepted) {
+        accepted = new uint256[]((accounts.length + 255) / 256);
+        uint256 bucket = version >> 8;
+        uint256 bit = uint256(1) << (version & 0xff);
+        for (uint256 i = 0; i < accounts.length; i++) {
+            if ((acceptedVersions[accounts[i]][bucket] & bit) != 0) {
+                accepted[i >> 8] |= uint256(1) << (i & 0xff);
+            }
+        }
+    }
+
+    /**
+     * Publish a Merkle root of acceptances collected off-chain.
+     *
+     * See `terms_of_service.merkle` for building the tree and proofs.
+     */
+    function addAttestationRoot(bytes32 root) public onlyOwner {
+        require(!attestationRoots[root], "Root already added");
+        attestationRoots[root] = true;
+        emit AttestationRootAdded(root);
+    }
+
+    function removeAttestationRoot(bytes32 root) public onlyOwner {
+        require(attestationRoots[root], "Unknown root");
+        attestationRoots[root] = false;
+        emit AttestationRootRemoved(root);
+    }
+
+    /**
+     * Has an account accepted a message hash according to an attestation Merkle root.
+     */
+    function hasAttestedHash(address account, bytes32 acceptanceMessageHash, bytes32 root, bytes32[] calldata proof) public view returns (bool accepted) {
+        if (!attestationRoots[root]) {
+            return false;
+        }
+        bytes32 leaf = keccak256(bytes.concat(keccak256(abi.encode(account, acceptanceMessageHash))));
+        return MerkleProof.verifyCalldata(proof, root, leaf);
+    }
+
+    /**
+     * Same as canAddressProceed, but also accepts an off-chain acceptance
+     * of the latest version proven against an attestation Merkle root.
+     */
+    function canAddressProceedWithProof(address sender, bytes32 root, bytes32[] calldata proof) public view returns (bool accepted) {
+        uint16 version = latestTermsOfServiceVersion;
+        require(version != 0, "Terms of service not initialised");
+        return _hasAcceptedVersion(sender, version) || hasAttestedHash(sender, latestAcceptanceMessageHash, root, proof);
     }
 
     /**
@@ -130,13 +329,69 @@ contract TermsOfService is Ownable, ITermsOfService {
     function signTermsOfServiceBehalf(address signer, bytes32 hash, bytes calldata signature, bytes calldata metadata) public {
         require(hash == latestAcceptanceMessageHash, "Cannot sign older or unknown versions terms of services");
         require(signer.isValidSignatureNow(hash, signature), "Signature is not valid");
-        require(acceptances[signer][latestAcceptanceMessageHash] == false, "Already signed");
-        acceptances[signer][latestAcceptanceMessageHash] = true;
-        emit Signed(signer, latestTermsOfServiceVersion, latestAcceptanceMessageHash, metadata);
+        uint16 version = latestTermsOfServiceVersion;
+        require(_markAccepted(signer, version), "Already signed");
+        emit Signed(signer, version, hash, metadata);
     }
 
     function signTermsOfServiceOwn(bytes32 hash, bytes calldata signature, bytes calldata metadata) public {
         signTermsOfServiceBehalf(msg.sender, hash, signature, metadata);
     }
 
+    /**
+     * Sign terms of service on behalf of multiple users in one transaction.
+     *
+     * For relayers to amortise the transaction overhead over many signers.
+     *
+     * - All signatures must be for the latest terms of service version
+     * - Signers who have already signed are skipped instead of reverting the whole batch
+     * - Any invalid signature reverts the whole batch
+     * - Emits `Signed` for each new signer, same as `signTermsOfServiceBehalf`
+     */
+    function signTermsOfServiceBehalfBatch(address[] calldata signers, bytes32 hash, bytes[] calldata signatures, bytes[] calldata metadatas) public {
+        // Storage is read once for the whole batch,
+        // after this check hash is the latest hash
+        require(hash == latestAcceptanceMessageHash, "Cannot sign older or unknown versions terms of services");
+        require(signers.length == signatures.length && signers.length == metadatas.length, "Array length mismatch");
+        uint16 latestVersion = latestTermsOfServiceVersion;
+        for (uint256 i = 0; i < signers.length; i++) {
+            address signer = signers[i];
+            if (_hasAcceptedVersion(signer, latestVersion)) {
+                continue;
+            }
+            require(signer.isValidSignatureNow(hash, signatures[i]), "Signature is not valid");
+            _markAccepted(signer, latestVersion);
+            emit Signed(signer, latestVersion, hash, metadatas[i]);
+        }
+    }
+
+    /**
+     * Migrate acceptances from an earlier TermsOfService deployment.
+     *
+     * The storage layout of this contract differs from the earlier deployments,
+     * so a new contract needs to be deployed. To migrate
+     *
+     * - Deploy this contract
+     * - Replay all versions of the legacy contract with `updateTermsOfService`
+     * - Call this function with all signer addresses, in as many transactions as needed
+     *
+     * Acceptances are read from the legacy contract, not trusted from the caller.
+     * The legacy contract records acceptances per hash, so an account that accepted
+     * a hash published for several versions is marked for all of them.
+     * Emits `Signed` with empty metadata for each carried over acceptance,
+     * so event indexers see the full history.
+     */
+    function importAcceptances(ILegacyTermsOfService legacy, address[] calldata accounts) public onlyOwner {
+        uint16 latestVersion = latestTermsOfServiceVersion;
+        for (uint16 version = 1; version <= latestVersion; version++) {
+            bytes32 hash = versions[version];
+            require(legacy.versions(version) == hash, "Legacy version mismatch");
+            for (uint256 i = 0; i < accounts.length; i++) {
+                if (legacy.hasAcceptedHash(accounts[i], hash) && _markAccepted(accounts[i], version)) {
+                    emit Signed(accounts[i], version, hash, "");
+                }
+            }
+        }
+    }
+
 }
@@ -0,0 +1,98 @@
+"""ABI file loading.
+
+- ABI files are Foundry build artifacts copied to `terms_of_service/artifacts/`,
+  shipped inside the package and loaded with `importlib.resources`
+
+- Loaded ABI files and contract objects are cached in in-process memory,
+  so long-running services do not re-parse JSON or rebuild ABI encoders
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from importlib.resources import files
+from pathlib import Path
+
+from eth_utils import to_checksum_address
+from web3 import AsyncWeb3, Web3
+from web3.contract import AsyncContract, Contract
+
+#: Where the ABI files live
+ABI_PATH = files("terms_of_service") / "artifacts"
+
+#: How many contract objects are kept.
+#:
+#: Contract objects hold their web3 instance, so this also bounds how many
+#: discarded web3 instances the cache keeps alive.
+CONTRACT_CACHE_SIZE = 64
+
+#: (id of web3 instance, ABI filename, address) -> contract, least recently used first
+_contract_cache: OrderedDict[tuple[int, str, str], Contract | AsyncContract] = OrderedDict()
+
+_contract_cache_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def _load_abi(abi_path, mtime_ns: int) -> list[dict]:
+    return json.loads(abi_path.read_text(encoding="utf-8"))["abi"]
+
+
+def get_abi_by_filename(fname: str) -> list[dict]:
+    """Reads a embedded ABI file and returns it.
+
+    Example::
+
+        abi = get_abi_by_filename("TermsOfService.json")
+
+    Loaded ABI files are cached in in-process memory.
+    The file is parsed again only if its modification time changes.
+    The returned list is shared between callers and must not be modified.
+
+    :param fname:
+        JSON filename in `terms_of_service/artifacts/`
+
+    :return:
+        Contract ABI
+    """
+    abi_path = ABI_PATH / fname
+    # Installed from a zip file, never changes
+    mtime_ns = abi_path.stat().st_mtime_ns if isinstance(abi_path, Path) else 0
+    return _load_abi(abi_path, mtime_ns)
+
+
+def get_contract(web3: Web3 | AsyncWeb3, address: str, fname: str = "TermsOfService.json") -> Contract | AsyncContract:
+    """Get a contract object bound to a web3 instance.
+
+    Contract objects are cached per (web3 instance, ABI file, address).
+    The least recently used of :py:data:`CONTRACT_CACHE_SIZE` contracts are evicted.
+
+    Example::
+
+        contract = get_contract(web3, "0xbe1418df0bAd87577de1A41385F19c6e77312780")
+        version = contract.functions.latestTermsOfServiceVersion().call()
+
+    :param web3:
+        Sync or async web3 connection
+
+    :param address:
+        Deployed contract address
+
+    :param fname:
+        JSON filename in `terms_of_service/artifacts/`
+    """
+    address = to_checksum_address(address)
+    # A cached contract keeps its web3 instance alive, so the id cannot be reused while cached
+    key = (id(web3), fname, address)
+    with _contract_cache_lock:
+        contract = _contract_cache.get(key)
+        if contract is not None:
+            _contract_cache.move_to_end(key)
+            return contract
+
+    contract = web3.eth.contract(address=address, abi=get_abi_by_filename(fname))
+    with _contract_cache_lock:
+        contract = _contract_cache.setdefault(key, contract)
+        while len(_contract_cache) > CONTRACT_CACHE_SIZE:
+            _contract_cache.popitem(last=False)
+    return contract
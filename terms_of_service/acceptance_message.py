@@ -6,13 +6,24 @@
 - Uses EIP-151
 
 - See `EthAccout.sign_message implementation <https://github.com/ethereum/eth-account/blob/b4883627557839bed906c89b93eec0fbbb017ec5/eth_account/account.py#L535>`__.
+
+- Optionally, terms of service can be accepted by signing an EIP-712 typed `Acceptance` struct
+  instead of a free text message, see :py:func:`get_typed_signing_hash`
+
+- Importing this module is cheap: hashing and signing dependencies (`eth_hash`, `eth_account`)
+  are imported on the first use, so templates and message rendering do not pay for them.
 """
 
+import calendar
 import datetime
+import time
+from functools import lru_cache
+from typing import TYPE_CHECKING
 
-from eth_account.datastructures import SignedMessage
-from eth_account.messages import encode_defunct, _hash_eip191_message
-from eth_account.signers.local import LocalAccount
+from terms_of_service.metrics import HASH_SECONDS, HASHED_MESSAGES, REGISTRY
+
+if TYPE_CHECKING:
+    from eth_account.signers.local import LocalAccount
 
 DEFAULT_ACCEPTANCE_MESSAGE_TEMPLATE = """
 I read and agree on terms of service (version {version}) to use
@@ -47,25 +58,219 @@ def generate_acceptance_message(version: int, date: datetime.datetime, link: str
     return template.format(version=version, link=link, hash=hash.hex(), human_date=human_date)
 
 
+#: EIP-191 version ``E`` prefix, followed by the message length in decimal
+EIP_191_PREFIX = b"\x19Ethereum Signed Message:\n"
+
+
+@lru_cache(maxsize=None)
+def _get_keccak():
+    from eth_hash.auto import keccak
+    return keccak
+
+
 def get_signing_hash(message: str) -> bytes:
+    """Calculate EIP-191 signing hash for a message.
+
+    Same as `_hash_eip191_message(encode_defunct(text=message))` in `eth_account`.
+
+    Throughput depends on the `eth_hash` backend. `eth_hash` picks `pycryptodome`
+    when it is installed. With `safe-pysha3` installed, ``ETH_HASH_BACKEND=pysha3``
+    hashes over twice as many messages per second, see `scripts/benchmark-signing-hash.py`.
+    """
     assert type(message) == str
-    signable_message = encode_defunct(text=message)
-    hash = _hash_eip191_message(signable_message)
-    return hash
+    started = time.perf_counter() if REGISTRY.enabled else None
+    encoded = message.encode("utf-8")
+    result = _get_keccak()(EIP_191_PREFIX + str(len(encoded)).encode("ascii") + encoded)
+    if started is not None:
+        HASH_SECONDS.observe(time.perf_counter() - started, "get_signing_hash")
+        HASHED_MESSAGES.inc("get_signing_hash")
+    return result
+
+
+#: How many rendered acceptance messages we keep around.
+#:
+#: There are only a handful of live terms of service versions per chain.
+ACCEPTANCE_MESSAGE_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=ACCEPTANCE_MESSAGE_CACHE_SIZE)
+def get_acceptance_message_and_hash(
+    version: int,
+    date: datetime.datetime,
+    link: str,
+    hash: bytes,
+    template=DEFAULT_ACCEPTANCE_MESSAGE_TEMPLATE,
+) -> tuple[str, bytes]:
+    """Render an acceptance message and its signing hash, memoized.
+
+    Same as calling :py:func:`generate_acceptance_message` and :py:func:`get_signing_hash`,
+    but the result is cached by the function arguments, so serving
+    "what should the wallet sign?" is a dictionary lookup after the first call.
+
+    Call :py:func:`clear_acceptance_message_cache` when a new terms of service
+    version is published with `UpdateTermsOfService`.
+
+    :return:
+        Tuple (acceptance message, message hash)
+    """
+    message = generate_acceptance_message(version, date, link, hash, template)
+    return message, get_signing_hash(message)
+
+
+def clear_acceptance_message_cache():
+    """Drop all memoized acceptance messages.
+
+    Call after `updateTermsOfService` has been executed.
+    """
+    get_acceptance_message_and_hash.cache_clear()
 
 
 def sign_terms_of_service(
-    user: LocalAccount,
+    user: "LocalAccount",
     signable_message: str,
 ) -> tuple[bytes, bytes]:
     """Sign terms of service for a local dev test account.
 
+    See :py:mod:`terms_of_service.bulk_signing` for signing with many accounts.
+
     :return:
         Tuple (message hash, signed message)
     """
 
+    from eth_account.signers.local import LocalAccount
+    from terms_of_service.bulk_signing import sign_hash
     assert isinstance(user, LocalAccount)
     message_hash = get_signing_hash(signable_message)
-    signed_message = user.signHash(message_hash)
-    # import ipdb ; ipdb.set_trace()
-    return message_hash, signed_message.signature
+    return message_hash, sign_hash(user.key, message_hash)
+
+
+#: EIP-712 domain of the TermsOfService contract
+EIP_712_DOMAIN_NAME = "TermsOfService"
+
+EIP_712_DOMAIN_VERSION = "1"
+
+EIP_712_DOMAIN_TYPE = "EIP712Domain(string name,string version,uint256 chainId,address verifyingContract)"
+
+#: EIP-712 struct users sign in the typed acceptance mode, must match `ACCEPTANCE_TYPEHASH` in the contract
+ACCEPTANCE_TYPE = "Acceptance(uint16 version,bytes32 textHash,uint64 date,bytes32 linkHash)"
+
+
+def get_typed_acceptance_data(
+    version: int,
+    text_hash: bytes,
+    date: datetime.datetime,
+    link: str,
+    chain_id: int,
+    verifying_contract: str,
+) -> dict:
+    """Generate EIP-712 typed data for a wallet to sign.
+
+    Pass the result to `eth_signTypedData_v4`.
+
+    :param text_hash:
+        256-bit hash of the terms of service file
+
+    :param date:
+        Publication date, naive datetimes are UTC
+
+    :param link:
+        Where the terms of service text was published
+
+    :param verifying_contract:
+        TermsOfService contract address
+    """
+    assert type(version) == int
+    assert type(text_hash) == bytes
+    assert len(text_hash) == 32, "Must be 256-bit sha of terms of service file"
+    assert isinstance(date, datetime.datetime)
+    return {
+        "types": {
+            "EIP712Domain": [
+                {"name": "name", "type": "string"},
+                {"name": "version", "type": "string"},
+                {"name": "chainId", "type": "uint256"},
+                {"name": "verifyingContract", "type": "address"},
+            ],
+            "Acceptance": [
+                {"name": "version", "type": "uint16"},
+                {"name": "textHash", "type": "bytes32"},
+                {"name": "date", "type": "uint64"},
+                {"name": "linkHash", "type": "bytes32"},
+            ],
+        },
+        "primaryType": "Acceptance",
+        "domain": {
+            "name": EIP_712_DOMAIN_NAME,
+            "version": EIP_712_DOMAIN_VERSION,
+            "chainId": chain_id,
+            "verifyingContract": verifying_contract,
+        },
+        "message": {
+            "version": version,
+            "textHash": "0x" + text_hash.hex(),
+            "date": calendar.timegm(date.utctimetuple()),
+            "linkHash": "0x" + _get_keccak()(link.encode("utf-8")).hex(),
+        },
+    }
+
+
+def get_typed_signing_hash(
+    version: int,
+    text_hash: bytes,
+    date: datetime.datetime,
+    link: str,
+    chain_id: int,
+    verifying_contract: str,
+) -> bytes:
+    """Get the EIP-712 digest of a typed acceptance.
+
+    Same as `getTypedAcceptanceHash` of the contract. This is the acceptance message hash
+    of versions published with `updateTermsOfServiceTyped`,
+    and what `signTermsOfServiceBehalf` expects to be signed.
+
+    All struct fields are fixed size, so they are encoded as 32-byte words without an ABI encoder.
+
+    See :py:func:`get_typed_acceptance_data` for the parameters.
+    """
+    data = get_typed_acceptance_data(version, text_hash, date, link, chain_id, verifying_contract)
+    keccak = _get_keccak()
+    message = data["message"]
+
+    domain_separator = keccak(
+        keccak(EIP_712_DOMAIN_TYPE.encode("ascii"))
+        + keccak(EIP_712_DOMAIN_NAME.encode("ascii"))
+        + keccak(EIP_712_DOMAIN_VERSION.encode("ascii"))
+        + chain_id.to_bytes(32, "big")
+        + bytes.fromhex(verifying_contract[2:]).rjust(32, b"\x00")
+    )
+
+    struct_hash = keccak(
+        keccak(ACCEPTANCE_TYPE.encode("ascii"))
+        + version.to_bytes(32, "big")
+        + text_hash
+        + message["date"].to_bytes(32, "big")
+        + bytes.fromhex(message["linkHash"][2:])
+    )
+
+    return keccak(b"\x19\x01" + domain_separator + struct_hash)
+
+
+def sign_terms_of_service_typed(
+    user: "LocalAccount",
+    version: int,
+    text_hash: bytes,
+    date: datetime.datetime,
+    link: str,
+    chain_id: int,
+    verifying_contract: str,
+) -> tuple[bytes, bytes]:
+    """Sign a typed acceptance for a local dev test account.
+
+    :return:
+        Tuple (acceptance message hash, signed message)
+    """
+    from eth_account.signers.local import LocalAccount
+    from terms_of_service.bulk_signing import sign_hash
+    assert isinstance(user, LocalAccount)
+    message_hash = get_typed_signing_hash(version, text_hash, date, link, chain_id, verifying_contract)
+    return message_hash, sign_hash(user.key, message_hash)
@@ -0,0 +1,222 @@
+"""Check terms of service acceptance for many addresses at once.
+
+- Calls are packed to `Multicall3.aggregate3 <https://www.multicall3.com/>`__ calls
+  when Multicall3 is deployed on the chain, otherwise one `eth_call` per address is made
+
+- Chunks are executed concurrently in a thread pool
+
+- :py:func:`check_addresses_batch` uses the `canAddressesProceed` and `hasAcceptedVersionBatch`
+  views of newer deployments instead, which check thousands of addresses in one `eth_call`
+  and return a packed bitmap instead of an ABI encoded result per address
+
+Example::
+
+    result = check_addresses(web3, tos_address, addresses)
+    for address, accepted in result.accepted.items():
+        ...
+    print(f"Calls per address: {result.calls_per_address}")
+"""
+
+import dataclasses
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable
+
+from eth_abi import decode
+from eth_utils import to_checksum_address
+from web3 import Web3
+from web3.contract import Contract
+
+from terms_of_service.abi import get_contract
+
+#: Multicall3 is deployed at the same address on all major chains
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
+#: We only need aggregate3()
+MULTICALL3_ABI = [
+    {
+        "type": "function",
+        "name": "aggregate3",
+        "stateMutability": "payable",
+        "inputs": [
+            {
+                "name": "calls",
+                "type": "tuple[]",
+                "components": [
+                    {"name": "target", "type": "address"},
+                    {"name": "allowFailure", "type": "bool"},
+                    {"name": "callData", "type": "bytes"},
+                ],
+            }
+        ],
+        "outputs": [
+            {
+                "name": "returnData",
+                "type": "tuple[]",
+                "components": [
+                    {"name": "success", "type": "bool"},
+                    {"name": "returnData", "type": "bytes"},
+                ],
+            }
+        ],
+    }
+]
+
+
+@dataclasses.dataclass
+class AddressCheckResult:
+    """Acceptance status of a batch of addresses."""
+
+    #: Checksummed address -> has accepted
+    accepted: dict[str, bool]
+
+    #: How many JSON-RPC calls we made
+    rpc_calls: int
+
+    @property
+    def calls_per_address(self) -> float:
+        if not self.accepted:
+            return 0.0
+        return self.rpc_calls / len(self.accepted)
+
+
+def _encode_call(contract: Contract, address: str, acceptance_message_hash: bytes | None) -> str:
+    if acceptance_message_hash is None:
+        return contract.encodeABI(fn_name="canAddressProceed", args=[address])
+    return contract.encodeABI(fn_name="hasAcceptedHash", args=[address, acceptance_message_hash])
+
+
+def _check_chunk_multicall(multicall: Contract, contract: Contract, chunk: list[str], acceptance_message_hash: bytes | None) -> list[bool]:
+    calls = [(contract.address, False, _encode_call(contract, address, acceptance_message_hash)) for address in chunk]
+    results = multicall.functions.aggregate3(calls).call()
+    return [decode(["bool"], return_data)[0] for success, return_data in results]
+
+
+def _check_chunk_single(contract: Contract, chunk: list[str], acceptance_message_hash: bytes | None) -> list[bool]:
+    if acceptance_message_hash is None:
+        return [contract.functions.canAddressProceed(address).call() for address in chunk]
+    return [contract.functions.hasAcceptedHash(address, acceptance_message_hash).call() for address in chunk]
+
+
+def check_addresses(
+    web3: Web3,
+    contract_address: str,
+    addresses: Iterable[str],
+    version: int | None = None,
+    chunk_size: int = 500,
+    max_workers: int = 4,
+    multicall_address: str | None = MULTICALL3_ADDRESS,
+) -> AddressCheckResult:
+    """Check if addresses have accepted the terms of service.
+
+    :param contract_address:
+        Deployed `TermsOfService` contract
+
+    :param addresses:
+        Addresses to check. Duplicates are checked once.
+
+    :param version:
+        Check a specific terms of service version with `hasAcceptedHash`.
+        By default check the latest version with `canAddressProceed`.
+
+    :param chunk_size:
+        How many addresses per one aggregated call
+
+    :param max_workers:
+        How many chunks are in flight at the same time
+
+    :param multicall_address:
+        Multicall3 deployment. Set ``None`` to always use one call per address.
+
+    :return:
+        Acceptance status for each address
+    """
+    contract = get_contract(web3, contract_address)
+    addresses = list(dict.fromkeys(to_checksum_address(a) for a in addresses))
+    chunks = [addresses[i:i + chunk_size] for i in range(0, len(addresses), chunk_size)]
+    rpc_calls = 0
+
+    acceptance_message_hash = None
+    if version is not None:
+        acceptance_message_hash = contract.functions.getTextHash(version).call()
+        rpc_calls += 1
+        assert acceptance_message_hash != b"\x00" * 32, f"No such version: {version}"
+
+    multicall = None
+    if multicall_address:
+        multicall_address = to_checksum_address(multicall_address)
+        rpc_calls += 1
+        if web3.eth.get_code(multicall_address):
+            multicall = web3.eth.contract(address=multicall_address, abi=MULTICALL3_ABI)
+
+    if multicall:
+        def _check(chunk):
+            return _check_chunk_multicall(multicall, contract, chunk, acceptance_message_hash)
+        rpc_calls += len(chunks)
+    else:
+        def _check(chunk):
+            return _check_chunk_single(contract, chunk, acceptance_message_hash)
+        rpc_calls += len(addresses)
+
+    accepted = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for chunk, results in zip(chunks, executor.map(_check, chunks)):
+            accepted.update(zip(chunk, results))
+
+    return AddressCheckResult(accepted=accepted, rpc_calls=rpc_calls)
+
+
+def unpack_bitmap(words: list[int], count: int) -> list[bool]:
+    """Unpack the result of `canAddressesProceed` and `hasAcceptedVersionBatch`.
+
+    Bit ``i % 256`` of word ``i // 256`` is the status of address ``i``.
+    """
+    return [bool((words[i >> 8] >> (i & 0xff)) & 1) for i in range(count)]
+
+
+def check_addresses_batch(
+    web3: Web3,
+    contract_address: str,
+    addresses: Iterable[str],
+    version: int | None = None,
+    chunk_size: int = 2_000,
+    max_workers: int = 4,
+) -> AddressCheckResult:
+    """Check if addresses have accepted the terms of service with the batch views.
+
+    Needs a deployment with `canAddressesProceed`, use :py:func:`check_addresses` for older ones.
+
+    :param addresses:
+        Addresses to check. Duplicates are checked once.
+
+    :param version:
+        Check a specific terms of service version with `hasAcceptedVersionBatch`.
+        By default check the latest version with `canAddressesProceed`.
+
+    :param chunk_size:
+        How many addresses per `eth_call`.
+        Each address costs roughly 2,700 gas, so the default stays well below
+        the `eth_call` gas cap of common nodes.
+
+    :param max_workers:
+        How many chunks are in flight at the same time
+
+    :return:
+        Acceptance status for each address
+    """
+    contract = get_contract(web3, contract_address)
+    addresses = list(dict.fromkeys(to_checksum_address(a) for a in addresses))
+    chunks = [addresses[i:i + chunk_size] for i in range(0, len(addresses), chunk_size)]
+
+    def _check(chunk):
+        if version is None:
+            words = contract.functions.canAddressesProceed(chunk).call()
+        else:
+            words = contract.functions.hasAcceptedVersionBatch(chunk, version).call()
+        return unpack_bitmap(words, len(chunk))
+
+    accepted = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for chunk, results in zip(chunks, executor.map(_check, chunks)):
+            accepted.update(zip(chunk, results))
+
+    return AddressCheckResult(accepted=accepted, rpc_calls=len(chunks))
@@ -0,0 +1,117 @@
+"""Produce terms of service signatures in bulk.
+
+- For load tests and test fixtures that need hundreds of thousands
+  of acceptance signatures from generated accounts
+
+- Private keys are derived from a seed, so the same fixture is produced
+  on every run and on every machine, regardless of the number of worker processes
+
+- Signing is done with `eth_keys` directly, skipping the `eth_account` message wrappers,
+  and optionally spread over a process pool
+
+- Signatures are packed r||s||v with v 27 or 28, as `signTermsOfServiceBehalf` expects
+
+Example::
+
+    keys = generate_private_keys(100_000, seed=1)
+    message_hash = get_signing_hash(acceptance_message)
+    for signer, signature in sign_hashes(keys, message_hash, max_workers=8):
+        ...
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Sequence
+
+from eth_hash.auto import keccak
+from eth_keys import keys
+
+from terms_of_service.signature_verification import SECP256K1_N
+
+
+def _pack_signature(signature: keys.Signature) -> bytes:
+    return signature.r.to_bytes(32, "big") + signature.s.to_bytes(32, "big") + bytes([signature.v + 27])
+
+
+def sign_hash(private_key: bytes, message_hash: bytes) -> bytes:
+    """Sign a message hash.
+
+    :param private_key:
+        32 bytes private key
+
+    :param message_hash:
+        EIP-191 hash from :py:func:`terms_of_service.acceptance_message.get_signing_hash`
+
+    :return:
+        65 bytes packed r||s||v signature
+    """
+    assert len(message_hash) == 32, "Must be 256-bit message hash"
+    return _pack_signature(keys.PrivateKey(private_key).sign_msg_hash(message_hash))
+
+
+def generate_private_keys(count: int, seed: int = 0) -> list[bytes]:
+    """Derive private keys for test accounts from a seed.
+
+    Key `i` is always the same for the same seed,
+    so fixtures of different sizes share their first accounts.
+
+    Never use these keys for real funds.
+    """
+    result = []
+    for i in range(count):
+        key = keccak(seed.to_bytes(32, "big") + i.to_bytes(32, "big"))
+        # Practically never loops
+        while not 0 < int.from_bytes(key, "big") < SECP256K1_N:
+            key = keccak(key)
+        result.append(key)
+    return result
+
+
+def _sign_chunk(chunk: list[tuple[bytes, bytes]]) -> list[tuple[str, bytes]]:
+    result = []
+    for private_key, message_hash in chunk:
+        private_key = keys.PrivateKey(private_key)
+        signature = _pack_signature(private_key.sign_msg_hash(message_hash))
+        result.append((private_key.public_key.to_checksum_address(), signature))
+    return result
+
+
+def sign_hashes(
+    private_keys: Sequence[bytes],
+    message_hashes: bytes | Sequence[bytes],
+    max_workers: int | None = None,
+    chunk_size: int = 512,
+) -> list[tuple[str, bytes]]:
+    """Sign message hashes with many keys.
+
+    :param private_keys:
+        Signing keys, e.g. from :py:func:`generate_private_keys`
+
+    :param message_hashes:
+        One message hash signed by all keys,
+        or a message hash for each key
+
+    :param max_workers:
+        Sign in a process pool of this size.
+        By default sign in the current process.
+
+    :param chunk_size:
+        How many signatures are made by a worker process at a time
+
+    :return:
+        (signer address, packed signature) for each key, in the input order
+    """
+    if isinstance(message_hashes, bytes):
+        items = [(key, message_hashes) for key in private_keys]
+    else:
+        assert len(private_keys) == len(message_hashes), "Need one message hash per key"
+        items = list(zip(private_keys, message_hashes))
+
+    if not max_workers:
+        return _sign_chunk(items)
+
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    result = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for signed in executor.map(_sign_chunk, chunks):
+            result += signed
+    return result
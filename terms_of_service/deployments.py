@@ -0,0 +1,39 @@
+"""Known TermsOfService deployments.
+
+- Used by `scripts/update.py` to roll out new terms of service versions to all chains at once
+
+- JSON-RPC URL for each chain is read from the environment variable named in the deployment
+"""
+
+import dataclasses
+
+
+@dataclasses.dataclass(frozen=True)
+class Deployment:
+    """A TermsOfService contract on one chain."""
+
+    #: Human readable chain name, used on the command line
+    name: str
+
+    #: EIP-155 chain id
+    chain_id: int
+
+    #: Contract address
+    address: str
+
+    #: Environment variable holding the JSON-RPC URL
+    json_rpc_env: str
+
+    #: Chain needs POA middleware for block headers
+    poa: bool = False
+
+
+#: All live deployments, see README
+DEPLOYMENTS = {
+    d.name: d for d in [
+        Deployment("arbitrum", 42161, "0xDCD7C644a6AA72eb2f86781175b18ADc30Aa4f4d", "JSON_RPC_ARBITRUM"),
+        Deployment("polygon", 137, "0xbe1418df0bAd87577de1A41385F19c6e77312780", "JSON_RPC_POLYGON", poa=True),
+        Deployment("ethereum", 1, "0xd63c1bE9D8B56CCcD6fd2Dd9F9c030c6a9916f5F", "JSON_RPC_ETHEREUM"),
+        Deployment("base", 8453, "0x7f0a89b113e5d36daf001cd6c50a7f68a6172281", "JSON_RPC_BASE", poa=True),
+    ]
+}
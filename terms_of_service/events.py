@@ -0,0 +1,175 @@
+"""Decode and query `TermsOfService` event logs.
+
+- `Signed` has signer, version and hash as topics, `UpdateTermsOfService` and
+  `UpdateTermsOfServiceTyped` have version and acceptance message hash as topics
+
+- :py:func:`get_signed_logs` uses `eth_getLogs` topic filters, so the history of one address
+  only reads the logs of that address instead of every `Signed` log of the contract
+
+- Deployments made before the parameters were indexed emit the same event signatures
+  with everything in the log data. Both layouts have the same topic 0 and are told apart
+  by the number of topics, so :py:class:`EventDecoder` reads either.
+  Topic filters do not match the old layout, so :py:func:`get_signed_logs` reads
+  every `Signed` log of such deployments and filters them after decoding.
+
+Example::
+
+    for event in get_signed_logs(web3, contract_address, signer=user_address):
+        print(event["blockNumber"], event["args"]["version"])
+"""
+
+from eth_abi import encode
+from eth_utils import event_abi_to_log_topic, to_checksum_address
+from web3 import AsyncWeb3, Web3
+from web3.contract.contract import Contract
+from web3.types import EventData, LogReceipt
+
+from terms_of_service.abi import get_contract
+
+#: `Signed` and `UpdateTermsOfService` of deployments made before the parameters were indexed
+LEGACY_EVENTS_ABI = [
+    {
+        "type": "event",
+        "name": "Signed",
+        "inputs": [
+            {"name": "signer", "type": "address", "indexed": False},
+            {"name": "version", "type": "uint16", "indexed": False},
+            {"name": "hash", "type": "bytes32", "indexed": False},
+            {"name": "metadata", "type": "bytes", "indexed": False},
+        ],
+        "anonymous": False,
+    },
+    {
+        "type": "event",
+        "name": "UpdateTermsOfService",
+        "inputs": [
+            {"name": "version", "type": "uint16", "indexed": False},
+            {"name": "acceptanceMessageHash", "type": "bytes32", "indexed": False},
+            {"name": "acceptanceMessage", "type": "string", "indexed": False},
+        ],
+        "anonymous": False,
+    },
+]
+
+EVENT_NAMES = ("Signed", "UpdateTermsOfService", "UpdateTermsOfServiceTyped")
+
+
+class EventDecoder:
+    """Decode `Signed`, `UpdateTermsOfService` and `UpdateTermsOfServiceTyped` logs of both layouts."""
+
+    def __init__(self, contract: Contract):
+        legacy_contract = contract.w3.eth.contract(abi=LEGACY_EVENTS_ABI)
+        legacy_names = {abi["name"] for abi in LEGACY_EVENTS_ABI}
+
+        #: Event name -> topic 0
+        self.topics = {}
+
+        #: Topic 0 -> (event, legacy event or None)
+        self.events = {}
+        for name in EVENT_NAMES:
+            event = getattr(contract.events, name)()
+            legacy = getattr(legacy_contract.events, name)() if name in legacy_names else None
+            self.topics[name] = event_abi_to_log_topic(event.abi)
+            self.events[self.topics[name]] = (event, legacy)
+
+    def decode(self, log: LogReceipt) -> EventData | None:
+        """Decode a log.
+
+        :return:
+            Event data with the event name in ``event``, or ``None`` for other events
+        """
+        events = self.events.get(bytes(log["topics"][0]))
+        if events is None:
+            return None
+        event, legacy = events
+        if legacy is not None and len(log["topics"]) == 1:
+            return legacy.process_log(log)
+        return event.process_log(log)
+
+    def has_legacy_layout(self, web3: Web3, address: str) -> bool:
+        """Does a deployment emit events without indexed parameters.
+
+        Told apart by the topics of its `UpdateTermsOfService` logs,
+        so only the handful of terms of service updates are read.
+        """
+        logs = web3.eth.get_logs({
+            "address": address,
+            "fromBlock": 0,
+            "toBlock": "latest",
+            "topics": ["0x" + self.topics["UpdateTermsOfService"].hex()],
+        })
+        return any(len(log["topics"]) == 1 for log in logs)
+
+
+def _topic(abi_type: str, value) -> str | None:
+    if value is None:
+        return None
+    return "0x" + encode([abi_type], [value]).hex()
+
+
+def get_signed_topics(decoder: EventDecoder, signer: str | None = None, version: int | None = None, hash: bytes | None = None) -> list:
+    """Build an `eth_getLogs` topic filter for `Signed`. ``None`` matches anything."""
+    topics = [
+        "0x" + decoder.topics["Signed"].hex(),
+        _topic("address", to_checksum_address(signer) if signer else None),
+        _topic("uint16", version),
+        _topic("bytes32", hash),
+    ]
+    # Trailing wildcards can be left out
+    while topics[-1] is None:
+        topics.pop()
+    return topics
+
+
+def get_signed_logs(
+    web3: Web3,
+    contract_address: str,
+    signer: str | None = None,
+    version: int | None = None,
+    hash: bytes | None = None,
+    from_block: int = 0,
+    to_block: int | str = "latest",
+) -> list[EventData]:
+    """Read `Signed` events with topic filters.
+
+    Deployments with the legacy event layout cannot be filtered by topics.
+    All their `Signed` logs in the block range are read and filtered after decoding.
+
+    :param signer:
+        Only acceptances of this address
+
+    :param version:
+        Only acceptances of this terms of service version
+
+    :param hash:
+        Only acceptances of this acceptance message hash
+
+    :return:
+        Decoded events, oldest first
+    """
+    assert not isinstance(web3, AsyncWeb3), "Use a sync Web3 instance"
+    contract = get_contract(web3, contract_address)
+    decoder = EventDecoder(contract)
+
+    if not decoder.has_legacy_layout(web3, contract.address):
+        logs = web3.eth.get_logs({
+            "address": contract.address,
+            "fromBlock": from_block,
+            "toBlock": to_block,
+            "topics": get_signed_topics(decoder, signer, version, hash),
+        })
+        return [decoder.decode(log) for log in logs]
+
+    logs = web3.eth.get_logs({
+        "address": contract.address,
+        "fromBlock": from_block,
+        "toBlock": to_block,
+        "topics": get_signed_topics(decoder),
+    })
+    events = [decoder.decode(log) for log in logs]
+    return [
+        e for e in events
+        if (signer is None or e["args"]["signer"] == to_checksum_address(signer))
+        and (version is None or e["args"]["version"] == version)
+        and (hash is None or e["args"]["hash"] == bytes(hash))
+    ]
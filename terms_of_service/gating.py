@@ -0,0 +1,233 @@
+"""Answer "can this address proceed?" from memory.
+
+- Keeps the set of addresses that have accepted the current `latestAcceptanceMessageHash`
+  in memory, so checks are a set lookup instead of a blocking `canAddressProceed` RPC call
+
+- The set is built from historical `Signed` logs and kept up to date
+  by polling new logs in a background asyncio task
+
+- When `UpdateTermsOfService` or `UpdateTermsOfServiceTyped` publishes a new version, the set is swapped atomically
+  to a new empty set, as nobody has signed the new version yet, and memoized acceptance messages are dropped
+
+- Chain reorganisations are detected by comparing recent block hashes to the chain, same as
+  :py:class:`terms_of_service.indexer.AcceptanceIndexer`, and acceptances and versions
+  from the dropped blocks are rolled back. Use `confirmations` to only serve settled blocks.
+
+Example::
+
+    web3 = AsyncWeb3(AsyncHTTPProvider(json_rpc_url))
+    gate = AcceptanceGate(web3, "0xbe1418df0bAd87577de1A41385F19c6e77312780", start_block=deployment_block)
+    await gate.start()
+
+    if not gate.can_address_proceed(address):
+        ...
+
+    await gate.stop()
+"""
+
+import asyncio
+import collections
+import dataclasses
+import logging
+
+from web3 import AsyncWeb3
+from web3.exceptions import BlockNotFound
+
+from terms_of_service.abi import get_contract
+from terms_of_service.acceptance_message import clear_acceptance_message_cache
+from terms_of_service.events import EventDecoder
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass
+class GateState:
+    """Acceptances of the latest version.
+
+    A new state object is created for each version,
+    new signers of the same version are added in place.
+    """
+
+    #: Latest terms of service version, 0 if not initialised
+    version: int
+
+    #: Latest acceptance message hash
+    acceptance_message_hash: bytes | None
+
+    #: Lowercased addresses that have accepted the latest version -> block number of the acceptance
+    accepted: dict[str, int]
+
+    #: Block number of the version update, -1 if not initialised
+    block_number: int = -1
+
+
+class AcceptanceGate:
+    """In-memory acceptance check for the latest terms of service version."""
+
+    def __init__(
+        self,
+        web3: AsyncWeb3,
+        contract_address: str,
+        start_block: int = 0,
+        chunk_size: int = 10_000,
+        poll_interval: float = 2.0,
+        confirmations: int = 0,
+        reorg_depth: int = 64,
+    ):
+        """
+        :param start_block:
+            Contract deployment block
+
+        :param chunk_size:
+            How many blocks to read per `eth_getLogs`
+
+        :param poll_interval:
+            Seconds between polling new logs
+
+        :param confirmations:
+            Only read blocks this deep below the chain head
+
+        :param reorg_depth:
+            How many recent block hashes to keep for reorg detection
+        """
+        self.web3 = web3
+        self.start_block = start_block
+        self.chunk_size = chunk_size
+        self.poll_interval = poll_interval
+        self.confirmations = confirmations
+        self.contract = get_contract(web3, contract_address)
+        self.decoder = EventDecoder(self.contract)
+        self.state = GateState(version=0, acceptance_message_hash=None, accepted={})
+        self.last_block = start_block - 1
+
+        #: (block number, block hash) of synced chunk ends, most recent last
+        self.checkpoints: collections.deque[tuple[int, bytes]] = collections.deque(maxlen=reorg_depth)
+
+        #: States replaced by version updates, to restore if the update is reorganised away
+        self.previous_states: collections.deque[GateState] = collections.deque(maxlen=reorg_depth)
+
+        self._task: asyncio.Task | None = None
+
+    def can_address_proceed(self, address: str) -> bool:
+        """Has the address accepted the latest terms of service version.
+
+        Same as `canAddressProceed` of the contract, but served from memory.
+        """
+        state = self.state
+        assert state.version != 0, "Terms of service not initialised"
+        return address.lower() in state.accepted
+
+    def _apply_logs(self, logs: list):
+        for log in logs:
+            event = self.decoder.decode(log)
+            args = event["args"]
+            if event["event"] in ("UpdateTermsOfService", "UpdateTermsOfServiceTyped"):
+                # Swap the whole state, so readers never see a new version with old signers
+                self.previous_states.append(self.state)
+                self.state = GateState(
+                    version=args["version"],
+                    acceptance_message_hash=bytes(args["acceptanceMessageHash"]),
+                    accepted={},
+                    block_number=log["blockNumber"],
+                )
+                clear_acceptance_message_cache()
+                logger.info("Terms of service updated to version %d", args["version"])
+            elif event["event"] == "Signed":
+                if bytes(args["hash"]) == self.state.acceptance_message_hash:
+                    self.state.accepted[args["signer"].lower()] = log["blockNumber"]
+
+    async def get_block_hash(self, block_number: int) -> bytes | None:
+        try:
+            return (await self.web3.eth.get_block(block_number))["hash"]
+        except BlockNotFound:
+            return None
+
+    def rewind(self, block_number: int):
+        """Drop versions and acceptances after a block."""
+        state = self.state
+        while state.block_number > block_number:
+            if not self.previous_states:
+                # Update older than our history, start over
+                self.reset()
+                return
+            state = self.previous_states.pop()
+        self.state = dataclasses.replace(state, accepted={a: b for a, b in state.accepted.items() if b <= block_number})
+        while self.checkpoints and self.checkpoints[-1][0] > block_number:
+            self.checkpoints.pop()
+        self.last_block = block_number
+
+    def reset(self):
+        """Forget everything and read the logs again from `start_block` on the next sync."""
+        self.state = GateState(version=0, acceptance_message_hash=None, accepted={})
+        self.previous_states.clear()
+        self.checkpoints.clear()
+        self.last_block = self.start_block - 1
+
+    async def check_reorg(self) -> int | None:
+        """Rewind if our checkpoints are no longer on the canonical chain.
+
+        :return:
+            The block number we rewound to, or ``None`` if there was no reorg
+        """
+        if not self.checkpoints:
+            return None
+
+        block_number, block_hash = self.checkpoints[-1]
+        if await self.get_block_hash(block_number) == block_hash:
+            return None
+
+        for block_number, block_hash in reversed(list(self.checkpoints)[:-1]):
+            if await self.get_block_hash(block_number) == block_hash:
+                logger.warning("Chain reorganisation detected, rewinding to block %d", block_number)
+                self.rewind(block_number)
+                return block_number
+
+        logger.warning("Chain reorganisation deeper than %d checkpoints, reloading from %d", len(self.checkpoints), self.start_block)
+        self.reset()
+        return self.start_block - 1
+
+    async def sync(self) -> int:
+        """Read new logs up to `confirmations` blocks below the chain head.
+
+        :return:
+            Number of events processed
+        """
+        await self.check_reorg()
+        end_block = await self.web3.eth.block_number - self.confirmations
+        total = 0
+        while self.last_block < end_block:
+            chunk_start = self.last_block + 1
+            chunk_end = min(chunk_start + self.chunk_size - 1, end_block)
+            logs = await self.web3.eth.get_logs({
+                "address": self.contract.address,
+                "fromBlock": chunk_start,
+                "toBlock": chunk_end,
+                "topics": [list(self.decoder.events)],
+            })
+            self._apply_logs(logs)
+            self.checkpoints.append((chunk_end, await self.get_block_hash(chunk_end)))
+            self.last_block = chunk_end
+            total += len(logs)
+        return total
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.warning("Polling terms of service logs failed: %s", e)
+
+    async def start(self):
+        """Load the historical logs and start polling for new ones."""
+        await self.sync()
+        self._task = asyncio.create_task(self._poll())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,341 @@
+"""Index terms of service acceptances from event logs.
+
+- Reads `Signed`, `UpdateTermsOfService` and `UpdateTermsOfServiceTyped` events of a `TermsOfService` contract
+  in chunked block ranges and writes them to a local SQLite database
+
+- Acceptance checks can be then served from the local database
+  without `eth_call` per user
+
+- The last indexed block is persisted, so the indexer continues where it left off after restart
+
+- Chain reorganisations are detected by comparing stored block hashes
+  to the chain and the store is rewound to the last block that is still canonical
+
+Example::
+
+    store = AcceptanceStore("acceptances.sqlite")
+    indexer = AcceptanceIndexer(web3, "0xbe1418df0bAd87577de1A41385F19c6e77312780", store)
+    indexer.sync()
+    assert store.can_address_proceed(user_address)
+"""
+
+import logging
+import sqlite3
+import time
+from pathlib import Path
+
+from eth_utils import to_checksum_address
+from web3 import Web3
+from web3.exceptions import BlockNotFound
+
+from terms_of_service.abi import get_contract
+from terms_of_service.acceptance_message import clear_acceptance_message_cache
+from terms_of_service.events import EventDecoder
+
+logger = logging.getLogger(__name__)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    block_number INTEGER PRIMARY KEY,
+    block_hash BLOB NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS pinned_checkpoints (
+    block_number INTEGER PRIMARY KEY
+);
+
+CREATE TABLE IF NOT EXISTS versions (
+    version INTEGER PRIMARY KEY,
+    hash BLOB NOT NULL,
+    acceptance_message TEXT NOT NULL,
+    block_number INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS acceptances (
+    signer TEXT NOT NULL,
+    hash BLOB NOT NULL,
+    version INTEGER NOT NULL,
+    metadata BLOB NOT NULL,
+    block_number INTEGER NOT NULL,
+    PRIMARY KEY (signer, hash)
+);
+
+CREATE INDEX IF NOT EXISTS acceptances_block_number ON acceptances (block_number);
+"""
+
+
+class AcceptanceStore:
+    """SQLite backed terms of service acceptance database.
+
+    Mirrors the read functions of the `TermsOfService` contract.
+    Use ``":memory:"`` as the path for a non-persistent store.
+    """
+
+    def __init__(self, path: str | Path = ":memory:"):
+        self.connection = sqlite3.connect(str(path), check_same_thread=False)
+        self.connection.executescript(_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def get_last_block(self) -> tuple[int, bytes] | None:
+        """Get the last indexed block.
+
+        :return:
+            Tuple (block number, block hash) or ``None`` if nothing has been indexed yet
+        """
+        return self.connection.execute("SELECT block_number, block_hash FROM checkpoints ORDER BY block_number DESC LIMIT 1").fetchone()
+
+    def get_checkpoints(self) -> list[tuple[int, bytes]]:
+        """Get stored block hashes, newest first."""
+        return self.connection.execute("SELECT block_number, block_hash FROM checkpoints ORDER BY block_number DESC").fetchall()
+
+    def add_checkpoint(self, block_number: int, block_hash: bytes, keep: int):
+        """Record an indexed block and prune old checkpoints.
+
+        :param keep:
+            How many most recent checkpoints to keep for reorg detection.
+            Pinned checkpoints are kept in addition.
+        """
+        self.connection.execute("INSERT OR REPLACE INTO checkpoints VALUES (?, ?)", (block_number, bytes(block_hash)))
+        self.connection.execute(
+            "DELETE FROM checkpoints WHERE block_number NOT IN (SELECT block_number FROM checkpoints ORDER BY block_number DESC LIMIT ?) "
+            "AND block_number NOT IN (SELECT block_number FROM pinned_checkpoints)",
+            (keep,)
+        )
+
+    def pin_checkpoint(self, block_number: int):
+        """Keep the checkpoint of a block when pruning, e.g. the last block of a snapshot."""
+        self.connection.execute("INSERT OR IGNORE INTO pinned_checkpoints VALUES (?)", (block_number,))
+        self.connection.commit()
+
+    def unpin_checkpoint(self, block_number: int):
+        """Let the checkpoint of a block be pruned again."""
+        self.connection.execute("DELETE FROM pinned_checkpoints WHERE block_number = ?", (block_number,))
+        self.connection.commit()
+
+    def add_version(self, version: int, hash: bytes, acceptance_message: str, block_number: int):
+        self.connection.execute("INSERT OR REPLACE INTO versions VALUES (?, ?, ?, ?)", (version, bytes(hash), acceptance_message, block_number))
+
+    def add_acceptance(self, signer: str, hash: bytes, version: int, metadata: bytes, block_number: int):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO acceptances VALUES (?, ?, ?, ?, ?)",
+            (to_checksum_address(signer), bytes(hash), version, bytes(metadata), block_number)
+        )
+
+    def rewind(self, block_number: int):
+        """Delete everything indexed after the given block."""
+        for table in ("checkpoints", "pinned_checkpoints", "versions", "acceptances"):
+            self.connection.execute(f"DELETE FROM {table} WHERE block_number > ?", (block_number,))
+        self.connection.commit()
+
+    def commit(self):
+        self.connection.commit()
+
+    def get_latest_version(self) -> tuple[int, bytes] | None:
+        """Get the latest terms of service version.
+
+        :return:
+            Tuple (version, acceptance message hash) or ``None`` if not initialised
+        """
+        return self.connection.execute("SELECT version, hash FROM versions ORDER BY version DESC LIMIT 1").fetchone()
+
+    def get_text_hash(self, version: int) -> bytes | None:
+        row = self.connection.execute("SELECT hash FROM versions WHERE version = ?", (version,)).fetchone()
+        return row[0] if row else None
+
+    def has_accepted_hash(self, account: str, acceptance_message_hash: bytes) -> bool:
+        row = self.connection.execute(
+            "SELECT 1 FROM acceptances WHERE signer = ? AND hash = ?",
+            (to_checksum_address(account), bytes(acceptance_message_hash))
+        ).fetchone()
+        return row is not None
+
+    def has_accepted_version(self, account: str, version: int) -> bool:
+        hash = self.get_text_hash(version)
+        assert hash is not None, f"No such version: {version}"
+        return self.has_accepted_hash(account, hash)
+
+    def can_address_proceed(self, account: str) -> bool:
+        latest = self.get_latest_version()
+        assert latest is not None, "Terms of service not initialised"
+        return self.has_accepted_hash(account, latest[1])
+
+    def get_signers(self, version: int) -> list[str]:
+        """Get all addresses that accepted a terms of service version."""
+        return [row[0] for row in self.connection.execute("SELECT signer FROM acceptances WHERE version = ? ORDER BY signer", (version,))]
+
+    def get_versions(self) -> list[tuple[int, bytes]]:
+        """Get all published versions.
+
+        :return:
+            List of (version, acceptance message hash), oldest first
+        """
+        return self.connection.execute("SELECT version, hash FROM versions ORDER BY version").fetchall()
+
+    def get_acceptances(self, after_block: int = -1) -> list[tuple[str, int, bytes, bytes]]:
+        """Get acceptances indexed after a block.
+
+        :return:
+            List of (signer, version, acceptance message hash, metadata)
+        """
+        return self.connection.execute(
+            "SELECT signer, version, hash, metadata FROM acceptances WHERE block_number > ? ORDER BY version, signer",
+            (after_block,)
+        ).fetchall()
+
+
+class AcceptanceIndexer:
+    """Stream terms of service events to :py:class:`AcceptanceStore`."""
+
+    def __init__(
+        self,
+        web3: Web3,
+        contract_address: str,
+        store: AcceptanceStore,
+        start_block: int = 0,
+        chunk_size: int = 10_000,
+        reorg_depth: int = 64,
+        max_attempts: int = 5,
+        retry_delay: float = 1.0,
+    ):
+        """
+        :param start_block:
+            Contract deployment block
+
+        :param chunk_size:
+            How many blocks to read per `eth_getLogs`
+
+        :param reorg_depth:
+            How many recent block hashes to keep for reorg detection
+
+        :param max_attempts:
+            How many times a chunk is read before giving up
+            when its end block is missing or replaced while reading the logs
+
+        :param retry_delay:
+            Seconds to wait between reading a chunk again
+        """
+        self.web3 = web3
+        self.store = store
+        self.start_block = start_block
+        self.chunk_size = chunk_size
+        self.reorg_depth = reorg_depth
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.contract = get_contract(web3, contract_address)
+        self.decoder = EventDecoder(self.contract)
+
+    def get_block_hash(self, block_number: int) -> bytes | None:
+        try:
+            return self.web3.eth.get_block(block_number)["hash"]
+        except BlockNotFound:
+            return None
+
+    def check_reorg(self) -> int | None:
+        """Rewind the store if our checkpoints are no longer on the canonical chain.
+
+        :return:
+            The block number we rewound to, or ``None`` if there was no reorg
+        """
+        checkpoints = self.store.get_checkpoints()
+        if not checkpoints:
+            return None
+
+        if self.get_block_hash(checkpoints[0][0]) == checkpoints[0][1]:
+            return None
+
+        for block_number, block_hash in checkpoints[1:]:
+            if self.get_block_hash(block_number) == block_hash:
+                logger.warning("Chain reorganisation detected, rewinding to block %d", block_number)
+                self.store.rewind(block_number)
+                return block_number
+
+        # Reorg deeper than our checkpoint history, start over
+        rewind_to = self.start_block - 1
+        logger.warning("Chain reorganisation deeper than %d checkpoints, reindexing from %d", len(checkpoints), self.start_block)
+        self.store.rewind(rewind_to)
+        return rewind_to
+
+    def process_chunk(self, start_block: int, end_block: int) -> int:
+        """Index events from a block range, inclusive.
+
+        The end block hash is read before and after the logs, so the stored checkpoint
+        is the block the logs were read from. If the node does not have the end block yet,
+        or it is reorganised away in between, the chunk is read again.
+
+        :return:
+            Number of events processed
+
+        :raise BlockNotFound:
+            The end block is not stable after `max_attempts` reads
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            end_block_hash = self.get_block_hash(end_block)
+            if end_block_hash is not None:
+                logs = self.web3.eth.get_logs({
+                    "address": self.contract.address,
+                    "fromBlock": start_block,
+                    "toBlock": end_block,
+                    "topics": [list(self.decoder.events)],
+                })
+                if self.get_block_hash(end_block) == end_block_hash:
+                    break
+            logger.warning("Block %d missing or replaced while reading logs, attempt %d", end_block, attempt)
+            if attempt < self.max_attempts:
+                time.sleep(self.retry_delay)
+        else:
+            raise BlockNotFound(f"Block {end_block} missing or replaced after {self.max_attempts} attempts")
+
+        for log in logs:
+            event = self.decoder.decode(log)
+            args = event["args"]
+            if event["event"] == "UpdateTermsOfService":
+                self.store.add_version(args["version"], args["acceptanceMessageHash"], args["acceptanceMessage"], log["blockNumber"])
+                clear_acceptance_message_cache()
+            elif event["event"] == "UpdateTermsOfServiceTyped":
+                # Typed versions have no message text
+                self.store.add_version(args["version"], args["acceptanceMessageHash"], "", log["blockNumber"])
+                clear_acceptance_message_cache()
+            elif event["event"] == "Signed":
+                self.store.add_acceptance(args["signer"], args["hash"], args["version"], args["metadata"], log["blockNumber"])
+
+        self.store.add_checkpoint(end_block, end_block_hash, keep=self.reorg_depth)
+        self.store.commit()
+        return len(logs)
+
+    def sync(self, end_block: int | None = None) -> int:
+        """Index everything up to the given block.
+
+        :param end_block:
+            Last block to index. Default to the chain head.
+
+        :return:
+            Number of events processed
+        """
+        self.check_reorg()
+
+        if end_block is None:
+            end_block = self.web3.eth.block_number
+
+        last = self.store.get_last_block()
+        cursor = last[0] + 1 if last else self.start_block
+
+        total = 0
+        while cursor <= end_block:
+            chunk_end = min(cursor + self.chunk_size - 1, end_block)
+            total += self.process_chunk(cursor, chunk_end)
+            logger.info("Indexed blocks %d - %d", cursor, chunk_end)
+            cursor = chunk_end + 1
+        return total
+
+    def run(self, poll_interval: float = 5.0):
+        """Keep the store up to date forever."""
+        while True:
+            try:
+                self.sync()
+            except BlockNotFound as e:
+                # Continue from the last committed chunk on the next poll
+                logger.warning("Indexing stopped: %s", e)
+            time.sleep(poll_interval)
@@ -0,0 +1,439 @@
+"""Collect terms of service acceptances over HTTP and relay them in batches.
+
+- Submissions of (signer, hash, signature, metadata) are validated off-chain,
+  see :py:mod:`terms_of_service.signature_verification`
+
+- Repeated submissions of the same signer and hash, e.g. when a wallet hangs and the user retries,
+  are dropped against a seen-set and already accepted signers against indexed on-chain state,
+  instead of turning into transactions that revert with "Already signed".
+  Relayed submissions leave the seen-set once the indexed state has them, or after `seen_ttl`.
+
+- A batch that fails to flush is split in halves and retried, so one bad submission
+  does not drop the others. Failing submissions are queued again up to `max_attempts` times.
+
+- Accepted submissions are grouped by acceptance message hash and flushed
+  when a group reaches `max_batch_size` or its oldest submission has waited `window` seconds,
+  so one `signTermsOfServiceBehalfBatch` transaction covers many users
+
+- Queue depth and flush latency are exposed at ``GET /status`` and in
+  :py:mod:`terms_of_service.metrics`
+
+Example::
+
+    def flush(acceptance_message_hash: bytes, batch: list[Submission]):
+        tx_hash = contract.functions.signTermsOfServiceBehalfBatch(
+            [s.signer for s in batch],
+            acceptance_message_hash,
+            [s.signature for s in batch],
+            [s.metadata for s in batch],
+        ).transact({"from": relayer})
+        web3.eth.wait_for_transaction_receipt(tx_hash)
+
+    snapshot = AcceptanceSnapshot("acceptances.snapshot")
+    ingestor = AcceptanceIngestor(flush, already_accepted=snapshot.has_accepted_hash, acceptance_message_hash=latest_hash)
+    ingestor.start()
+    server = start_ingestion_server(ingestor, port=8080)
+
+    # curl -X POST http://127.0.0.1:8080/acceptances -d '{"signer": "0x...", "hash": "0x...", "signature": "0x...", "metadata": "0x"}'
+"""
+
+import dataclasses
+import enum
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+from eth_utils import is_address, to_checksum_address
+from web3 import Web3
+
+from terms_of_service.metrics import INGESTED_SUBMISSIONS, INGESTION_FLUSH_SECONDS, INGESTION_QUEUE_DEPTH, REGISTRY
+from terms_of_service.signature_verification import EIP1271VerificationCache, recover_signer
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass(frozen=True)
+class Submission:
+    """One acceptance to be relayed with `signTermsOfServiceBehalf`."""
+
+    signer: str
+    hash: bytes
+    signature: bytes
+    metadata: bytes
+
+
+class SubmissionStatus(enum.Enum):
+    """Outcome of :py:meth:`AcceptanceIngestor.submit`."""
+
+    #: Queued for the next batch
+    queued = "queued"
+
+    #: Same signer and hash already queued or relayed
+    duplicate = "duplicate"
+
+    #: Signer has already accepted the hash on chain
+    already_accepted = "already_accepted"
+
+    #: Not the current acceptance message hash, or the signature is not valid
+    invalid = "invalid"
+
+
+class AcceptanceIngestor:
+    """Deduplicate submissions and flush them in batches from a background thread."""
+
+    def __init__(
+        self,
+        flush: Callable[[bytes, list[Submission]], None],
+        already_accepted: Callable[[str, bytes], bool] | None = None,
+        acceptance_message_hash: bytes | None = None,
+        web3: Web3 | None = None,
+        eip_1271_cache: EIP1271VerificationCache | None = None,
+        max_batch_size: int = 50,
+        window: float = 2.0,
+        max_attempts: int = 3,
+        seen_ttl: float = 3600.0,
+        prune_interval: float = 30.0,
+    ):
+        """
+        :param flush:
+            Called with an acceptance message hash and its batch of submissions, from the flusher thread.
+            If it raises, the batch is split in halves and retried.
+
+        :param already_accepted:
+            Check indexed on-chain state, e.g. :py:meth:`terms_of_service.snapshot.AcceptanceSnapshot.has_accepted_hash`
+            or :py:meth:`terms_of_service.indexer.AcceptanceStore.has_accepted_hash`.
+            Called from HTTP handler threads and the flusher thread, one call at a time.
+
+        :param acceptance_message_hash:
+            Only accept submissions for this hash. Update the attribute when a new version is published.
+
+        :param web3:
+            Verify signatures of smart contract wallets with EIP-1271 `isValidSignature`.
+            Without `web3`, only EOA signatures are accepted.
+
+        :param eip_1271_cache:
+            Cache for smart contract wallet verifications
+
+        :param max_batch_size:
+            Flush a group when it has this many submissions
+
+        :param window:
+            Flush a group when its oldest submission has waited this many seconds
+
+        :param max_attempts:
+            How many times a submission is flushed before it is forgotten and can be submitted again
+
+        :param seen_ttl:
+            Forget relayed submissions after this many seconds, even if `already_accepted` does not have them
+
+        :param prune_interval:
+            Seconds between checking relayed submissions against `already_accepted`
+        """
+        self.flush = flush
+        self.already_accepted = already_accepted
+        self.acceptance_message_hash = acceptance_message_hash
+        self.web3 = web3
+        self.eip_1271_cache = eip_1271_cache or EIP1271VerificationCache()
+        self.max_batch_size = max_batch_size
+        self.window = window
+        self.max_attempts = max_attempts
+        self.seen_ttl = seen_ttl
+        self.prune_interval = prune_interval
+
+        #: (signer, hash) of queued and relayed submissions
+        self.seen: set[tuple[str, bytes]] = set()
+
+        #: (signer, hash) of relayed submissions -> when flushed, oldest first
+        self.relayed: OrderedDict[tuple[str, bytes], float] = OrderedDict()
+
+        #: (signer, hash) -> failed flush attempts of queued submissions
+        self.attempts: dict[tuple[str, bytes], int] = {}
+
+        #: Acceptance message hash -> (first queued at, submissions)
+        self.pending: dict[bytes, tuple[float, list[Submission]]] = {}
+
+        self.flushed_batches = 0
+        self.failed_batches = 0
+        self.dropped_submissions = 0
+        self.last_flush_seconds: float | None = None
+
+        self._condition = threading.Condition()
+        # SQLite backed checks, e.g. AcceptanceStore, must not be used concurrently
+        self._already_accepted_lock = threading.Lock()
+        self._last_prune = time.monotonic()
+        self._thread: threading.Thread | None = None
+        self._stopping = False
+
+    @property
+    def queue_depth(self) -> int:
+        with self._condition:
+            return sum(len(batch) for _, batch in self.pending.values())
+
+    def _is_already_accepted(self, signer: str, hash: bytes) -> bool:
+        if self.already_accepted is None:
+            return False
+        with self._already_accepted_lock:
+            return self.already_accepted(signer, hash)
+
+    def _is_valid_signature(self, submission: Submission) -> bool:
+        if recover_signer(submission.hash, submission.signature) == submission.signer:
+            return True
+        if self.web3 is None:
+            return False
+        # isValidSignature of an account without code returns nothing and is cached as invalid
+        return self.eip_1271_cache.verify(self.web3, submission.signer, submission.hash, submission.signature)
+
+    def submit(self, submission: Submission) -> SubmissionStatus:
+        """Validate and queue a submission.
+
+        Thread safe.
+        """
+        key = (submission.signer, submission.hash)
+
+        if self.acceptance_message_hash is not None and submission.hash != self.acceptance_message_hash:
+            status = SubmissionStatus.invalid
+        elif key in self.seen:
+            status = SubmissionStatus.duplicate
+        elif self._is_already_accepted(submission.signer, submission.hash):
+            status = SubmissionStatus.already_accepted
+        elif not self._is_valid_signature(submission):
+            status = SubmissionStatus.invalid
+        else:
+            with self._condition:
+                # Another thread may have queued the same submission while we verified
+                if key in self.seen:
+                    status = SubmissionStatus.duplicate
+                else:
+                    self.seen.add(key)
+                    first_queued_at, batch = self.pending.setdefault(submission.hash, (time.monotonic(), []))
+                    batch.append(submission)
+                    if len(batch) >= self.max_batch_size:
+                        self._condition.notify()
+                    status = SubmissionStatus.queued
+                    if REGISTRY.enabled:
+                        INGESTION_QUEUE_DEPTH.set(self.queue_depth)
+
+        if REGISTRY.enabled:
+            INGESTED_SUBMISSIONS.inc(status.value)
+        return status
+
+    def _take_ready(self, force: bool) -> list[tuple[bytes, list[Submission]]]:
+        now = time.monotonic()
+        ready = []
+        for acceptance_message_hash, (first_queued_at, batch) in list(self.pending.items()):
+            if force or len(batch) >= self.max_batch_size or now - first_queued_at >= self.window:
+                del self.pending[acceptance_message_hash]
+                # Groups that grew past max_batch_size before the flusher woke up are split
+                for i in range(0, len(batch), self.max_batch_size):
+                    ready.append((acceptance_message_hash, batch[i:i + self.max_batch_size]))
+        return ready
+
+    def _flush_batch(self, acceptance_message_hash: bytes, batch: list[Submission]) -> tuple[list[Submission], list[Submission]]:
+        """Flush a batch, bisecting it on failure to isolate the failing submissions.
+
+        :return:
+            Tuple (flushed, failed)
+        """
+        started = time.perf_counter()
+        try:
+            self.flush(acceptance_message_hash, batch)
+            self.flushed_batches += 1
+            return batch, []
+        except Exception as e:
+            logger.error("Flushing %d acceptances failed: %s", len(batch), e, exc_info=e)
+            self.failed_batches += 1
+            if len(batch) == 1:
+                return [], batch
+        finally:
+            self.last_flush_seconds = time.perf_counter() - started
+            if REGISTRY.enabled:
+                INGESTION_FLUSH_SECONDS.observe(self.last_flush_seconds)
+
+        middle = len(batch) // 2
+        first_flushed, first_failed = self._flush_batch(acceptance_message_hash, batch[:middle])
+        second_flushed, second_failed = self._flush_batch(acceptance_message_hash, batch[middle:])
+        return first_flushed + second_flushed, first_failed + second_failed
+
+    def flush_ready(self, force: bool = False) -> int:
+        """Flush groups that are full or have waited long enough.
+
+        Failed submissions are queued again, and forgotten after `max_attempts`.
+
+        :param force:
+            Flush everything
+
+        :return:
+            Number of submissions flushed
+        """
+        with self._condition:
+            ready = self._take_ready(force)
+            if REGISTRY.enabled:
+                INGESTION_QUEUE_DEPTH.set(self.queue_depth)
+
+        flushed = 0
+        for acceptance_message_hash, batch in ready:
+            ok, failed = self._flush_batch(acceptance_message_hash, batch)
+            flushed += len(ok)
+            with self._condition:
+                now = time.monotonic()
+                for submission in ok:
+                    key = (submission.signer, submission.hash)
+                    self.attempts.pop(key, None)
+                    self.relayed[key] = now
+                for submission in failed:
+                    key = (submission.signer, submission.hash)
+                    attempts = self.attempts.get(key, 0) + 1
+                    if attempts < self.max_attempts:
+                        # Retried when the group has waited `window` again
+                        self.attempts[key] = attempts
+                        self.pending.setdefault(submission.hash, (now, []))[1].append(submission)
+                    else:
+                        logger.error("Dropping acceptance of %s after %d attempts", submission.signer, attempts)
+                        del self.attempts[key]
+                        self.seen.discard(key)
+                        self.dropped_submissions += 1
+                if REGISTRY.enabled:
+                    INGESTION_QUEUE_DEPTH.set(self.queue_depth)
+        return flushed
+
+    def prune_seen(self) -> int:
+        """Forget relayed submissions that `already_accepted` has, or that are older than `seen_ttl`.
+
+        After this, a repeated submission is answered from `already_accepted`,
+        so the seen-set only holds submissions in flight.
+
+        :return:
+            Number of forgotten submissions
+        """
+        now = time.monotonic()
+        with self._condition:
+            relayed = list(self.relayed.items())
+
+        expired = [key for key, flushed_at in relayed if now - flushed_at >= self.seen_ttl or self._is_already_accepted(*key)]
+
+        with self._condition:
+            for key in expired:
+                del self.relayed[key]
+                self.seen.discard(key)
+        return len(expired)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if self._stopping:
+                    break
+                self._condition.wait(timeout=self.window / 4)
+            self.flush_ready()
+            if time.monotonic() - self._last_prune >= self.prune_interval:
+                self.prune_seen()
+                self._last_prune = time.monotonic()
+        self.flush_ready(force=True)
+
+    def start(self):
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="acceptance-ingestor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the flusher thread after flushing everything queued."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def get_status(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "seen": len(self.seen),
+            "relayed": len(self.relayed),
+            "flushed_batches": self.flushed_batches,
+            "failed_batches": self.failed_batches,
+            "dropped_submissions": self.dropped_submissions,
+            "last_flush_seconds": self.last_flush_seconds,
+        }
+
+
+def parse_submission(data: dict) -> Submission:
+    """Parse a JSON submission with hex encoded fields.
+
+    :raise ValueError:
+        If a field is missing or malformed
+    """
+    try:
+        signer = data["signer"]
+        hash = bytes.fromhex(data["hash"].removeprefix("0x"))
+        signature = bytes.fromhex(data["signature"].removeprefix("0x"))
+        metadata = bytes.fromhex(data.get("metadata", "0x").removeprefix("0x"))
+    except (KeyError, AttributeError, TypeError) as e:
+        raise ValueError(f"Malformed submission: {e}") from e
+
+    if not isinstance(signer, str) or not is_address(signer):
+        raise ValueError(f"Not an address: {signer}")
+    if len(hash) != 32:
+        raise ValueError("Hash must be 32 bytes")
+    return Submission(to_checksum_address(signer), hash, signature, metadata)
+
+
+def start_ingestion_server(ingestor: AcceptanceIngestor, port: int = 0, host: str = "127.0.0.1", max_body_size: int = 64 * 1024):
+    """Serve ``POST /acceptances`` and ``GET /status`` from a background thread.
+
+    :param port:
+        Use 0 to pick a free port, read it from ``server.server_address``
+
+    :return:
+        `ThreadingHTTPServer`, call ``shutdown()`` to stop it
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, code: int, data: dict):
+            body = json.dumps(data).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path != "/status":
+                self.send_error(404)
+                return
+            self._reply(200, ingestor.get_status())
+
+        def do_POST(self):
+            if self.path != "/acceptances":
+                self.send_error(404)
+                return
+
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+            except ValueError:
+                length = -1
+            if length < 0:
+                self._reply(400, {"status": "invalid", "error": "Invalid Content-Length"})
+                return
+            if length > max_body_size:
+                self._reply(413, {"status": "invalid", "error": "Body too large"})
+                return
+
+            try:
+                submission = parse_submission(json.loads(self.rfile.read(length)))
+            except ValueError as e:
+                self._reply(400, {"status": "invalid", "error": str(e)})
+                return
+
+            status = ingestor.submit(submission)
+            code = {SubmissionStatus.queued: 202, SubmissionStatus.invalid: 400}.get(status, 200)
+            self._reply(code, {"status": status.value})
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
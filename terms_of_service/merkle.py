@@ -0,0 +1,132 @@
+"""Merkle trees of off-chain terms of service acceptances.
+
+- The owner collects acceptances off-chain, e.g. in a web app, builds a tree of
+  (address, acceptance message hash) leaves and publishes the root with `addAttestationRoot`
+
+- Users prove their acceptance with `canAddressProceedWithProof` or `hasAttestedHash`
+  instead of paying for `signTermsOfServiceBehalf`
+
+- Leaves and pairs are hashed the same way as OpenZeppelin `MerkleProof` and `StandardMerkleTree`:
+  double hashed ABI encoded leaves, sorted pair hashing
+
+- Built for millions of leaves: leaves are consumed from an iterator, each tree level
+  is kept in one flat `bytes` buffer and proofs are looked up by binary search
+  over the sorted leaf level, without a per-leaf index dictionary
+
+- Hashing uses `safe-pysha3` if it is installed, which is several times faster
+  than the default `eth_hash` backend for the millions of small inputs of a large tree
+
+Example::
+
+    tree = AcceptanceMerkleTree((row.address, acceptance_message_hash) for row in read_web_app_acceptances())
+    contract.functions.addAttestationRoot(tree.root).transact({"from": owner})
+
+    proof = tree.get_proof(user_address, acceptance_message_hash)
+    assert contract.functions.canAddressProceedWithProof(user_address, tree.root, proof).call()
+"""
+
+from typing import Iterable
+
+try:
+    from sha3 import keccak_256
+
+    def keccak(data: bytes) -> bytes:
+        return keccak_256(data).digest()
+except ImportError:
+    from eth_hash.auto import keccak
+
+_HASH_SIZE = 32
+
+
+def get_leaf(address: str, acceptance_message_hash: bytes) -> bytes:
+    """Get the leaf hash of an acceptance.
+
+    Same as ``keccak256(bytes.concat(keccak256(abi.encode(account, acceptanceMessageHash))))``.
+    """
+    address_bytes = bytes.fromhex(address[2:])
+    assert len(address_bytes) == 20, f"Not an address: {address}"
+    assert len(acceptance_message_hash) == _HASH_SIZE, "Must be 256-bit message hash"
+    return keccak(keccak(b"\x00" * 12 + address_bytes + bytes(acceptance_message_hash)))
+
+
+def hash_pair(a: bytes, b: bytes) -> bytes:
+    """Hash two nodes in sorted order, as OpenZeppelin `MerkleProof`."""
+    return keccak(a + b) if a < b else keccak(b + a)
+
+
+def verify_proof(proof: list[bytes], root: bytes, leaf: bytes) -> bool:
+    """Verify a proof off-chain, same as `MerkleProof.verify`."""
+    node = leaf
+    for sibling in proof:
+        node = hash_pair(node, sibling)
+    return node == root
+
+
+class AcceptanceMerkleTree:
+    """Merkle tree of acceptances.
+
+    Duplicate acceptances are included once.
+    An odd node at the end of a level is carried to the next level as is.
+    """
+
+    def __init__(self, acceptances: Iterable[tuple[str, bytes]]):
+        """
+        :param acceptances:
+            Iterable of (address, acceptance message hash) tuples.
+            Consumed once, can be a generator.
+        """
+        leaves = sorted({get_leaf(address, acceptance_message_hash) for address, acceptance_message_hash in acceptances})
+        assert leaves, "Cannot build a tree without leaves"
+
+        #: Tree levels as flat buffers, leaves first, root last
+        self.levels: list[bytes] = [b"".join(leaves)]
+        del leaves
+
+        level = self.levels[0]
+        while len(level) > _HASH_SIZE:
+            parents = bytearray()
+            for offset in range(0, len(level) - _HASH_SIZE, 2 * _HASH_SIZE):
+                parents += hash_pair(level[offset:offset + _HASH_SIZE], level[offset + _HASH_SIZE:offset + 2 * _HASH_SIZE])
+            if (len(level) // _HASH_SIZE) % 2:
+                parents += level[-_HASH_SIZE:]
+            level = bytes(parents)
+            self.levels.append(level)
+
+    def __len__(self) -> int:
+        return len(self.levels[0]) // _HASH_SIZE
+
+    @property
+    def root(self) -> bytes:
+        return self.levels[-1]
+
+    def _find_leaf(self, leaf: bytes) -> int | None:
+        leaves = self.levels[0]
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if leaves[middle * _HASH_SIZE:(middle + 1) * _HASH_SIZE] < leaf:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self) and leaves[low * _HASH_SIZE:(low + 1) * _HASH_SIZE] == leaf:
+            return low
+        return None
+
+    def get_proof(self, address: str, acceptance_message_hash: bytes) -> list[bytes] | None:
+        """Get the proof of an acceptance.
+
+        :return:
+            Sibling hashes from the leaf up, or ``None`` if the acceptance is not in the tree
+        """
+        index = self._find_leaf(get_leaf(address, acceptance_message_hash))
+        if index is None:
+            return None
+
+        proof = []
+        for level in self.levels[:-1]:
+            sibling = index ^ 1
+            # Odd node carried up has no sibling on this level
+            if sibling * _HASH_SIZE < len(level):
+                proof.append(level[sibling * _HASH_SIZE:(sibling + 1) * _HASH_SIZE])
+            index //= 2
+        return proof
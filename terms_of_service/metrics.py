@@ -0,0 +1,317 @@
+"""Optional Prometheus-style metrics.
+
+- Counters and latency histograms for acceptance message hashing,
+  signature verification, JSON-RPC calls per method name and acceptance ingestion
+
+- Cache hit ratios of the acceptance message and ABI caches are read when metrics are rendered
+
+- Disabled by default. When disabled, instrumented functions only check
+  one boolean and JSON-RPC calls are not wrapped at all.
+
+- :py:func:`start_exporter` serves the metrics in the Prometheus text format
+  from a local HTTP server, so they can be scraped in tests without outside services
+
+- Only uses the standard library, so importing this module does not slow down
+  :py:mod:`terms_of_service.acceptance_message`
+
+Example::
+
+    enable_metrics()
+    instrument_web3(web3)
+    server = start_exporter(port=9100)
+
+    # curl http://127.0.0.1:9100/metrics
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+#: Default histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.00001, 0.0001, 0.001, 0.01, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+
+def _format_labels(label_names: tuple[str, ...], label_values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonically increasing value per label set."""
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        with self._lock:
+            self.values[label_values] = self.values.get(label_values, 0.0) + amount
+
+    def get(self, *label_values: str) -> float:
+        return self.values.get(label_values, 0.0)
+
+    def clear(self):
+        with self._lock:
+            self.values.clear()
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, label_values)} {value}")
+        return lines
+
+
+class Gauge:
+    """Value that can go up and down, per label set."""
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, *label_values: str):
+        with self._lock:
+            self.values[label_values] = value
+
+    def get(self, *label_values: str) -> float:
+        return self.values.get(label_values, 0.0)
+
+    def clear(self):
+        with self._lock:
+            self.values.clear()
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for label_values, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    """Distribution of observed values per label set."""
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+
+        #: label values -> (count per bucket with +Inf last, sum, count)
+        self.values: dict[tuple[str, ...], tuple[list[int], float, int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        with self._lock:
+            bucket_counts, total, count = self.values.get(label_values) or ([0] * (len(self.buckets) + 1), 0.0, 0)
+            bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.values[label_values] = (bucket_counts, total + value, count + 1)
+
+    @contextmanager
+    def time(self, *label_values: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *label_values)
+
+    def get_count(self, *label_values: str) -> int:
+        value = self.values.get(label_values)
+        return value[2] if value else 0
+
+    def clear(self):
+        with self._lock:
+            self.values.clear()
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for label_values, (bucket_counts, total, count) in sorted(self.values.items()):
+            cumulative = 0
+            for upper, bucket_count in zip([*self.buckets, "+Inf"], bucket_counts):
+                cumulative += bucket_count
+                le = f'le="{upper}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, label_values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, label_values)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, label_values)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """All metrics of the package."""
+
+    def __init__(self):
+        #: Checked by instrumented code before doing any work
+        self.enabled = False
+        self.metrics: list[Counter | Gauge | Histogram] = []
+
+        #: Called on render, return extra lines in the text format
+        self.collectors: list[Callable[[], list[str]]] = []
+
+    def counter(self, name: str, documentation: str, label_names: tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, documentation, label_names)
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, documentation: str, label_names: tuple[str, ...] = ()) -> Gauge:
+        metric = Gauge(name, documentation, label_names)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, label_names: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, label_names, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def clear(self):
+        for metric in self.metrics:
+            metric.clear()
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics:
+            lines += metric.render()
+        for collector in self.collectors:
+            lines += collector()
+        return "\n".join(lines) + "\n"
+
+
+#: The registry used by the package
+REGISTRY = MetricsRegistry()
+
+HASH_SECONDS = REGISTRY.histogram("tos_hash_seconds", "Time spent hashing acceptance messages", ("function",))
+
+HASHED_MESSAGES = REGISTRY.counter("tos_hashed_messages_total", "Acceptance messages hashed", ("function",))
+
+VERIFICATION_SECONDS = REGISTRY.histogram("tos_signature_verification_seconds", "Time spent verifying signature batches", ("function",))
+
+VERIFIED_SIGNATURES = REGISTRY.counter("tos_verified_signatures_total", "Signatures verified off-chain by outcome", ("status",))
+
+RPC_SECONDS = REGISTRY.histogram("tos_rpc_seconds", "JSON-RPC call latency", ("method",))
+
+RPC_ERRORS = REGISTRY.counter("tos_rpc_errors_total", "Failed JSON-RPC calls", ("method",))
+
+EIP_1271_CACHE_LOOKUPS = REGISTRY.counter("tos_eip1271_cache_lookups_total", "EIP-1271 verification cache lookups by result", ("result",))
+
+EIP_1271_CALLS_SAVED = REGISTRY.counter("tos_eip1271_eth_calls_saved_total", "isValidSignature eth_calls answered from the cache")
+
+INGESTION_QUEUE_DEPTH = REGISTRY.gauge("tos_ingestion_queue_depth", "Acceptances waiting for the next batch flush")
+
+INGESTION_FLUSH_SECONDS = REGISTRY.histogram("tos_ingestion_flush_seconds", "Time spent flushing a batch of acceptances")
+
+INGESTED_SUBMISSIONS = REGISTRY.counter("tos_ingested_submissions_total", "Acceptance submissions received by outcome", ("status",))
+
+
+def _collect_cache_stats() -> list[str]:
+    # Imported here, as the ABI module pulls in web3
+    from terms_of_service.abi import _load_abi
+    from terms_of_service.acceptance_message import get_acceptance_message_and_hash
+
+    caches = [("acceptance_message", get_acceptance_message_and_hash.cache_info()), ("abi", _load_abi.cache_info())]
+    lines = ["# HELP tos_cache_hits_total Cache hits", "# TYPE tos_cache_hits_total counter"]
+    lines += [f'tos_cache_hits_total{{cache="{name}"}} {info.hits}' for name, info in caches]
+    lines += ["# HELP tos_cache_misses_total Cache misses", "# TYPE tos_cache_misses_total counter"]
+    lines += [f'tos_cache_misses_total{{cache="{name}"}} {info.misses}' for name, info in caches]
+    return lines
+
+
+REGISTRY.collectors.append(_collect_cache_stats)
+
+
+def enable_metrics():
+    REGISTRY.enabled = True
+
+
+def disable_metrics():
+    REGISTRY.enabled = False
+
+
+def _rpc_middleware(make_request, web3):
+    def middleware(method, params):
+        if not REGISTRY.enabled:
+            return make_request(method, params)
+        started = time.perf_counter()
+        try:
+            response = make_request(method, params)
+        except Exception:
+            RPC_ERRORS.inc(method)
+            raise
+        finally:
+            RPC_SECONDS.observe(time.perf_counter() - started, method)
+        if "error" in response:
+            RPC_ERRORS.inc(method)
+        return response
+    return middleware
+
+
+async def _async_rpc_middleware(make_request, web3):
+    async def middleware(method, params):
+        if not REGISTRY.enabled:
+            return await make_request(method, params)
+        started = time.perf_counter()
+        try:
+            response = await make_request(method, params)
+        except Exception:
+            RPC_ERRORS.inc(method)
+            raise
+        finally:
+            RPC_SECONDS.observe(time.perf_counter() - started, method)
+        if "error" in response:
+            RPC_ERRORS.inc(method)
+        return response
+    return middleware
+
+
+def instrument_web3(web3):
+    """Record latency of all JSON-RPC calls of a web3 instance per method name.
+
+    Call only when metrics are wanted: uninstrumented instances pay nothing.
+
+    :param web3:
+        `Web3` or `AsyncWeb3`
+    """
+    from web3 import AsyncWeb3
+
+    if isinstance(web3, AsyncWeb3):
+        web3.middleware_onion.add(_async_rpc_middleware, name="tos_metrics")
+    else:
+        web3.middleware_onion.add(_rpc_middleware, name="tos_metrics")
+
+
+def start_exporter(port: int = 0, host: str = "127.0.0.1"):
+    """Serve metrics at ``http://host:port/metrics`` from a background thread.
+
+    :param port:
+        Use 0 to pick a free port, read it from ``server.server_address``
+
+    :return:
+        `ThreadingHTTPServer`, call ``shutdown()`` to stop it
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = REGISTRY.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,260 @@
+"""Registry of published terms of service texts.
+
+- Computes the SHA-256 content hash of terms of service files,
+  reading them in chunks, or memory-mapped when the file is large
+
+- Keeps version -> (date, link, file hash, acceptance message, acceptance message hash)
+  in a local SQLite manifest, indexed for lookups by either hash
+
+- Validates the on-chain `versions(uint16)` mapping of all deployments against the manifest,
+  with one Multicall3 call per chain and all chains queried concurrently.
+  Chains without Multicall3 are read with one call per version.
+
+Only covers versions published with `updateTermsOfService`. Acceptance message hashes of
+`updateTermsOfServiceTyped` versions are bound to a chain and cannot be shared across deployments.
+
+Example::
+
+    manifest = TermsOfServiceManifest("tos-manifest.sqlite")
+    manifest.register_file(3, "tos/2024-03-20.txt", "2024-03-20", "https://tradingstrategy.ai/tos/2024-03-20.txt")
+
+    web3s = {name: Web3(HTTPProvider(os.environ[d.json_rpc_env])) for name, d in DEPLOYMENTS.items()}
+    for result in validate_deployments(manifest, web3s):
+        assert result.ok, f"{result.name}: {result}"
+"""
+
+import dataclasses
+import hashlib
+import mmap
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from eth_abi import decode
+from eth_utils import to_checksum_address
+from web3 import Web3
+from web3.exceptions import BadFunctionCallOutput
+
+from terms_of_service.abi import get_contract
+from terms_of_service.acceptance_message import TRADING_STRATEGY_ACCEPTANCE_MESSAGE, get_signing_hash
+from terms_of_service.bulk_check import MULTICALL3_ABI, MULTICALL3_ADDRESS
+from terms_of_service.deployments import DEPLOYMENTS, Deployment
+
+#: Files larger than this are memory-mapped instead of read in chunks
+MMAP_THRESHOLD = 64 * 1024 * 1024
+
+#: How many versions past the manifest are read in the same call,
+#: so chains ahead of the manifest are usually validated with one call
+VERSION_LOOKAHEAD = 8
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS versions (
+    version INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    link TEXT NOT NULL,
+    file_hash BLOB NOT NULL,
+    acceptance_message TEXT NOT NULL,
+    acceptance_message_hash BLOB NOT NULL UNIQUE
+);
+
+CREATE INDEX IF NOT EXISTS versions_file_hash ON versions (file_hash);
+"""
+
+
+def hash_file(path: str | Path, chunk_size: int = 1024 * 1024) -> bytes:
+    """Calculate SHA-256 of a file.
+
+    :param chunk_size:
+        Read buffer size for files smaller than :py:data:`MMAP_THRESHOLD`
+
+    :return:
+        32 bytes digest
+    """
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        size = Path(path).stat().st_size
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                sha.update(mm)
+        else:
+            buf = bytearray(chunk_size)
+            view = memoryview(buf)
+            while read := f.readinto(buf):
+                sha.update(view[:read])
+    return sha.digest()
+
+
+@dataclasses.dataclass(frozen=True)
+class PublishedVersion:
+    """One terms of service version in the manifest."""
+
+    version: int
+
+    #: Publication date, as used in the acceptance message
+    date: str
+
+    #: Where the text was published
+    link: str
+
+    #: SHA-256 of the terms of service file
+    file_hash: bytes
+
+    acceptance_message: str
+
+    #: What the contract stores in `versions(version)`
+    acceptance_message_hash: bytes
+
+
+class TermsOfServiceManifest:
+    """SQLite backed manifest of published terms of service versions.
+
+    Use ``":memory:"`` as the path for a non-persistent manifest.
+    """
+
+    def __init__(self, path: str | Path = ":memory:"):
+        self.connection = sqlite3.connect(str(path))
+        self.connection.executescript(_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def add_version(self, version: int, date: str, link: str, file_hash: bytes, acceptance_message: str) -> PublishedVersion:
+        """Record a version. Replaces an earlier record of the same version."""
+        assert len(file_hash) == 32, "Must be 256-bit sha of terms of service file"
+        published = PublishedVersion(version, date, link, bytes(file_hash), acceptance_message, get_signing_hash(acceptance_message))
+        self.connection.execute("INSERT OR REPLACE INTO versions VALUES (?, ?, ?, ?, ?, ?)", dataclasses.astuple(published))
+        self.connection.commit()
+        return published
+
+    def register_file(
+        self,
+        version: int,
+        path: str | Path,
+        date: str,
+        link: str,
+        template: str = TRADING_STRATEGY_ACCEPTANCE_MESSAGE,
+    ) -> PublishedVersion:
+        """Hash a terms of service file and record its version.
+
+        :param template:
+            Acceptance message template. May refer to `version`, `date`, `human_date`, `link` and `hash`.
+        """
+        file_hash = hash_file(path)
+        acceptance_message = template.format(version=version, date=date, human_date=date, link=link, hash=file_hash.hex())
+        return self.add_version(version, date, link, file_hash, acceptance_message)
+
+    def get_version(self, version: int) -> PublishedVersion | None:
+        row = self.connection.execute("SELECT * FROM versions WHERE version = ?", (version,)).fetchone()
+        return PublishedVersion(*row) if row else None
+
+    def get_versions(self) -> list[PublishedVersion]:
+        """All versions, oldest first."""
+        return [PublishedVersion(*row) for row in self.connection.execute("SELECT * FROM versions ORDER BY version")]
+
+    def find_by_file_hash(self, file_hash: bytes) -> PublishedVersion | None:
+        row = self.connection.execute("SELECT * FROM versions WHERE file_hash = ? ORDER BY version DESC", (bytes(file_hash),)).fetchone()
+        return PublishedVersion(*row) if row else None
+
+    def find_by_acceptance_message_hash(self, acceptance_message_hash: bytes) -> PublishedVersion | None:
+        row = self.connection.execute("SELECT * FROM versions WHERE acceptance_message_hash = ?", (bytes(acceptance_message_hash),)).fetchone()
+        return PublishedVersion(*row) if row else None
+
+
+@dataclasses.dataclass
+class ChainValidation:
+    """On-chain versions of one deployment compared to the manifest."""
+
+    name: str
+
+    #: `latestTermsOfServiceVersion` of the contract
+    latest_version: int
+
+    #: Manifest versions that are not published on chain yet
+    missing: list[int]
+
+    #: Versions with a different hash on chain: version -> on-chain hash
+    mismatched: dict[int, bytes]
+
+    #: Versions published on chain but not in the manifest
+    unknown: list[int]
+
+    @property
+    def ok(self) -> bool:
+        return not self.mismatched and not self.unknown
+
+
+def _read_versions(web3: Web3, contract_address: str, versions: list[int], multicall_address: str | None) -> tuple[int, dict[int, bytes]]:
+    contract = get_contract(web3, contract_address)
+    calls = [contract.encodeABI(fn_name="latestTermsOfServiceVersion")] + [contract.encodeABI(fn_name="versions", args=[v]) for v in versions]
+
+    return_data = None
+    if multicall_address:
+        multicall = web3.eth.contract(address=to_checksum_address(multicall_address), abi=MULTICALL3_ABI)
+        try:
+            results = multicall.functions.aggregate3([(contract.address, False, data) for data in calls]).call()
+            return_data = [data for success, data in results]
+        except BadFunctionCallOutput:
+            # Multicall3 is not deployed on this chain
+            pass
+
+    if return_data is None:
+        return_data = [web3.eth.call({"to": contract.address, "data": data}) for data in calls]
+
+    latest_version = decode(["uint16"], return_data[0])[0]
+    return latest_version, {v: decode(["bytes32"], data)[0] for v, data in zip(versions, return_data[1:])}
+
+
+def validate_chain(
+    published: list[PublishedVersion],
+    web3: Web3,
+    deployment: Deployment,
+    multicall_address: str | None = MULTICALL3_ADDRESS,
+) -> ChainValidation:
+    """Compare the on-chain versions of one deployment to the manifest.
+
+    The latest version and all versions up to `VERSION_LOOKAHEAD` past the manifest
+    are read in one call. Versions beyond that are read with a second call.
+
+    :param published:
+        From :py:meth:`TermsOfServiceManifest.get_versions`
+    """
+    expected = {v.version: v.acceptance_message_hash for v in published}
+    versions = list(range(1, max(expected, default=0) + VERSION_LOOKAHEAD + 1))
+    latest_version, onchain = _read_versions(web3, deployment.address, versions, multicall_address)
+
+    if latest_version > versions[-1]:
+        ahead = list(range(versions[-1] + 1, latest_version + 1))
+        _, more = _read_versions(web3, deployment.address, ahead, multicall_address)
+        onchain.update(more)
+        versions += ahead
+
+    empty = b"\x00" * 32
+    return ChainValidation(
+        name=deployment.name,
+        latest_version=latest_version,
+        missing=[v for v in sorted(expected) if onchain[v] == empty],
+        mismatched={v: onchain[v] for v in sorted(expected) if onchain[v] not in (empty, expected[v])},
+        unknown=[v for v in versions if v not in expected and onchain[v] != empty],
+    )
+
+
+def validate_deployments(
+    manifest: TermsOfServiceManifest,
+    web3s: dict[str, Web3],
+    deployments: dict[str, Deployment] = DEPLOYMENTS,
+    multicall_address: str | None = MULTICALL3_ADDRESS,
+) -> list[ChainValidation]:
+    """Validate all deployments concurrently.
+
+    :param web3s:
+        Chain name -> connection. Deployments without a connection are skipped.
+
+    :return:
+        Validation result for each connected chain
+    """
+    # SQLite connections cannot be shared with the worker threads
+    published = manifest.get_versions()
+    names = [name for name in deployments if name in web3s]
+    with ThreadPoolExecutor(max_workers=max(len(names), 1)) as executor:
+        return list(executor.map(lambda name: validate_chain(published, web3s[name], deployments[name], multicall_address), names))
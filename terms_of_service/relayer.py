@@ -0,0 +1,386 @@
+"""Relay terms of service transactions from a hot wallet.
+
+- Nonces are assigned locally, so many transactions can be in flight
+  without waiting for the previous one to confirm. Nonces of failed broadcasts
+  are handed out again first. If no new transaction takes one before the next
+  receipt poll and later nonces are in flight, the gap is filled with
+  a zero value transfer to the relayer itself.
+
+- Transactions are signed in an executor, off the event loop
+
+- Receipts of all in-flight transactions are polled concurrently by one background task
+
+- A transaction that has not confirmed within `stall_timeout` is resubmitted
+  with the same nonce and a bumped gas price
+
+- Throughput and confirmation latency are tracked in :py:class:`RelayerMetrics`
+
+Example::
+
+    web3 = AsyncWeb3(AsyncHTTPProvider(json_rpc_url))
+    relayer = TransactionRelayer(web3, Account.from_key(relayer_private_key))
+    await relayer.start()
+
+    contract = get_contract(web3, "0xbe1418df0bAd87577de1A41385F19c6e77312780")
+    pending = [await relayer.relay_acceptance(contract, signer, hash, signature, metadata) for ... in submissions]
+    receipts = await asyncio.gather(*[p.receipt for p in pending])
+
+    print(relayer.metrics.as_dict())
+    await relayer.stop()
+"""
+
+import asyncio
+import collections
+import dataclasses
+import heapq
+import logging
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+
+from eth_account import Account
+from eth_account.signers.local import LocalAccount
+from web3 import AsyncWeb3
+from web3.contract import AsyncContract
+
+logger = logging.getLogger(__name__)
+
+#: Gas limit for relayed `signTermsOfServiceBehalf` calls, covers EIP-1271 wallets and metadata
+RELAY_GAS_LIMIT = 250_000
+
+#: How many most recent confirmation latencies are kept for percentiles
+LATENCY_WINDOW = 10_000
+
+#: Gas limit of zero value self-transfers filling nonce gaps
+GAP_FILL_GAS_LIMIT = 21_000
+
+#: Fee fields of legacy and EIP-1559 transactions, bumped on resubmission
+_FEE_FIELDS = ("gasPrice", "maxFeePerGas", "maxPriorityFeePerGas")
+
+
+def _sign(tx: dict, private_key: bytes) -> tuple[bytes, bytes]:
+    # Module level, so it can be run in a ProcessPoolExecutor
+    signed = Account.sign_transaction(tx, private_key)
+    return bytes(signed.hash), bytes(signed.rawTransaction)
+
+
+@dataclasses.dataclass
+class RelayerMetrics:
+    """Relayer counters since :py:meth:`TransactionRelayer.start`."""
+
+    started_at: float = dataclasses.field(default_factory=time.monotonic)
+
+    #: Transactions broadcasted, not counting resubmissions
+    submitted: int = 0
+
+    #: Transactions with a successful receipt
+    confirmed: int = 0
+
+    #: Transactions with a reverted receipt
+    failed: int = 0
+
+    #: Gas bump resubmissions
+    resubmitted: int = 0
+
+    #: Self-transfers broadcasted to fill the nonces of failed broadcasts, counted in `submitted`
+    gaps_filled: int = 0
+
+    #: Seconds from the first broadcast to the receipt, for the last `LATENCY_WINDOW` confirmed transactions
+    latencies: collections.deque[float] = dataclasses.field(default_factory=lambda: collections.deque(maxlen=LATENCY_WINDOW))
+
+    def get_throughput(self) -> float:
+        """Confirmed transactions per second."""
+        duration = time.monotonic() - self.started_at
+        return self.confirmed / duration if duration > 0 else 0.0
+
+    def get_latency_percentile(self, percentile: float) -> float | None:
+        """Confirmation latency in seconds, e.g. ``get_latency_percentile(0.95)``."""
+        if not self.latencies:
+            return None
+        latencies = sorted(self.latencies)
+        return latencies[min(int(percentile * len(latencies)), len(latencies) - 1)]
+
+    def as_dict(self) -> dict:
+        return {
+            "submitted": self.submitted,
+            "confirmed": self.confirmed,
+            "failed": self.failed,
+            "resubmitted": self.resubmitted,
+            "gaps_filled": self.gaps_filled,
+            "in_flight": self.submitted - self.confirmed - self.failed,
+            "tx_per_second": self.get_throughput(),
+            "latency_p50": self.get_latency_percentile(0.50),
+            "latency_p95": self.get_latency_percentile(0.95),
+            "latency_p99": self.get_latency_percentile(0.99),
+        }
+
+
+@dataclasses.dataclass
+class RelayedTransaction:
+    """A transaction submitted by the relayer."""
+
+    nonce: int
+
+    #: Unsigned transaction as last broadcasted
+    tx: dict
+
+    #: Hashes of all broadcasted variants of this nonce, the latest last
+    tx_hashes: list[bytes]
+
+    #: Resolves to the receipt
+    receipt: asyncio.Future
+
+    #: When the transaction was first broadcasted
+    submitted_at: float
+
+    #: When the latest variant was broadcasted
+    broadcasted_at: float
+
+    #: Self-transfer filling a nonce gap, does not take an in-flight slot
+    gap_fill: bool = False
+
+
+class TransactionRelayer:
+    """Pipelined transaction submission from one account."""
+
+    def __init__(
+        self,
+        web3: AsyncWeb3,
+        account: LocalAccount,
+        max_in_flight: int = 64,
+        executor: Executor | None = None,
+        stall_timeout: float = 60.0,
+        gas_bump: float = 1.125,
+        poll_interval: float = 1.0,
+    ):
+        """
+        :param max_in_flight:
+            How many unconfirmed transactions can be pending at once.
+            :py:meth:`submit` waits when the limit is reached.
+
+        :param executor:
+            Where to sign transactions. Defaults to a thread pool.
+
+        :param stall_timeout:
+            Seconds to wait for a receipt before resubmitting with a higher gas price
+
+        :param gas_bump:
+            Gas price multiplier for resubmissions. Nodes require at least 10% to replace a transaction.
+
+        :param poll_interval:
+            Seconds between receipt polls
+        """
+        assert gas_bump >= 1.1, "Nodes do not accept replacements with less than 10% gas price bump"
+        self.web3 = web3
+        self.account = account
+        self.executor = executor or ThreadPoolExecutor(max_workers=4)
+        self.stall_timeout = stall_timeout
+        self.gas_bump = gas_bump
+        self.poll_interval = poll_interval
+        self.metrics = RelayerMetrics()
+        self.chain_id: int | None = None
+        self.next_nonce: int | None = None
+
+        #: Nonces reserved by failed broadcasts, reused lowest first so no gap stalls later nonces
+        self.released_nonces: list[int] = []
+
+        self.in_flight: dict[int, RelayedTransaction] = {}
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._nonce_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def address(self) -> str:
+        return self.account.address
+
+    async def start(self):
+        """Read the chain id and the pending nonce and start tracking receipts."""
+        self.chain_id, self.next_nonce = await asyncio.gather(
+            self.web3.eth.chain_id,
+            self.web3.eth.get_transaction_count(self.address, "pending"),
+        )
+        self.metrics = RelayerMetrics()
+        self._task = asyncio.create_task(self._track())
+
+    async def stop(self, wait: bool = True, timeout: float | None = 600.0):
+        """Stop tracking receipts.
+
+        :param wait:
+            Wait until all in-flight transactions have a receipt
+
+        :param timeout:
+            Seconds to wait for the receipts.
+            Transactions still without a receipt are left in `in_flight`.
+        """
+        if wait and self.in_flight:
+            receipts = asyncio.gather(*[t.receipt for t in list(self.in_flight.values())], return_exceptions=True)
+            try:
+                # Shielded, so a timeout does not cancel the receipt futures of the callers
+                await asyncio.wait_for(asyncio.shield(receipts), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Stopped with nonces %s still in flight", sorted(self.in_flight))
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _broadcast(self, tx: dict) -> bytes:
+        loop = asyncio.get_running_loop()
+        tx_hash, raw_tx = await loop.run_in_executor(self.executor, _sign, tx, self.account.key)
+        await self.web3.eth.send_raw_transaction(raw_tx)
+        return tx_hash
+
+    async def submit(self, tx: dict) -> RelayedTransaction:
+        """Sign and broadcast a transaction.
+
+        Returns as soon as the transaction is broadcasted.
+        Await `RelayedTransaction.receipt` for the receipt.
+
+        :param tx:
+            Transaction with `to`, `data` and `gas`.
+            `nonce` and `chainId` are filled in.
+            `gasPrice` is filled in, unless the transaction has EIP-1559 fee fields.
+        """
+        assert self.next_nonce is not None, "Call start() first"
+        assert "gas" in tx, "Gas limit must be given, estimating gas for each transaction would stall the pipeline"
+        await self._slots.acquire()
+        try:
+            tx = dict(tx)
+            tx["chainId"] = self.chain_id
+            if "maxFeePerGas" not in tx and "gasPrice" not in tx:
+                tx["gasPrice"] = await self.web3.eth.gas_price
+
+            async with self._nonce_lock:
+                if self.released_nonces:
+                    nonce = heapq.heappop(self.released_nonces)
+                else:
+                    nonce = self.next_nonce
+                    self.next_nonce += 1
+            tx["nonce"] = nonce
+
+            # Signed and broadcasted outside the lock, nodes queue nonces that arrive out of order
+            try:
+                tx_hash = await self._broadcast(tx)
+            except Exception:
+                async with self._nonce_lock:
+                    heapq.heappush(self.released_nonces, nonce)
+                raise
+        except Exception:
+            self._slots.release()
+            raise
+
+        now = time.monotonic()
+        relayed = RelayedTransaction(
+            nonce=nonce,
+            tx=tx,
+            tx_hashes=[tx_hash],
+            receipt=asyncio.get_running_loop().create_future(),
+            submitted_at=now,
+            broadcasted_at=now,
+        )
+        self.in_flight[nonce] = relayed
+        self.metrics.submitted += 1
+        return relayed
+
+    async def _fill_gaps(self):
+        """Fill nonces of failed broadcasts that stall later nonces."""
+        while True:
+            async with self._nonce_lock:
+                # A gap at the highest reserved nonce stalls nothing, the next submit() takes it
+                if not self.released_nonces or self.released_nonces[0] >= self.next_nonce - 1:
+                    return
+                nonce = heapq.heappop(self.released_nonces)
+
+            tx = {
+                "to": self.address,
+                "value": 0,
+                "gas": GAP_FILL_GAS_LIMIT,
+                "gasPrice": await self.web3.eth.gas_price,
+                "chainId": self.chain_id,
+                "nonce": nonce,
+            }
+            try:
+                tx_hash = await self._broadcast(tx)
+            except ValueError as e:
+                # The failed broadcast may have reached the node after all
+                if await self.web3.eth.get_transaction_count(self.address, "pending") > nonce:
+                    logger.info("Nonce %d is already used: %s", nonce, e)
+                    continue
+                logger.warning("Could not fill nonce %d: %s", nonce, e)
+                async with self._nonce_lock:
+                    heapq.heappush(self.released_nonces, nonce)
+                return
+
+            logger.info("Filled nonce %d with a self-transfer, %s", nonce, tx_hash.hex())
+            now = time.monotonic()
+            self.in_flight[nonce] = RelayedTransaction(
+                nonce=nonce,
+                tx=tx,
+                tx_hashes=[tx_hash],
+                receipt=asyncio.get_running_loop().create_future(),
+                submitted_at=now,
+                broadcasted_at=now,
+                gap_fill=True,
+            )
+            self.metrics.submitted += 1
+            self.metrics.gaps_filled += 1
+
+    async def relay_acceptance(self, contract: AsyncContract, signer: str, hash: bytes, signature: bytes, metadata: bytes, gas: int = RELAY_GAS_LIMIT) -> RelayedTransaction:
+        """Submit `signTermsOfServiceBehalf` on behalf of a user."""
+        data = contract.encodeABI(fn_name="signTermsOfServiceBehalf", args=[signer, hash, signature, metadata])
+        return await self.submit({"to": contract.address, "data": data, "gas": gas, "value": 0})
+
+    def _bump(self, tx: dict) -> dict:
+        tx = dict(tx)
+        for field in _FEE_FIELDS:
+            if field in tx:
+                tx[field] = int(tx[field] * self.gas_bump) + 1
+        return tx
+
+    async def _check(self, relayed: RelayedTransaction):
+        # Any of the variants may be the one that got mined
+        receipts = await asyncio.gather(*[self.web3.eth.get_transaction_receipt(h) for h in relayed.tx_hashes], return_exceptions=True)
+        receipt = next((r for r in receipts if not isinstance(r, Exception)), None)
+        now = time.monotonic()
+
+        if receipt is not None:
+            del self.in_flight[relayed.nonce]
+            if not relayed.gap_fill:
+                self._slots.release()
+            if receipt["status"] == 1:
+                self.metrics.confirmed += 1
+                self.metrics.latencies.append(now - relayed.submitted_at)
+            else:
+                self.metrics.failed += 1
+            relayed.receipt.set_result(receipt)
+            return
+
+        if now - relayed.broadcasted_at > self.stall_timeout:
+            tx = self._bump(relayed.tx)
+            try:
+                tx_hash = await self._broadcast(tx)
+            except ValueError as e:
+                # Usually "nonce too low" when one of the earlier variants was just mined
+                logger.warning("Could not resubmit nonce %d: %s", relayed.nonce, e)
+                return
+            logger.info("Resubmitted nonce %d with gas bump, %s", relayed.nonce, tx_hash.hex())
+            relayed.tx = tx
+            relayed.tx_hashes.append(tx_hash)
+            relayed.broadcasted_at = now
+            self.metrics.resubmitted += 1
+
+    async def _track(self):
+        while True:
+            if self.released_nonces:
+                try:
+                    await self._fill_gaps()
+                except Exception as e:
+                    logger.warning("Filling nonce gaps failed: %s", e)
+            if self.in_flight:
+                try:
+                    await asyncio.gather(*[self._check(t) for t in list(self.in_flight.values())])
+                except Exception as e:
+                    logger.warning("Polling receipts failed: %s", e)
+            await asyncio.sleep(self.poll_interval)
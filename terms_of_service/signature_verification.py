@@ -0,0 +1,311 @@
+"""Off-chain pre-verification of terms of service signatures.
+
+- Check signatures before relaying them with `signTermsOfServiceBehalf`,
+  so that bad submissions are dropped without an RPC round trip
+
+- Follows the same rules as OpenZeppelin `SignatureChecker.isValidSignatureNow`
+  and `ECDSA.tryRecover`: 65 bytes r||s||v, `v` is 27 or 28, `s` in the lower half order
+
+- Smart contract wallets (EIP-1271) cannot be verified off-chain and are flagged
+  for a separate on-chain `isValidSignature` check
+
+- :py:class:`EIP1271VerificationCache` remembers `isValidSignature` results for a number of blocks,
+  so retried submissions of the same smart contract wallet signature do not repeat the `eth_call`
+
+- `eth_keys` uses `coincurve` for ecrecover if it is installed, which is much faster
+  than the pure Python backend
+"""
+
+import enum
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable
+
+from eth_abi import encode
+from eth_hash.auto import keccak
+from eth_keys import keys
+from eth_keys.exceptions import BadSignature
+from eth_utils import to_checksum_address
+from web3 import AsyncWeb3, Web3
+from web3.exceptions import ContractLogicError
+
+from terms_of_service.metrics import EIP_1271_CACHE_LOOKUPS, EIP_1271_CALLS_SAVED, REGISTRY, VERIFICATION_SECONDS, VERIFIED_SIGNATURES
+
+#: secp256k1 curve order
+SECP256K1_N = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+
+#: `isValidSignature(bytes32,bytes)` selector, returned by EIP-1271 wallets for valid signatures
+EIP_1271_MAGIC_VALUE = bytes.fromhex("1626ba7e")
+
+
+class SignatureStatus(enum.Enum):
+    """Outcome of an off-chain signature check."""
+
+    #: ecrecover returns the signer
+    valid = "valid"
+
+    #: The signature cannot be valid for this signer
+    invalid = "invalid"
+
+    #: The signer is a smart contract and the signature must be checked
+    #: with EIP-1271 `isValidSignature` on chain
+    eip_1271 = "eip_1271"
+
+
+def recover_signer(message_hash: bytes, signature: bytes) -> str | None:
+    """Recover the EOA that signed a message hash.
+
+    :param message_hash:
+        EIP-191 hash from :py:func:`terms_of_service.acceptance_message.get_signing_hash`
+
+    :param signature:
+        65 bytes packed r||s||v signature
+
+    :return:
+        Checksummed signer address or ``None`` if the signature is malformed
+    """
+    assert type(message_hash) == bytes
+    assert len(message_hash) == 32, "Must be 256-bit message hash"
+
+    if len(signature) != 65:
+        return None
+
+    r = int.from_bytes(signature[0:32], "big")
+    s = int.from_bytes(signature[32:64], "big")
+    v = signature[64]
+
+    # See ECDSA.tryRecover
+    if v not in (27, 28) or s > SECP256K1_N // 2 or r == 0 or s == 0:
+        return None
+
+    try:
+        public_key = keys.Signature(vrs=(v - 27, r, s)).recover_public_key_from_msg_hash(message_hash)
+    except (BadSignature, ValueError):
+        return None
+
+    return public_key.to_checksum_address()
+
+
+def _recover_chunk(chunk: list[tuple[bytes, bytes]]) -> list[str | None]:
+    return [recover_signer(message_hash, signature) for message_hash, signature in chunk]
+
+
+def recover_signers(
+    hashes_and_signatures: Iterable[tuple[bytes, bytes]],
+    max_workers: int | None = None,
+    chunk_size: int = 512,
+) -> list[str | None]:
+    """Recover signers for a batch of signatures.
+
+    :param hashes_and_signatures:
+        Iterable of (message hash, signature) tuples
+
+    :param max_workers:
+        Run ecrecover in a process pool of this size.
+        By default recover in the current process.
+
+    :param chunk_size:
+        How many signatures are sent to a worker process at a time
+
+    :return:
+        Recovered signer for each input, ``None`` for malformed signatures
+    """
+    items = list(hashes_and_signatures)
+
+    if not max_workers:
+        return _recover_chunk(items)
+
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    result = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for recovered in executor.map(_recover_chunk, chunks):
+            result += recovered
+    return result
+
+
+def _encode_is_valid_signature(message_hash: bytes, signature: bytes) -> bytes:
+    return EIP_1271_MAGIC_VALUE + encode(["bytes32", "bytes"], [message_hash, signature])
+
+
+def _is_magic_value(return_data: bytes) -> bool:
+    # Same as SignatureChecker.isValidERC1271SignatureNow
+    return len(return_data) >= 32 and return_data[:4] == EIP_1271_MAGIC_VALUE and return_data[4:32] == b"\x00" * 28
+
+
+class EIP1271VerificationCache:
+    """Cache of EIP-1271 `isValidSignature` results.
+
+    - Keyed by (wallet, message hash, keccak of the signature)
+
+    - Entries expire after `max_age_blocks`, as wallet owners and modules can change
+
+    - Least recently used entries are evicted above `max_size`
+
+    Thread safe.
+    """
+
+    def __init__(self, max_size: int = 10_000, max_age_blocks: int = 64):
+        self.max_size = max_size
+        self.max_age_blocks = max_age_blocks
+
+        #: (wallet, message hash, signature digest) -> (valid, block number)
+        self.entries: OrderedDict[tuple[str, bytes, bytes], tuple[bool, int]] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    @staticmethod
+    def get_key(wallet: str, message_hash: bytes, signature: bytes) -> tuple[str, bytes, bytes]:
+        return to_checksum_address(wallet), bytes(message_hash), keccak(signature)
+
+    def get(self, wallet: str, message_hash: bytes, signature: bytes, block_number: int) -> bool | None:
+        """Get a cached result.
+
+        :return:
+            ``None`` if not cached or expired at `block_number`
+        """
+        key = self.get_key(wallet, message_hash, signature)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and 0 <= block_number - entry[1] < self.max_age_blocks:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                result = "hit"
+            else:
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                result = "expired" if entry is not None else "miss"
+
+        if REGISTRY.enabled:
+            EIP_1271_CACHE_LOOKUPS.inc(result)
+            if result == "hit":
+                EIP_1271_CALLS_SAVED.inc()
+
+        return entry[0] if result == "hit" else None
+
+    def put(self, wallet: str, message_hash: bytes, signature: bytes, valid: bool, block_number: int):
+        key = self.get_key(wallet, message_hash, signature)
+        with self._lock:
+            self.entries[key] = (valid, block_number)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def verify(self, web3: Web3, wallet: str, message_hash: bytes, signature: bytes, block_number: int | None = None) -> bool:
+        """Check a signature with `isValidSignature`, or answer from the cache.
+
+        :param block_number:
+            Current block. Pass it when verifying many signatures, to save a `eth_blockNumber` call per signature.
+        """
+        if block_number is None:
+            block_number = web3.eth.block_number
+
+        valid = self.get(wallet, message_hash, signature, block_number)
+        if valid is None:
+            try:
+                return_data = web3.eth.call({"to": to_checksum_address(wallet), "data": _encode_is_valid_signature(message_hash, signature)})
+                valid = _is_magic_value(return_data)
+            except ContractLogicError:
+                valid = False
+            self.put(wallet, message_hash, signature, valid, block_number)
+        return valid
+
+    async def verify_async(self, web3: AsyncWeb3, wallet: str, message_hash: bytes, signature: bytes, block_number: int | None = None) -> bool:
+        """Same as :py:meth:`verify` for `AsyncWeb3`."""
+        if block_number is None:
+            block_number = await web3.eth.block_number
+
+        valid = self.get(wallet, message_hash, signature, block_number)
+        if valid is None:
+            try:
+                return_data = await web3.eth.call({"to": to_checksum_address(wallet), "data": _encode_is_valid_signature(message_hash, signature)})
+                valid = _is_magic_value(return_data)
+            except ContractLogicError:
+                valid = False
+            self.put(wallet, message_hash, signature, valid, block_number)
+        return valid
+
+
+def verify_signatures(
+    submissions: Iterable[tuple[str, bytes, bytes]],
+    web3: Web3 | None = None,
+    max_workers: int | None = None,
+    eip_1271_cache: EIP1271VerificationCache | None = None,
+) -> list[SignatureStatus]:
+    """Pre-verify a batch of `signTermsOfServiceBehalf` submissions.
+
+    If the recovered EOA does not match the signer, the signer may still be a smart contract wallet.
+    When `web3` is given, we check if the signer has code and flag it as
+    :py:attr:`SignatureStatus.eip_1271`. Without `web3`, all mismatches are reported invalid.
+
+    :param submissions:
+        Iterable of (signer, message hash, signature) tuples
+
+    :param web3:
+        Used to detect smart contract signers
+
+    :param max_workers:
+        See :py:func:`recover_signers`
+
+    :param eip_1271_cache:
+        Verify smart contract signers with `isValidSignature` through this cache
+        and report them valid or invalid instead of :py:attr:`SignatureStatus.eip_1271`.
+        Needs `web3`.
+
+    :return:
+        Status for each submission, in the input order
+    """
+    started = time.perf_counter() if REGISTRY.enabled else None
+    submissions = list(submissions)
+    recovered = recover_signers(
+        [(message_hash, signature) for _, message_hash, signature in submissions],
+        max_workers=max_workers,
+    )
+
+    # Only look up each contract once per batch
+    has_code: dict[str, bool] = {}
+    block_number = None
+    assert eip_1271_cache is None or web3 is not None, "EIP-1271 cache needs web3"
+
+    result = []
+    for (signer, message_hash, signature), recovered_signer in zip(submissions, recovered):
+        signer = to_checksum_address(signer)
+        if recovered_signer == signer:
+            result.append(SignatureStatus.valid)
+            continue
+
+        if web3 is not None:
+            if signer not in has_code:
+                has_code[signer] = len(web3.eth.get_code(signer)) > 0
+            if has_code[signer]:
+                if eip_1271_cache is None:
+                    result.append(SignatureStatus.eip_1271)
+                    continue
+                if block_number is None:
+                    block_number = web3.eth.block_number
+                if eip_1271_cache.verify(web3, signer, message_hash, signature, block_number):
+                    result.append(SignatureStatus.valid)
+                else:
+                    result.append(SignatureStatus.invalid)
+                continue
+
+        result.append(SignatureStatus.invalid)
+
+    if started is not None:
+        VERIFICATION_SECONDS.observe(time.perf_counter() - started, "verify_signatures")
+        for status in result:
+            VERIFIED_SIGNATURES.inc(status.value)
+
+    return result
@@ -0,0 +1,281 @@
+"""Compact binary snapshots of the acceptance registry.
+
+- A snapshot holds the signers of each terms of service version as a sorted array
+  of raw 20-byte addresses, so lookups are a binary search over a memory-mapped file
+  and nothing is deserialised when the file is opened
+
+- Snapshots are exported from an :py:class:`terms_of_service.indexer.AcceptanceStore`
+  and can be shipped to services that do not run an indexer themselves
+
+- New acceptances are appended as delta segments, so keeping a snapshot up to date
+  does not rewrite the whole file. Run :py:func:`write_snapshot` again to compact the deltas.
+  The store pins the checkpoint of the last snapshot block, so it is not pruned
+  however many blocks are indexed before the next delta.
+
+File layout, all integers little-endian:
+
+- The file is a sequence of segments. The first segment is the base snapshot,
+  the following ones are deltas with acceptances indexed after the previous segment.
+
+- Segment header: magic ``b"TOSSNAP2"``, segment length, last indexed block, its block hash,
+  base block hash, version count. The base block hash of a delta is the last block hash
+  of the previous segment, all zeros for the base snapshot. Deltas whose base does not match
+  are rejected, so a delta indexed on a reorganised chain is never stacked on the snapshot.
+
+- Version table: version, acceptance message hash, addresses offset, signer count,
+  metadata offset for each version. Offsets are relative to the segment start.
+
+- Addresses: signer count × 20 bytes, sorted
+
+- Metadata: signer count + 1 offsets to the metadata blob, then the blob.
+  Metadata of the signer at index i is ``blob[offsets[i]:offsets[i + 1]]``.
+
+Example::
+
+    write_snapshot(store, "acceptances.snapshot")
+
+    # Later, after the indexer has synced more blocks
+    append_snapshot_delta(store, "acceptances.snapshot")
+
+    with AcceptanceSnapshot("acceptances.snapshot") as snapshot:
+        assert snapshot.can_address_proceed(user_address)
+"""
+
+import mmap
+import struct
+from pathlib import Path
+
+from terms_of_service.indexer import AcceptanceStore
+
+#: Segment magic and format version
+SNAPSHOT_MAGIC = b"TOSSNAP2"
+
+#: magic, segment length, last block, last block hash, base block hash, version count
+_SEGMENT_HEADER = struct.Struct("<8sQq32s32sI4x")
+
+_NO_BLOCK_HASH = b"\x00" * 32
+
+#: version, acceptance message hash, addresses offset, signer count, metadata offset
+_VERSION_ENTRY = struct.Struct("<H6x32sQQQ")
+
+_METADATA_OFFSET = struct.Struct("<Q")
+
+_ADDRESS_SIZE = 20
+
+
+def _address_to_bytes(address: str) -> bytes:
+    address_bytes = bytes.fromhex(address[2:] if address[:2] in ("0x", "0X") else address)
+    assert len(address_bytes) == _ADDRESS_SIZE, f"Not an address: {address}"
+    return address_bytes
+
+
+def _encode_segment(
+    last_block: int,
+    last_block_hash: bytes,
+    base_block_hash: bytes,
+    versions: list[tuple[int, bytes]],
+    acceptances: list[tuple[str, int, bytes, bytes]],
+) -> bytes:
+    """Build one segment.
+
+    :param versions:
+        (version, hash) of all versions to include, including ones without signers
+
+    :param acceptances:
+        (signer, version, hash, metadata) rows from the store
+    """
+    by_version = {version: [] for version, _ in versions}
+    for signer, version, _, metadata in acceptances:
+        by_version[version].append((_address_to_bytes(signer), bytes(metadata)))
+
+    table_size = _SEGMENT_HEADER.size + _VERSION_ENTRY.size * len(versions)
+    entries = []
+    body = bytearray()
+    for version, hash in versions:
+        rows = sorted(by_version[version])
+        addresses_offset = table_size + len(body)
+        body += b"".join(address for address, _ in rows)
+
+        metadata_offset = table_size + len(body)
+        position = 0
+        for _, metadata in rows:
+            body += _METADATA_OFFSET.pack(position)
+            position += len(metadata)
+        body += _METADATA_OFFSET.pack(position)
+        body += b"".join(metadata for _, metadata in rows)
+
+        entries.append(_VERSION_ENTRY.pack(version, bytes(hash), addresses_offset, len(rows), metadata_offset))
+
+    header = _SEGMENT_HEADER.pack(SNAPSHOT_MAGIC, table_size + len(body), last_block, bytes(last_block_hash), bytes(base_block_hash), len(versions))
+    return header + b"".join(entries) + bytes(body)
+
+
+def _read_last_block(path: Path) -> tuple[int, bytes]:
+    """Read the last block and its hash from the newest segment."""
+    last = None
+    with open(path, "rb") as f:
+        while header := f.read(_SEGMENT_HEADER.size):
+            magic, length, last_block, last_block_hash, _, _ = _SEGMENT_HEADER.unpack(header)
+            assert magic == SNAPSHOT_MAGIC, f"{path} is not a terms of service snapshot"
+            last = (last_block, last_block_hash)
+            f.seek(length - _SEGMENT_HEADER.size, 1)
+    assert last is not None, f"{path} is empty"
+    return last
+
+
+def write_snapshot(store: AcceptanceStore, path: str | Path) -> int:
+    """Write all acceptances of a store to a new snapshot file.
+
+    Overwrites an existing snapshot and its deltas.
+    Pins the checkpoint of the last block in the store, for :py:func:`append_snapshot_delta`.
+
+    :return:
+        Last indexed block included in the snapshot
+    """
+    path = Path(path)
+    if path.exists() and path.stat().st_size:
+        store.unpin_checkpoint(_read_last_block(path)[0])
+
+    last_block, last_block_hash = store.get_last_block() or (-1, _NO_BLOCK_HASH)
+    segment = _encode_segment(last_block, last_block_hash, _NO_BLOCK_HASH, store.get_versions(), store.get_acceptances())
+    path.write_bytes(segment)
+    if last_block >= 0:
+        store.pin_checkpoint(last_block)
+    return last_block
+
+
+def append_snapshot_delta(store: AcceptanceStore, path: str | Path) -> int:
+    """Append acceptances indexed after the last snapshot segment.
+
+    The last block of the snapshot must still be a checkpoint of the store with the same block hash.
+    It is pinned when the snapshot or the previous delta is written, so it is only missing
+    if the store has been rewound past it by a chain reorganisation.
+    Write a new snapshot then.
+
+    :return:
+        Number of new acceptances appended
+    """
+    path = Path(path)
+    snapshot_block, snapshot_block_hash = _read_last_block(path)
+    last = store.get_last_block()
+    assert last is not None and last[0] >= snapshot_block, f"Store is behind the snapshot at block {snapshot_block}, write a new snapshot"
+    store_block_hash = dict(store.get_checkpoints()).get(snapshot_block)
+    assert store_block_hash is not None and bytes(store_block_hash) == snapshot_block_hash, f"Store is not on the chain of the snapshot at block {snapshot_block}, write a new snapshot"
+    if last[0] == snapshot_block:
+        return 0
+
+    acceptances = store.get_acceptances(after_block=snapshot_block)
+    with open(path, "ab") as f:
+        f.write(_encode_segment(last[0], last[1], snapshot_block_hash, store.get_versions(), acceptances))
+    store.pin_checkpoint(last[0])
+    store.unpin_checkpoint(snapshot_block)
+    return len(acceptances)
+
+
+class AcceptanceSnapshot:
+    """Read-only acceptance lookups from a memory-mapped snapshot file.
+
+    Mirrors the read functions of :py:class:`terms_of_service.indexer.AcceptanceStore`.
+    """
+
+    def __init__(self, path: str | Path):
+        self.file = open(path, "rb")
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        #: Last indexed block of the newest segment
+        self.last_block = -1
+
+        #: Block hash of `last_block`
+        self.last_block_hash = _NO_BLOCK_HASH
+
+        #: version -> acceptance message hash
+        self.versions: dict[int, bytes] = {}
+
+        #: version -> (addresses offset, signer count, metadata offset) for each segment, absolute offsets
+        self.ranges: dict[int, list[tuple[int, int, int]]] = {}
+
+        position = 0
+        while position < len(self.mmap):
+            magic, length, last_block, last_block_hash, base_block_hash, version_count = _SEGMENT_HEADER.unpack_from(self.mmap, position)
+            assert magic == SNAPSHOT_MAGIC, f"{path} is not a terms of service snapshot"
+            if position:
+                assert base_block_hash == self.last_block_hash, f"{path}: delta at offset {position} is not based on block {self.last_block}"
+            self.last_block, self.last_block_hash = last_block, last_block_hash
+            for i in range(version_count):
+                version, hash, addresses_offset, count, metadata_offset = _VERSION_ENTRY.unpack_from(self.mmap, position + _SEGMENT_HEADER.size + i * _VERSION_ENTRY.size)
+                self.versions[version] = hash
+                if count:
+                    self.ranges.setdefault(version, []).append((position + addresses_offset, count, position + metadata_offset))
+            position += length
+
+        self.hash_versions = {hash: version for version, hash in self.versions.items()}
+
+    def close(self):
+        self.mmap.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _find(self, address: bytes, version: int) -> tuple[int, int, int] | None:
+        """Binary search the signer arrays of a version.
+
+        :return:
+            (index, signer count, metadata offset) in the matching segment or ``None``
+        """
+        mm = self.mmap
+        for addresses_offset, count, metadata_offset in self.ranges.get(version, []):
+            low, high = 0, count
+            while low < high:
+                middle = (low + high) // 2
+                start = addresses_offset + middle * _ADDRESS_SIZE
+                if mm[start:start + _ADDRESS_SIZE] < address:
+                    low = middle + 1
+                else:
+                    high = middle
+            if low < count:
+                start = addresses_offset + low * _ADDRESS_SIZE
+                if mm[start:start + _ADDRESS_SIZE] == address:
+                    return low, count, metadata_offset
+        return None
+
+    def get_latest_version(self) -> int:
+        return max(self.versions, default=0)
+
+    def get_text_hash(self, version: int) -> bytes | None:
+        return self.versions.get(version)
+
+    def has_accepted_version(self, address: str, version: int) -> bool:
+        assert version in self.versions, "No such version"
+        return self._find(_address_to_bytes(address), version) is not None
+
+    def has_accepted_hash(self, address: str, acceptance_message_hash: bytes) -> bool:
+        version = self.hash_versions.get(bytes(acceptance_message_hash))
+        if version is None:
+            return False
+        return self._find(_address_to_bytes(address), version) is not None
+
+    def can_address_proceed(self, address: str) -> bool:
+        version = self.get_latest_version()
+        assert version != 0, "Terms of service not initialised"
+        return self._find(_address_to_bytes(address), version) is not None
+
+    def get_metadata(self, address: str, version: int) -> bytes | None:
+        """Get the metadata the signer passed when accepting a version.
+
+        :return:
+            Metadata or ``None`` if the address has not accepted the version
+        """
+        found = self._find(_address_to_bytes(address), version)
+        if found is None:
+            return None
+        index, count, metadata_offset = found
+        start, end = struct.unpack_from("<QQ", self.mmap, metadata_offset + index * _METADATA_OFFSET.size)
+        blob_offset = metadata_offset + (count + 1) * _METADATA_OFFSET.size
+        return bytes(self.mmap[blob_offset + start:blob_offset + end])
+
+    def get_signer_count(self, version: int) -> int:
+        return sum(count for _, count, _ in self.ranges.get(version, []))
@@ -0,0 +1,83 @@
+"""Shared fixtures for the contract tests.
+
+- `TermsOfService` is deployed once per test session and each test
+  runs against an EVM snapshot that is reverted afterwards,
+  instead of redeploying the contract for every test
+
+- Parallel safe with `pytest-xdist`: each worker process runs its own
+  in-process `ethereum:local` chain, so workers never see each other's
+  deployments, nonces or snapshots
+
+- Providers without snapshot support, e.g. a shared node, get a fresh deployment per test
+
+- `legacy_tos` is the build of the earlier deployments, from `LegacyTermsOfService.json`,
+  for migration tests and gas comparisons against the earlier storage layout
+"""
+
+import json
+
+import pytest
+from ape.contracts import ContractContainer, ContractInstance
+from ape_test import TestAccount
+from ethpm_types import ContractType
+
+from terms_of_service.abi import ABI_PATH
+
+
+@pytest.fixture(scope="session")
+def deployer(accounts) -> TestAccount:
+    return accounts[0]
+
+
+@pytest.fixture(scope="session")
+def random_user(accounts) -> TestAccount:
+    return accounts[1]
+
+
+@pytest.fixture(scope="session")
+def local_network(networks):
+    with networks.parse_network_choice("ethereum:local") as provider:
+        yield provider
+
+
+@pytest.fixture(scope="session")
+def tos_deployment(local_network, project, deployer) -> dict:
+    """Deploy TermsOfService once for the session.
+
+    Session fixtures are set up before Ape's module isolation snapshot,
+    so the deployment survives the module level reverts.
+    """
+    return {"contract": deployer.deploy(project.TermsOfService, sender=deployer)}
+
+
+@pytest.fixture()
+def tos(tos_deployment, local_network, project, deployer, chain) -> ContractInstance:
+    """TermsOfService with no versions published, reverted after the test."""
+    try:
+        snapshot = chain.snapshot()
+    except NotImplementedError:
+        yield deployer.deploy(project.TermsOfService, sender=deployer)
+        return
+
+    # Ape's module isolation reverts past the deployment
+    # if the first test of a module did not use this fixture
+    if not chain.provider.get_code(tos_deployment["contract"].address):
+        tos_deployment["contract"] = deployer.deploy(project.TermsOfService, sender=deployer)
+        snapshot = chain.snapshot()
+
+    yield tos_deployment["contract"]
+
+    chain.restore(snapshot)
+
+
+@pytest.fixture()
+def legacy_tos(local_network, deployer) -> ContractInstance:
+    """TermsOfService as deployed before the acceptance bitmap storage layout."""
+    artifact = json.loads((ABI_PATH / "LegacyTermsOfService.json").read_text())
+    container = ContractContainer(ContractType.model_validate({
+        "contractName": "LegacyTermsOfService",
+        "abi": artifact["abi"],
+        "deploymentBytecode": {"bytecode": artifact["bytecode"]["object"]},
+        "runtimeBytecode": {"bytecode": artifact["deployedBytecode"]["object"]},
+    }))
+    return deployer.deploy(container, sender=deployer)
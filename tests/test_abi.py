@@ -0,0 +1,39 @@
+"""Tests covering ABI and contract object caching."""
+
+import gc
+import weakref
+
+from web3 import EthereumTesterProvider, Web3
+
+from terms_of_service.abi import CONTRACT_CACHE_SIZE, get_abi_by_filename, get_contract
+
+
+def test_abi_cached():
+    abi = get_abi_by_filename("TermsOfService.json")
+    assert any(e.get("name") == "canAddressProceed" for e in abi)
+    assert get_abi_by_filename("TermsOfService.json") is abi
+
+
+def test_contract_cached():
+    web3 = Web3(EthereumTesterProvider())
+    address = "0xbe1418df0bad87577de1a41385f19c6e77312780"
+    contract = get_contract(web3, address)
+    assert contract.address == Web3.to_checksum_address(address)
+    assert get_contract(web3, Web3.to_checksum_address(address)) is contract
+
+    other_web3 = Web3(EthereumTesterProvider())
+    assert get_contract(other_web3, address) is not contract
+
+
+def test_contract_cache_releases_web3():
+    address = "0xbe1418df0bad87577de1a41385f19c6e77312780"
+    web3 = Web3()
+    get_contract(web3, address)
+    ref = weakref.ref(web3)
+    del web3
+
+    # Evicted by newer connections
+    for _ in range(CONTRACT_CACHE_SIZE):
+        get_contract(Web3(), address)
+    gc.collect()
+    assert ref() is None
@@ -0,0 +1,59 @@
+"""Tests covering acceptance message generation and hashing."""
+
+import datetime
+import random
+
+from eth_account import Account
+from eth_account.messages import _hash_eip191_message, encode_defunct, encode_typed_data
+
+from terms_of_service.acceptance_message import (
+    INITIAL_ACCEPTANCE_MESSAGE,
+    TRADING_STRATEGY_ACCEPTANCE_MESSAGE,
+    clear_acceptance_message_cache,
+    generate_acceptance_message,
+    get_acceptance_message_and_hash,
+    get_signing_hash,
+    get_typed_acceptance_data,
+    get_typed_signing_hash,
+    sign_terms_of_service_typed,
+)
+
+
+def test_signing_hash_eip_191():
+    """We produce the same hash as eth_account."""
+    for message in [INITIAL_ACCEPTANCE_MESSAGE, TRADING_STRATEGY_ACCEPTANCE_MESSAGE, "Non-ASCII text: ääkköset €", ""]:
+        assert get_signing_hash(message) == _hash_eip191_message(encode_defunct(text=message))
+
+
+def test_acceptance_message_cache():
+    clear_acceptance_message_cache()
+
+    date = datetime.datetime(2024, 1, 1)
+    link = "http://example.com/terms-of-service"
+    tos_hash = random.randbytes(32)
+
+    message, message_hash = get_acceptance_message_and_hash(1, date, link, tos_hash)
+    assert message == generate_acceptance_message(1, date, link, tos_hash)
+    assert message_hash == get_signing_hash(message)
+
+    assert get_acceptance_message_and_hash(1, date, link, tos_hash) == (message, message_hash)
+    assert get_acceptance_message_and_hash.cache_info().hits == 1
+
+    clear_acceptance_message_cache()
+    assert get_acceptance_message_and_hash.cache_info().currsize == 0
+
+
+def test_typed_signing_hash_eip_712():
+    """We produce the same hash and signature as eth_account."""
+    args = (3, random.randbytes(32), datetime.datetime(2024, 3, 20), "https://tradingstrategy.ai/tos/2024-03-20.txt", 137, "0xbe1418df0bAd87577de1A41385F19c6e77312780")
+    typed_data = get_typed_acceptance_data(*args)
+    assert typed_data["message"]["date"] == 1710892800
+
+    message_hash = get_typed_signing_hash(*args)
+    assert message_hash == _hash_eip191_message(encode_typed_data(full_message=typed_data))
+
+    user = Account.create()
+    assert sign_terms_of_service_typed(user, *args) == (message_hash, user.sign_message(encode_typed_data(full_message=typed_data)).signature)
+
+    # Bound to the chain
+    assert get_typed_signing_hash(*args[0:4], 1, args[5]) != message_hash
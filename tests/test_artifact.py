@@ -0,0 +1,21 @@
+"""Tests covering the build artifact shipped in the Python package."""
+
+import json
+
+from terms_of_service.abi import ABI_PATH
+
+
+def get_signatures(abi: list[dict]) -> set[tuple]:
+    return {(e["type"], e.get("name"), tuple(i["type"] for i in e.get("inputs", []))) for e in abi}
+
+
+def test_artifact_matches_build(project):
+    """The packaged artifact is copied from a build of the current contract, not edited by hand."""
+    artifact = json.loads((ABI_PATH / "TermsOfService.json").read_text())
+    contract_type = project.TermsOfService.contract_type.model_dump(mode="json", by_alias=True)
+
+    assert get_signatures(artifact["abi"]) == get_signatures(contract_type["abi"])
+
+    # The optimizer settings of Foundry and Ape differ, so only check the bytecode is there
+    assert len(artifact["bytecode"]["object"]) > 2
+    assert len(artifact["deployedBytecode"]["object"]) > 2
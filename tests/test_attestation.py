@@ -0,0 +1,54 @@
+"""Tests covering acceptances attested with Merkle roots."""
+
+import random
+
+import pytest
+from ape.contracts import ContractInstance
+from ape.exceptions import ContractLogicError
+from ape_test import TestAccount
+
+from terms_of_service.merkle import AcceptanceMerkleTree
+
+
+def test_attestation_root(
+    tos: ContractInstance,
+    deployer: TestAccount,
+    accounts,
+):
+    hash_1 = random.randbytes(32)
+    tos.updateTermsOfService(1, hash_1, "", sender=deployer)
+    attested, other_version, non_signer = accounts[1:4]
+    other_hash = random.randbytes(32)
+
+    tree = AcceptanceMerkleTree([
+        (attested.address, hash_1),
+        (other_version.address, other_hash),
+        *[(a.address, hash_1) for a in accounts[4:9]],
+    ])
+    proof = tree.get_proof(attested.address, hash_1)
+
+    # Not published yet
+    assert not tos.canAddressProceedWithProof(attested, tree.root, proof)
+
+    tx = tos.addAttestationRoot(tree.root, sender=deployer)
+    assert len(list(tx.decode_logs(tos.AttestationRootAdded))) == 1
+    assert tos.attestationRoots(tree.root)
+
+    assert tos.hasAttestedHash(attested, hash_1, tree.root, proof)
+    assert tos.canAddressProceedWithProof(attested, tree.root, proof)
+    assert not tos.canAddressProceed(attested)
+
+    # Proof of someone else, or of another version
+    assert not tos.canAddressProceedWithProof(non_signer, tree.root, proof)
+    assert not tos.canAddressProceedWithProof(other_version, tree.root, tree.get_proof(other_version.address, other_hash))
+
+    tos.removeAttestationRoot(tree.root, sender=deployer)
+    assert not tos.canAddressProceedWithProof(attested, tree.root, proof)
+
+
+def test_attestation_root_owner_only(
+    tos: ContractInstance,
+    random_user: TestAccount,
+):
+    with pytest.raises(ContractLogicError):
+        tos.addAttestationRoot(random.randbytes(32), sender=random_user)
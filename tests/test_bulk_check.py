@@ -0,0 +1,123 @@
+"""Tests covering checking acceptances of many addresses."""
+
+import datetime
+import random
+
+import pytest
+from ape.contracts import ContractInstance
+from ape_ethereum.multicall.constants import MULTICALL3_CODE
+from ape_test import TestAccount
+from eth_account import Account
+
+from terms_of_service.acceptance_message import generate_acceptance_message, get_signing_hash
+from terms_of_service.bulk_check import check_addresses, check_addresses_batch, unpack_bitmap
+
+
+@pytest.fixture()
+def web3(networks):
+    return networks.provider.web3
+
+
+@pytest.fixture()
+def multicall_address(web3, deployer: TestAccount) -> str:
+    """Deploy the Multicall3 runtime bytecode, the local test chain has no Multicall3."""
+    # Init code returning the runtime bytecode that follows it
+    init_code = b"\x61" + len(MULTICALL3_CODE).to_bytes(2, "big") + bytes.fromhex("80600c6000396000f3")
+    tx_hash = web3.eth.send_transaction({"from": deployer.address, "data": init_code + bytes(MULTICALL3_CODE)})
+    address = web3.eth.wait_for_transaction_receipt(tx_hash)["contractAddress"]
+    assert web3.eth.get_code(address) == MULTICALL3_CODE
+    return address
+
+
+def test_check_addresses(
+    tos: ContractInstance,
+    web3,
+    deployer: TestAccount,
+    accounts,
+):
+    signing_content = generate_acceptance_message(
+        1,
+        datetime.datetime.utcnow(),
+        "http://example.com/terms-of-service",
+        random.randbytes(32),
+    )
+    new_hash = get_signing_hash(signing_content)
+    tos.updateTermsOfService(1, new_hash, signing_content, sender=deployer)
+
+    signer = accounts[1]
+    signature = signer.sign_message(signing_content).encode_rsv()
+    tos.signTermsOfServiceOwn(new_hash, signature, b"", sender=signer)
+
+    addresses = [a.address for a in accounts[1:5]]
+
+    # No Multicall3 on the local test chain, falls back to one call per address
+    result = check_addresses(web3, tos.address, addresses + addresses, chunk_size=2)
+    assert result.accepted == {address: address == signer.address for address in addresses}
+    assert result.calls_per_address == pytest.approx((len(addresses) + 1) / len(addresses))
+
+    result = check_addresses(web3, tos.address, addresses, version=1, multicall_address=None)
+    assert result.accepted[signer.address]
+    assert result.rpc_calls == len(addresses) + 1
+
+
+def test_check_addresses_batch(
+    tos: ContractInstance,
+    web3,
+    deployer: TestAccount,
+    accounts,
+):
+    signing_content = generate_acceptance_message(
+        1,
+        datetime.datetime.utcnow(),
+        "http://example.com/terms-of-service",
+        random.randbytes(32),
+    )
+    new_hash = get_signing_hash(signing_content)
+    tos.updateTermsOfService(1, new_hash, signing_content, sender=deployer)
+
+    signer = accounts[1]
+    signature = signer.sign_message(signing_content).encode_rsv()
+    tos.signTermsOfServiceOwn(new_hash, signature, b"", sender=signer)
+
+    # Spans more than one bitmap word
+    addresses = [Account.create().address for _ in range(300)] + [signer.address]
+    words = tos.canAddressesProceed(addresses)
+    assert len(words) == 2
+    assert unpack_bitmap(words, len(addresses)) == [False] * 300 + [True]
+
+    result = check_addresses_batch(web3, tos.address, addresses + addresses, chunk_size=128)
+    assert result.accepted == {address: address == signer.address for address in addresses}
+    assert result.rpc_calls == 3
+
+    result = check_addresses_batch(web3, tos.address, addresses, version=1)
+    assert result.accepted == check_addresses(web3, tos.address, addresses, version=1).accepted
+    assert result.rpc_calls == 1
+
+
+def test_check_addresses_multicall(
+    legacy_tos: ContractInstance,
+    web3,
+    multicall_address: str,
+    deployer: TestAccount,
+    accounts,
+):
+    """Aggregated calls give the same answers as one call per address."""
+    messages = [f"Terms of service v{version}" for version in (1, 2)]
+    for version, message in enumerate(messages, start=1):
+        legacy_tos.updateTermsOfService(version, get_signing_hash(message), message, sender=deployer)
+        signer = accounts[version]
+        signature = signer.sign_message(message).encode_rsv()
+        legacy_tos.signTermsOfServiceOwn(get_signing_hash(message), signature, b"", sender=signer)
+
+    addresses = [a.address for a in accounts[1:5]] + [Account.create().address for _ in range(5)]
+
+    for version in (None, 1, 2):
+        single = check_addresses(web3, legacy_tos.address, addresses, version=version, multicall_address=None)
+        result = check_addresses(web3, legacy_tos.address, addresses, version=version, chunk_size=4, multicall_address=multicall_address)
+        assert result.accepted == single.accepted
+
+        # Multicall3 code check, version hash lookup and three chunks
+        assert result.rpc_calls == 1 + (version is not None) + 3
+
+    assert single.accepted[accounts[2].address]
+    assert sum(single.accepted.values()) == 1
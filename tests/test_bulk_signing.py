@@ -0,0 +1,39 @@
+"""Tests covering bulk signature generation."""
+
+from eth_account import Account
+from eth_account.messages import encode_defunct
+
+from terms_of_service.acceptance_message import INITIAL_ACCEPTANCE_MESSAGE, get_signing_hash
+from terms_of_service.bulk_signing import generate_private_keys, sign_hash, sign_hashes
+from terms_of_service.signature_verification import recover_signers
+
+
+def test_generate_private_keys_deterministic():
+    keys = generate_private_keys(10, seed=1)
+    assert keys == generate_private_keys(10, seed=1)
+    assert keys[0:5] == generate_private_keys(5, seed=1)
+    assert keys != generate_private_keys(10, seed=2)
+    assert len(set(keys)) == 10
+
+
+def test_sign_hash_matches_eth_account():
+    account = Account.create()
+    signature = sign_hash(account.key, get_signing_hash(INITIAL_ACCEPTANCE_MESSAGE))
+    assert signature == account.sign_message(encode_defunct(text=INITIAL_ACCEPTANCE_MESSAGE)).signature
+
+
+def test_sign_hashes():
+    keys = generate_private_keys(20, seed=1)
+    message_hash = get_signing_hash(INITIAL_ACCEPTANCE_MESSAGE)
+
+    signed = sign_hashes(keys, message_hash)
+    assert [signer for signer, _ in signed] == [Account.from_key(k).address for k in keys]
+    assert recover_signers([(message_hash, signature) for _, signature in signed]) == [signer for signer, _ in signed]
+
+    # Process pool gives the same result in the same order
+    assert sign_hashes(keys, message_hash, max_workers=2, chunk_size=3) == signed
+
+    # Hash per key
+    hashes = [get_signing_hash(f"message {i}") for i in range(20)]
+    signed = sign_hashes(keys, hashes)
+    assert recover_signers([(h, signature) for h, (_, signature) in zip(hashes, signed)]) == [signer for signer, _ in signed]
@@ -0,0 +1,60 @@
+"""Tests covering decoding terms of service events of both layouts."""
+
+import json
+
+from eth_account import Account
+from web3 import EthereumTesterProvider, Web3
+
+from terms_of_service.abi import ABI_PATH, get_contract
+from terms_of_service.acceptance_message import get_signing_hash, sign_terms_of_service
+from terms_of_service.events import EventDecoder, get_signed_logs, get_signed_topics
+
+
+def deploy(web3: Web3):
+    # Earlier deployments emit events without indexed parameters
+    artifact = json.loads((ABI_PATH / "LegacyTermsOfService.json").read_text())
+    Contract = web3.eth.contract(abi=artifact["abi"], bytecode=artifact["bytecode"]["object"])
+    receipt = web3.eth.wait_for_transaction_receipt(Contract.constructor().transact({"from": web3.eth.accounts[0]}))
+    return get_contract(web3, receipt["contractAddress"])
+
+
+def test_decode_legacy_logs():
+    web3 = Web3(EthereumTesterProvider())
+    tos = deploy(web3)
+    deployer = web3.eth.accounts[0]
+    hash_1 = get_signing_hash("v1")
+    tos.functions.updateTermsOfService(1, hash_1, "v1").transact({"from": deployer})
+
+    user = Account.create()
+    message_hash, signature = sign_terms_of_service(user, "v1")
+    tos.functions.signTermsOfServiceBehalf(user.address, message_hash, signature, b"meta").transact({"from": deployer})
+
+    events = get_signed_logs(web3, tos.address)
+    assert len(events) == 1
+    assert events[0]["args"]["signer"] == user.address
+    assert events[0]["args"]["version"] == 1
+    assert events[0]["args"]["hash"] == hash_1
+    assert events[0]["args"]["metadata"] == b"meta"
+
+    # Topic filters do not match the legacy layout, filtered after decoding instead
+    assert get_signed_logs(web3, tos.address, signer=user.address) == events
+    assert get_signed_logs(web3, tos.address, version=1, hash=hash_1) == events
+    assert get_signed_logs(web3, tos.address, signer=Account.create().address) == []
+    assert get_signed_logs(web3, tos.address, version=2) == []
+
+    decoder = EventDecoder(tos)
+    assert decoder.has_legacy_layout(web3, tos.address)
+    logs = web3.eth.get_logs({"address": tos.address, "fromBlock": 0, "topics": [list(decoder.events)]})
+    assert [decoder.decode(log)["event"] for log in logs] == ["UpdateTermsOfService", "Signed"]
+
+
+def test_signed_topics():
+    web3 = Web3(EthereumTesterProvider())
+    decoder = EventDecoder(get_contract(web3, "0xbe1418df0bAd87577de1A41385F19c6e77312780"))
+    user = Account.create()
+    hash_1 = get_signing_hash("v1")
+
+    topics = get_signed_topics(decoder, signer=user.address, version=1, hash=hash_1)
+    assert len(topics) == 4
+    assert get_signed_topics(decoder, signer=user.address) == topics[:2]
+    assert get_signed_topics(decoder, version=1) == [topics[0], None, topics[2]]
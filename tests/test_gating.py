@@ -0,0 +1,133 @@
+"""Tests covering the in-memory acceptance gate."""
+
+import asyncio
+import datetime
+import json
+
+from eth_account import Account
+from web3 import AsyncWeb3
+from web3.providers.eth_tester import AsyncEthereumTesterProvider
+
+from terms_of_service.abi import ABI_PATH
+from terms_of_service.acceptance_message import get_acceptance_message_and_hash, get_signing_hash, sign_terms_of_service
+from terms_of_service.gating import AcceptanceGate
+
+
+async def deploy(web3: AsyncWeb3):
+    # Bytecode of the earlier deployments, the current contract is built with forge and tested with Ape
+    artifact = json.loads((ABI_PATH / "LegacyTermsOfService.json").read_text())
+    Contract = web3.eth.contract(abi=artifact["abi"], bytecode=artifact["bytecode"]["object"])
+    deployer = (await web3.eth.accounts)[0]
+    tx_hash = await Contract.constructor().transact({"from": deployer})
+    receipt = await web3.eth.wait_for_transaction_receipt(tx_hash)
+    return web3.eth.contract(address=receipt["contractAddress"], abi=artifact["abi"]), deployer
+
+
+def test_gate():
+    async def run():
+        web3 = AsyncWeb3(AsyncEthereumTesterProvider())
+        tos, deployer = await deploy(web3)
+        users = [Account.create() for _ in range(3)]
+
+        await tos.functions.updateTermsOfService(1, get_signing_hash("v1"), "v1").transact({"from": deployer})
+        message_hash, signature = sign_terms_of_service(users[0], "v1")
+        await tos.functions.signTermsOfServiceBehalf(users[0].address, message_hash, signature, b"").transact({"from": deployer})
+
+        gate = AcceptanceGate(web3, tos.address, chunk_size=2, poll_interval=0.01)
+        await gate.start()
+        assert gate.state.version == 1
+        assert gate.can_address_proceed(users[0].address)
+        assert not gate.can_address_proceed(users[1].address)
+
+        # Picked up by polling
+        message_hash, signature = sign_terms_of_service(users[1], "v1")
+        await tos.functions.signTermsOfServiceBehalf(users[1].address, message_hash, signature, b"").transact({"from": deployer})
+        await asyncio.sleep(0.1)
+        assert gate.can_address_proceed(users[1].address)
+
+        get_acceptance_message_and_hash(1, datetime.datetime(2024, 1, 1), "https://example.com/tos", b"\x01" * 32)
+        assert get_acceptance_message_and_hash.cache_info().currsize > 0
+
+        # New version resets acceptances and memoized acceptance messages
+        await tos.functions.updateTermsOfService(2, get_signing_hash("v2"), "v2").transact({"from": deployer})
+        message_hash, signature = sign_terms_of_service(users[2], "v2")
+        await tos.functions.signTermsOfServiceBehalf(users[2].address, message_hash, signature, b"").transact({"from": deployer})
+        await gate.sync()
+        assert gate.state.version == 2
+        assert get_acceptance_message_and_hash.cache_info().currsize == 0
+        assert not gate.can_address_proceed(users[0].address)
+        assert gate.can_address_proceed(users[2].address)
+
+        for user in users:
+            assert gate.can_address_proceed(user.address) == await tos.functions.canAddressProceed(user.address).call()
+
+        await gate.stop()
+
+    asyncio.run(run())
+
+
+def test_gate_reorg():
+    async def run():
+        web3 = AsyncWeb3(AsyncEthereumTesterProvider())
+        tester = web3.provider.ethereum_tester
+        tos, deployer = await deploy(web3)
+        users = [Account.create() for _ in range(2)]
+
+        await tos.functions.updateTermsOfService(1, get_signing_hash("v1"), "v1").transact({"from": deployer})
+        gate = AcceptanceGate(web3, tos.address, chunk_size=1)
+        await gate.sync()
+
+        snapshot = tester.take_snapshot()
+        message_hash, signature = sign_terms_of_service(users[0], "v1")
+        await tos.functions.signTermsOfServiceBehalf(users[0].address, message_hash, signature, b"").transact({"from": deployer})
+        await gate.sync()
+        assert gate.can_address_proceed(users[0].address)
+
+        # Replace the signing block with another chain
+        tester.revert_to_snapshot(snapshot)
+        message_hash, signature = sign_terms_of_service(users[1], "v1")
+        await tos.functions.signTermsOfServiceBehalf(users[1].address, message_hash, signature, b"").transact({"from": deployer})
+        tester.mine_blocks(2)
+        await gate.sync()
+        assert not gate.can_address_proceed(users[0].address)
+        assert gate.can_address_proceed(users[1].address)
+
+        # A reorganised version update restores the previous version and its signers
+        snapshot = tester.take_snapshot()
+        await tos.functions.updateTermsOfService(2, get_signing_hash("v2"), "v2").transact({"from": deployer})
+        await gate.sync()
+        assert gate.state.version == 2
+        assert not gate.can_address_proceed(users[1].address)
+
+        tester.revert_to_snapshot(snapshot)
+        tester.mine_blocks(3)
+        await gate.sync()
+        assert gate.state.version == 1
+        assert gate.can_address_proceed(users[1].address)
+
+    asyncio.run(run())
+
+
+def test_gate_confirmations():
+    async def run():
+        web3 = AsyncWeb3(AsyncEthereumTesterProvider())
+        tester = web3.provider.ethereum_tester
+        tos, deployer = await deploy(web3)
+        user = Account.create()
+
+        await tos.functions.updateTermsOfService(1, get_signing_hash("v1"), "v1").transact({"from": deployer})
+        tester.mine_blocks(2)
+        gate = AcceptanceGate(web3, tos.address, confirmations=2)
+        await gate.sync()
+        assert gate.state.version == 1
+
+        message_hash, signature = sign_terms_of_service(user, "v1")
+        await tos.functions.signTermsOfServiceBehalf(user.address, message_hash, signature, b"").transact({"from": deployer})
+        await gate.sync()
+        assert not gate.can_address_proceed(user.address)
+
+        tester.mine_blocks(2)
+        await gate.sync()
+        assert gate.can_address_proceed(user.address)
+
+    asyncio.run(run())
@@ -0,0 +1,32 @@
+"""Guard the cold start cost of importing acceptance message helpers."""
+
+import subprocess
+import sys
+
+#: Modules that must not be loaded when only rendering messages
+HEAVY_MODULES = ("eth_account", "eth_hash", "eth_keys", "web3", "Crypto")
+
+#: Generous upper bound for the cumulative import time, in microseconds
+MAX_IMPORT_TIME_US = 100_000
+
+
+def test_acceptance_message_import_is_light():
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import terms_of_service.acceptance_message"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    # Lines are "import time: self [us] | cumulative | imported package"
+    imported = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        imported[name.strip()] = int(cumulative)
+
+    for name in imported:
+        assert name.split(".")[0] not in HEAVY_MODULES, f"{name} imported at module import time"
+
+    assert imported["terms_of_service.acceptance_message"] < MAX_IMPORT_TIME_US
@@ -0,0 +1,172 @@
+"""Tests covering indexing terms of service events to a local store."""
+
+import datetime
+import random
+
+import pytest
+from ape.contracts import ContractInstance
+from ape_test import TestAccount
+from web3.exceptions import BlockNotFound
+
+from terms_of_service.acceptance_message import generate_acceptance_message, get_signing_hash
+from terms_of_service.events import get_signed_logs
+from terms_of_service.indexer import AcceptanceIndexer, AcceptanceStore
+
+
+@pytest.fixture()
+def web3(networks):
+    return networks.provider.web3
+
+
+@pytest.fixture()
+def signing_content(tos: ContractInstance, deployer: TestAccount) -> str:
+    signing_content = generate_acceptance_message(
+        1,
+        datetime.datetime.utcnow(),
+        "http://example.com/terms-of-service",
+        random.randbytes(32),
+    )
+    tos.updateTermsOfService(1, get_signing_hash(signing_content), signing_content, sender=deployer)
+    return signing_content
+
+
+def sign(tos: ContractInstance, user: TestAccount, signing_content: str):
+    signature = user.sign_message(signing_content).encode_rsv()
+    tos.signTermsOfServiceOwn(get_signing_hash(signing_content), signature, b"XX", sender=user)
+
+
+def test_index_acceptances(
+    tos: ContractInstance,
+    web3,
+    accounts,
+    signing_content: str,
+    tmp_path,
+):
+    sign(tos, accounts[1], signing_content)
+
+    path = tmp_path / "acceptances.sqlite"
+    store = AcceptanceStore(path)
+    indexer = AcceptanceIndexer(web3, tos.address, store, chunk_size=2)
+    assert indexer.sync() == 2
+
+    assert store.get_latest_version() == (1, get_signing_hash(signing_content))
+    assert store.can_address_proceed(accounts[1].address)
+    assert store.has_accepted_version(accounts[1].address, 1)
+    assert not store.can_address_proceed(accounts[2].address)
+
+    # Continue from the persisted cursor after restart
+    store.close()
+    sign(tos, accounts[2], signing_content)
+    store = AcceptanceStore(path)
+    indexer = AcceptanceIndexer(web3, tos.address, store, chunk_size=2)
+    assert indexer.sync() == 1
+    assert store.can_address_proceed(accounts[2].address)
+    assert store.get_signers(1) == sorted([accounts[1].address, accounts[2].address])
+
+
+def test_index_reorg(
+    tos: ContractInstance,
+    web3,
+    chain,
+    accounts,
+    signing_content: str,
+):
+    store = AcceptanceStore()
+    indexer = AcceptanceIndexer(web3, tos.address, store, chunk_size=1)
+    indexer.sync()
+
+    snapshot = chain.snapshot()
+    sign(tos, accounts[1], signing_content)
+    indexer.sync()
+    assert store.can_address_proceed(accounts[1].address)
+
+    # Replace the signing block with another chain
+    chain.restore(snapshot)
+    sign(tos, accounts[2], signing_content)
+    chain.mine(2)
+
+    indexer.sync()
+    assert not store.can_address_proceed(accounts[1].address)
+    assert store.can_address_proceed(accounts[2].address)
+
+
+def test_signed_logs_topic_filter(
+    tos: ContractInstance,
+    web3,
+    accounts,
+    signing_content: str,
+):
+    for user in accounts[1:4]:
+        sign(tos, user, signing_content)
+
+    events = get_signed_logs(web3, tos.address, signer=accounts[2].address)
+    assert [e["args"]["signer"] for e in events] == [accounts[2].address]
+    assert events[0]["args"]["metadata"] == b"XX"
+
+    assert len(get_signed_logs(web3, tos.address, version=1)) == 3
+    assert len(get_signed_logs(web3, tos.address, hash=get_signing_hash(signing_content))) == 3
+    assert get_signed_logs(web3, tos.address, signer=accounts[4].address) == []
+
+
+def test_signed_logs_legacy_layout(
+    legacy_tos: ContractInstance,
+    web3,
+    accounts,
+    deployer: TestAccount,
+):
+    """Earlier deployments have no indexed parameters, so filters are applied after decoding."""
+    signing_content = generate_acceptance_message(
+        1,
+        datetime.datetime.utcnow(),
+        "http://example.com/terms-of-service",
+        random.randbytes(32),
+    )
+    legacy_tos.updateTermsOfService(1, get_signing_hash(signing_content), signing_content, sender=deployer)
+    for user in accounts[1:4]:
+        sign(legacy_tos, user, signing_content)
+
+    events = get_signed_logs(web3, legacy_tos.address, signer=accounts[2].address)
+    assert [e["args"]["signer"] for e in events] == [accounts[2].address]
+    assert events[0]["args"]["metadata"] == b"XX"
+
+    assert len(get_signed_logs(web3, legacy_tos.address, version=1)) == 3
+    assert len(get_signed_logs(web3, legacy_tos.address, hash=get_signing_hash(signing_content))) == 3
+    assert get_signed_logs(web3, legacy_tos.address, signer=accounts[4].address) == []
+
+
+def test_index_unstable_end_block(
+    legacy_tos: ContractInstance,
+    web3,
+    accounts,
+    deployer: TestAccount,
+):
+    """A chunk is read again until its end block hash is the same before and after reading the logs."""
+    signing_content = generate_acceptance_message(
+        1,
+        datetime.datetime.utcnow(),
+        "http://example.com/terms-of-service",
+        random.randbytes(32),
+    )
+    legacy_tos.updateTermsOfService(1, get_signing_hash(signing_content), signing_content, sender=deployer)
+    sign(legacy_tos, accounts[1], signing_content)
+    end_block = web3.eth.block_number
+
+    store = AcceptanceStore()
+    indexer = AcceptanceIndexer(web3, legacy_tos.address, store, max_attempts=3, retry_delay=0)
+    get_block_hash = indexer.get_block_hash
+
+    # Not served by the node yet, then replaced while the logs are read, then stable
+    answers = [None, get_block_hash(end_block), b"\xff" * 32]
+    indexer.get_block_hash = lambda block_number: answers.pop(0) if answers else get_block_hash(block_number)
+    assert indexer.sync(end_block) == 2
+    assert store.get_checkpoints()[0] == (end_block, get_block_hash(end_block))
+    assert store.can_address_proceed(accounts[1].address)
+
+    # Give up when the block never shows up, nothing is stored
+    store = AcceptanceStore()
+    indexer = AcceptanceIndexer(web3, legacy_tos.address, store, max_attempts=3, retry_delay=0)
+    indexer.get_block_hash = lambda block_number: None
+    with pytest.raises(BlockNotFound):
+        indexer.sync(end_block)
+    assert store.get_checkpoints() == []
+    assert store.get_latest_version() is None
@@ -0,0 +1,170 @@
+"""Tests covering the acceptance ingestion service."""
+
+import http.client
+import json
+import time
+import urllib.error
+import urllib.request
+
+from eth_account import Account
+from web3 import EthereumTesterProvider, Web3
+
+from terms_of_service.acceptance_message import INITIAL_ACCEPTANCE_MESSAGE, sign_terms_of_service
+from terms_of_service.ingestion import AcceptanceIngestor, Submission, SubmissionStatus, start_ingestion_server
+
+
+def post(url: str, data: dict) -> tuple[int, dict]:
+    request = urllib.request.Request(url, data=json.dumps(data).encode(), method="POST")
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_ingest_over_http():
+    batches = []
+    users = [Account.create() for _ in range(5)]
+    signed = [sign_terms_of_service(u, INITIAL_ACCEPTANCE_MESSAGE) for u in users]
+    message_hash = signed[0][0]
+    accepted_on_chain = {users[4].address}
+
+    ingestor = AcceptanceIngestor(
+        lambda acceptance_message_hash, batch: batches.append((acceptance_message_hash, batch)),
+        already_accepted=lambda signer, hash: signer in accepted_on_chain,
+        acceptance_message_hash=message_hash,
+        max_batch_size=100,
+        window=0.2,
+    )
+    ingestor.start()
+    server = start_ingestion_server(ingestor)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    try:
+        for user, (_, signature) in zip(users[:3], signed):
+            submission = {"signer": user.address, "hash": "0x" + message_hash.hex(), "signature": "0x" + signature.hex(), "metadata": "0x01"}
+            assert post(f"{url}/acceptances", submission) == (202, {"status": "queued"})
+
+        # Retried by a hanging wallet
+        assert post(f"{url}/acceptances", submission) == (200, {"status": "duplicate"})
+
+        submission = {"signer": users[4].address, "hash": "0x" + message_hash.hex(), "signature": "0x" + signed[4][1].hex()}
+        assert post(f"{url}/acceptances", submission) == (200, {"status": "already_accepted"})
+
+        # Signed by someone else
+        submission = {"signer": users[3].address, "hash": "0x" + message_hash.hex(), "signature": "0x" + signed[0][1].hex()}
+        assert post(f"{url}/acceptances", submission) == (400, {"status": "invalid"})
+
+        status, reply = post(f"{url}/acceptances", {"signer": "0x1234"})
+        assert status == 400
+
+        with urllib.request.urlopen(f"{url}/status") as response:
+            assert json.loads(response.read())["queue_depth"] == 3
+
+        # Flushed after the window
+        deadline = time.monotonic() + 5
+        while not batches and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        server.shutdown()
+        ingestor.stop()
+
+    assert len(batches) == 1
+    acceptance_message_hash, batch = batches[0]
+    assert acceptance_message_hash == message_hash
+    assert [s.signer for s in batch] == [u.address for u in users[:3]]
+    assert batch[0].metadata == b"\x01"
+    assert ingestor.get_status()["queue_depth"] == 0
+
+
+def make_submissions(count: int) -> list[Submission]:
+    submissions = []
+    for user in [Account.create() for _ in range(count)]:
+        message_hash, signature = sign_terms_of_service(user, INITIAL_ACCEPTANCE_MESSAGE)
+        submissions.append(Submission(user.address, message_hash, signature, b""))
+    return submissions
+
+
+def test_flush_on_size_and_failure():
+    submissions = make_submissions(5)
+
+    def flush(acceptance_message_hash, batch):
+        raise RuntimeError("Relayer out of gas")
+
+    # Not started, flushed by hand
+    ingestor = AcceptanceIngestor(flush, max_batch_size=2, window=60, max_attempts=2)
+    for submission in submissions:
+        assert ingestor.submit(submission) == SubmissionStatus.queued
+
+    # The group is over max_batch_size and is split to batches of 2, 2 and 1,
+    # failing batches are bisected down to single submissions and queued again
+    assert ingestor.flush_ready() == 0
+    assert ingestor.failed_batches == 7
+    assert ingestor.queue_depth == 5
+    assert ingestor.submit(submissions[0]) == SubmissionStatus.duplicate
+
+    # Forgotten after max_attempts
+    assert ingestor.flush_ready() == 0
+    assert ingestor.queue_depth == 0
+    assert ingestor.dropped_submissions == 5
+
+    # Failed submissions can be submitted again
+    assert ingestor.submit(submissions[0]) == SubmissionStatus.queued
+    assert ingestor.submit(submissions[0]) == SubmissionStatus.duplicate
+    assert ingestor.queue_depth == 1
+
+
+def test_bisect_failed_batch_and_prune():
+    submissions = make_submissions(4)
+    bad = submissions[2]
+    batches = []
+    accepted_on_chain = set()
+
+    def flush(acceptance_message_hash, batch):
+        if bad in batch:
+            raise RuntimeError("Signature is not valid")
+        batches.append(batch)
+        accepted_on_chain.update(s.signer for s in batch)
+
+    ingestor = AcceptanceIngestor(flush, already_accepted=lambda signer, hash: signer in accepted_on_chain, max_batch_size=4, window=60)
+    for submission in submissions:
+        assert ingestor.submit(submission) == SubmissionStatus.queued
+
+    assert ingestor.flush_ready() == 3
+    assert batches == [submissions[:2], submissions[3:]]
+    assert ingestor.queue_depth == 1
+
+    # Relayed submissions leave the seen-set once indexed on chain
+    assert len(ingestor.seen) == 4
+    assert ingestor.prune_seen() == 3
+    assert ingestor.seen == {(bad.signer, bad.hash)}
+    assert ingestor.submit(submissions[0]) == SubmissionStatus.already_accepted
+
+
+def test_invalid_content_length():
+    ingestor = AcceptanceIngestor(lambda acceptance_message_hash, batch: None)
+    server = start_ingestion_server(ingestor)
+    try:
+        connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1])
+        connection.putrequest("POST", "/acceptances")
+        connection.putheader("Content-Length", "-1")
+        connection.endheaders()
+        response = connection.getresponse()
+        assert response.status == 400
+        assert json.loads(response.read())["error"] == "Invalid Content-Length"
+        connection.close()
+    finally:
+        server.shutdown()
+
+
+def test_eip_1271_lookups_cached():
+    web3 = Web3(EthereumTesterProvider())
+    eoa, other = make_submissions(2)
+    ingestor = AcceptanceIngestor(lambda acceptance_message_hash, batch: None, web3=web3)
+
+    # Signed by someone else, not a smart contract wallet either
+    submission = Submission(eoa.signer, eoa.hash, other.signature, b"")
+    assert ingestor.submit(submission) == SubmissionStatus.invalid
+    assert ingestor.submit(submission) == SubmissionStatus.invalid
+    assert ingestor.eip_1271_cache.misses == 1
+    assert ingestor.eip_1271_cache.hits == 1
@@ -0,0 +1,45 @@
+"""Tests covering acceptance Merkle trees."""
+
+import random
+
+from eth_abi import encode
+from eth_account import Account
+from eth_hash.auto import keccak
+
+from terms_of_service.merkle import AcceptanceMerkleTree, get_leaf, hash_pair, verify_proof
+
+
+def test_leaf_matches_solidity():
+    address = Account.create().address
+    acceptance_message_hash = random.randbytes(32)
+    assert get_leaf(address, acceptance_message_hash) == keccak(keccak(encode(["address", "bytes32"], [address, acceptance_message_hash])))
+
+
+def test_proofs():
+    acceptance_message_hash = random.randbytes(32)
+    addresses = [Account.create().address for _ in range(13)]
+
+    # Generator input, with a duplicate
+    tree = AcceptanceMerkleTree((a, acceptance_message_hash) for a in addresses + addresses[0:1])
+    assert len(tree) == 13
+
+    for address in addresses:
+        proof = tree.get_proof(address, acceptance_message_hash)
+        assert verify_proof(proof, tree.root, get_leaf(address, acceptance_message_hash))
+        assert not verify_proof(proof, tree.root, get_leaf(address, random.randbytes(32)))
+
+    assert tree.get_proof(Account.create().address, acceptance_message_hash) is None
+    assert tree.get_proof(addresses[0], random.randbytes(32)) is None
+
+
+def test_small_trees():
+    acceptance_message_hash = random.randbytes(32)
+    address = Account.create().address
+
+    tree = AcceptanceMerkleTree([(address, acceptance_message_hash)])
+    assert tree.root == get_leaf(address, acceptance_message_hash)
+    assert tree.get_proof(address, acceptance_message_hash) == []
+
+    other = Account.create().address
+    tree = AcceptanceMerkleTree([(address, acceptance_message_hash), (other, acceptance_message_hash)])
+    assert tree.root == hash_pair(get_leaf(address, acceptance_message_hash), get_leaf(other, acceptance_message_hash))
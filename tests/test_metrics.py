@@ -0,0 +1,55 @@
+"""Tests covering optional metrics."""
+
+import urllib.request
+
+import pytest
+from eth_account import Account
+from web3 import EthereumTesterProvider, Web3
+
+from terms_of_service.acceptance_message import INITIAL_ACCEPTANCE_MESSAGE, get_signing_hash, sign_terms_of_service
+from terms_of_service.metrics import HASHED_MESSAGES, REGISTRY, RPC_SECONDS, VERIFIED_SIGNATURES, disable_metrics, enable_metrics, instrument_web3, start_exporter
+from terms_of_service.signature_verification import verify_signatures
+
+
+@pytest.fixture()
+def metrics():
+    REGISTRY.clear()
+    enable_metrics()
+    yield REGISTRY
+    disable_metrics()
+    REGISTRY.clear()
+
+
+def test_disabled_by_default():
+    REGISTRY.clear()
+    get_signing_hash(INITIAL_ACCEPTANCE_MESSAGE)
+    assert HASHED_MESSAGES.get("get_signing_hash") == 0
+
+
+def test_metrics(metrics):
+    for _ in range(3):
+        get_signing_hash(INITIAL_ACCEPTANCE_MESSAGE)
+    assert HASHED_MESSAGES.get("get_signing_hash") == 3
+
+    user = Account.create()
+    message_hash, signature = sign_terms_of_service(user, INITIAL_ACCEPTANCE_MESSAGE)
+    verify_signatures([(user.address, message_hash, signature), (user.address, message_hash, b"")])
+    assert VERIFIED_SIGNATURES.get("valid") == 1
+    assert VERIFIED_SIGNATURES.get("invalid") == 1
+
+    web3 = Web3(EthereumTesterProvider())
+    instrument_web3(web3)
+    assert web3.eth.block_number == 0
+    assert RPC_SECONDS.get_count("eth_blockNumber") == 1
+
+    server = start_exporter()
+    try:
+        host, port = server.server_address
+        text = urllib.request.urlopen(f"http://{host}:{port}/metrics").read().decode()
+    finally:
+        server.shutdown()
+
+    assert 'tos_hashed_messages_total{function="get_signing_hash"} 4.0' in text
+    assert 'tos_rpc_seconds_count{method="eth_blockNumber"} 1' in text
+    assert 'tos_rpc_seconds_bucket{method="eth_blockNumber",le="+Inf"} 1' in text
+    assert 'tos_cache_hits_total{cache="acceptance_message"}' in text
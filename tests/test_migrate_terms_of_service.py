@@ -0,0 +1,99 @@
+"""Tests covering migrating acceptances from an earlier deployment."""
+
+import datetime
+import random
+
+import pytest
+from ape.contracts import ContractInstance
+from ape.exceptions import ContractLogicError
+from ape_test import TestAccount
+
+from terms_of_service.acceptance_message import generate_acceptance_message, get_signing_hash
+
+
+def make_message(version: int) -> str:
+    return generate_acceptance_message(
+        version,
+        datetime.datetime.utcnow(),
+        "http://example.com/terms-of-service",
+        random.randbytes(32),
+    )
+
+
+def test_import_acceptances(
+    legacy_tos: ContractInstance,
+    tos: ContractInstance,
+    deployer: TestAccount,
+    accounts,
+):
+    messages = [make_message(1), make_message(2)]
+    old_signer, new_signer, non_signer = accounts[1:4]
+
+    for version, message in enumerate(messages, start=1):
+        legacy_tos.updateTermsOfService(version, get_signing_hash(message), message, sender=deployer)
+        if version == 1:
+            signature = old_signer.sign_message(message).encode_rsv()
+            legacy_tos.signTermsOfServiceOwn(get_signing_hash(message), signature, b"", sender=old_signer)
+
+    signature = new_signer.sign_message(messages[1]).encode_rsv()
+    legacy_tos.signTermsOfServiceOwn(get_signing_hash(messages[1]), signature, b"", sender=new_signer)
+
+    # Replay versions
+    for version, message in enumerate(messages, start=1):
+        tos.updateTermsOfService(version, get_signing_hash(message), message, sender=deployer)
+
+    tx = tos.importAcceptances(legacy_tos, [old_signer, new_signer, non_signer], sender=deployer)
+    assert len(list(tx.decode_logs(tos.Signed))) == 2
+
+    assert tos.hasAcceptedVersion(old_signer, 1)
+    assert not tos.canAddressProceed(old_signer)
+    assert tos.canAddressProceed(new_signer)
+    assert tos.hasAcceptedHash(new_signer, get_signing_hash(messages[1]))
+    assert not tos.hasAcceptedVersion(non_signer, 1)
+    assert not tos.canAddressProceed(non_signer)
+
+    # Importing twice does not emit duplicates
+    tx = tos.importAcceptances(legacy_tos, [old_signer, new_signer], sender=deployer)
+    assert len(list(tx.decode_logs(tos.Signed))) == 0
+
+
+def test_import_acceptances_version_mismatch(
+    legacy_tos: ContractInstance,
+    tos: ContractInstance,
+    deployer: TestAccount,
+):
+    legacy_tos.updateTermsOfService(1, random.randbytes(32), "", sender=deployer)
+    tos.updateTermsOfService(1, random.randbytes(32), "", sender=deployer)
+
+    with pytest.raises(ContractLogicError):
+        tos.importAcceptances(legacy_tos, [deployer], sender=deployer)
+
+
+def test_import_republished_hash(
+    legacy_tos: ContractInstance,
+    tos: ContractInstance,
+    deployer: TestAccount,
+    accounts,
+):
+    """Legacy history that publishes an earlier hash again can be replayed."""
+    messages = [make_message(1), make_message(2)]
+    hashes = [get_signing_hash(m) for m in messages] + [get_signing_hash(messages[0])]
+    signer = accounts[1]
+
+    legacy_tos.updateTermsOfService(1, hashes[0], messages[0], sender=deployer)
+    signature = signer.sign_message(messages[0]).encode_rsv()
+    legacy_tos.signTermsOfServiceOwn(hashes[0], signature, b"", sender=signer)
+    legacy_tos.updateTermsOfService(2, hashes[1], messages[1], sender=deployer)
+    legacy_tos.updateTermsOfService(3, hashes[2], messages[0], sender=deployer)
+
+    # The legacy contract records acceptances per hash
+    assert legacy_tos.canAddressProceed(signer)
+
+    for version, acceptance_message_hash in enumerate(hashes, start=1):
+        tos.updateTermsOfService(version, acceptance_message_hash, "", sender=deployer)
+
+    tx = tos.importAcceptances(legacy_tos, [signer], sender=deployer)
+    assert [log.version for log in tx.decode_logs(tos.Signed)] == [1, 3]
+    assert tos.hasAcceptedVersion(signer, 1)
+    assert not tos.hasAcceptedVersion(signer, 2)
+    assert tos.canAddressProceed(signer)
@@ -0,0 +1,87 @@
+"""Tests covering the terms of service text registry."""
+
+import hashlib
+import json
+
+from web3 import EthereumTesterProvider, Web3
+
+from terms_of_service import registry
+from terms_of_service.abi import ABI_PATH
+from terms_of_service.deployments import Deployment
+from terms_of_service.registry import TermsOfServiceManifest, hash_file, validate_deployments
+
+
+def test_hash_file(tmp_path, monkeypatch):
+    path = tmp_path / "tos.txt"
+    content = b"Terms of service\n" * 100_000
+    path.write_bytes(content)
+    assert hash_file(path, chunk_size=4096) == hashlib.sha256(content).digest()
+
+    # Memory-mapped
+    monkeypatch.setattr(registry, "MMAP_THRESHOLD", 1024)
+    assert hash_file(path) == hashlib.sha256(content).digest()
+
+
+def test_manifest(tmp_path):
+    path = tmp_path / "2024-01-01.txt"
+    path.write_text("Terms of service")
+
+    manifest = TermsOfServiceManifest(tmp_path / "manifest.sqlite")
+    published = manifest.register_file(1, path, "2024-01-01", "https://example.com/tos/2024-01-01.txt")
+    assert published.file_hash == hashlib.sha256(b"Terms of service").digest()
+    assert "version 1" in published.acceptance_message
+    manifest.close()
+
+    # Persisted
+    manifest = TermsOfServiceManifest(tmp_path / "manifest.sqlite")
+    assert manifest.get_version(1) == published
+    assert manifest.find_by_file_hash(published.file_hash) == published
+    assert manifest.find_by_acceptance_message_hash(published.acceptance_message_hash) == published
+    assert manifest.get_version(2) is None
+
+
+def test_validate_deployments(monkeypatch):
+    web3 = Web3(EthereumTesterProvider())
+    # Bytecode of the earlier deployments, the current contract is built with forge and tested with Ape
+    artifact = json.loads((ABI_PATH / "LegacyTermsOfService.json").read_text())
+    Contract = web3.eth.contract(abi=artifact["abi"], bytecode=artifact["bytecode"]["object"])
+    deployer = web3.eth.accounts[0]
+
+    manifest = TermsOfServiceManifest()
+    deployments = {}
+    for name in ["good", "bad"]:
+        receipt = web3.eth.wait_for_transaction_receipt(Contract.constructor().transact({"from": deployer}))
+        deployments[name] = Deployment(name, web3.eth.chain_id, receipt["contractAddress"], "")
+
+    versions = [manifest.add_version(v, "2024-01-01", "https://example.com", b"\x01" * 32, f"v{v}") for v in [1, 2]]
+    good = web3.eth.contract(address=deployments["good"].address, abi=artifact["abi"])
+    bad = web3.eth.contract(address=deployments["bad"].address, abi=artifact["abi"])
+    for v in versions[:2]:
+        good.functions.updateTermsOfService(v.version, v.acceptance_message_hash, v.acceptance_message).transact({"from": deployer})
+    bad.functions.updateTermsOfService(1, versions[0].acceptance_message_hash, "v1").transact({"from": deployer})
+    bad.functions.updateTermsOfService(2, b"\x02" * 32, "tampered").transact({"from": deployer})
+    bad.functions.updateTermsOfService(3, b"\x03" * 32, "v3").transact({"from": deployer})
+
+    # No Multicall3 on eth-tester, falls back to one call per version
+    good_result, bad_result = validate_deployments(manifest, {"good": web3, "bad": web3}, deployments)
+
+    assert good_result.ok
+    assert good_result.latest_version == 2
+    assert good_result.missing == []
+
+    assert not bad_result.ok
+    assert bad_result.latest_version == 3
+    assert bad_result.mismatched == {2: b"\x02" * 32}
+    assert bad_result.unknown == [3]
+
+    # Versions past the lookahead are read with a second call
+    monkeypatch.setattr(registry, "VERSION_LOOKAHEAD", 0)
+    bad_result, = validate_deployments(manifest, {"bad": web3}, deployments)
+    assert bad_result.unknown == [3]
+    monkeypatch.undo()
+
+    # Published to the manifest but not rolled out yet
+    manifest.add_version(3, "2024-02-01", "https://example.com", b"\x03" * 32, "v3 text")
+    good_result, = validate_deployments(manifest, {"good": web3}, deployments)
+    assert good_result.ok
+    assert good_result.missing == [3]
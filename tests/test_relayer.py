@@ -0,0 +1,153 @@
+"""Tests covering the pipelined transaction relayer."""
+
+import asyncio
+import json
+
+import pytest
+from eth_account import Account
+from web3 import AsyncWeb3
+from web3.providers.eth_tester import AsyncEthereumTesterProvider
+
+from terms_of_service.abi import ABI_PATH
+from terms_of_service.acceptance_message import get_signing_hash, sign_terms_of_service
+from terms_of_service.relayer import TransactionRelayer
+
+
+async def deploy(web3: AsyncWeb3):
+    # Bytecode of the earlier deployments, the current contract is built with forge and tested with Ape
+    artifact = json.loads((ABI_PATH / "LegacyTermsOfService.json").read_text())
+    Contract = web3.eth.contract(abi=artifact["abi"], bytecode=artifact["bytecode"]["object"])
+    deployer = (await web3.eth.accounts)[0]
+    tx_hash = await Contract.constructor().transact({"from": deployer})
+    receipt = await web3.eth.wait_for_transaction_receipt(tx_hash)
+    return web3.eth.contract(address=receipt["contractAddress"], abi=artifact["abi"]), deployer
+
+
+def test_relay_acceptances():
+    async def run():
+        web3 = AsyncWeb3(AsyncEthereumTesterProvider())
+        tos, deployer = await deploy(web3)
+        await tos.functions.updateTermsOfService(1, get_signing_hash("v1"), "v1").transact({"from": deployer})
+
+        # Fund the relayer hot wallet
+        hot_wallet = Account.create()
+        await web3.eth.send_transaction({"from": deployer, "to": hot_wallet.address, "value": 10**18})
+
+        relayer = TransactionRelayer(web3, hot_wallet, max_in_flight=4, poll_interval=0.01)
+        await relayer.start()
+
+        users = [Account.create() for _ in range(10)]
+        pending = []
+        for user in users:
+            message_hash, signature = sign_terms_of_service(user, "v1")
+            pending.append(await relayer.relay_acceptance(tos, user.address, message_hash, signature, b""))
+
+        assert [p.nonce for p in pending] == list(range(10))
+        receipts = await asyncio.gather(*[p.receipt for p in pending])
+        assert all(r["status"] == 1 for r in receipts)
+        await relayer.stop()
+
+        for user in users:
+            assert await tos.functions.canAddressProceed(user.address).call()
+
+        metrics = relayer.metrics.as_dict()
+        assert metrics["submitted"] == 10
+        assert metrics["confirmed"] == 10
+        assert metrics["in_flight"] == 0
+        assert metrics["latency_p50"] is not None
+
+    asyncio.run(run())
+
+
+def test_gas_bump():
+    relayer = TransactionRelayer(AsyncWeb3(AsyncEthereumTesterProvider()), Account.create())
+    assert relayer._bump({"gasPrice": 100})["gasPrice"] == 113
+    bumped = relayer._bump({"maxFeePerGas": 200, "maxPriorityFeePerGas": 10})
+    assert bumped["maxFeePerGas"] == 226
+    assert bumped["maxPriorityFeePerGas"] == 12
+    assert relayer._bump({"gasPrice": 100, "gas": 21_000}) == {"gasPrice": 113, "gas": 21_000}
+
+
+def test_failed_broadcast_releases_nonce():
+    async def run():
+        relayer = TransactionRelayer(AsyncWeb3(AsyncEthereumTesterProvider()), Account.create())
+        relayer.chain_id, relayer.next_nonce = 1, 5
+        broadcasted = []
+
+        async def broadcast(tx: dict) -> bytes:
+            if not broadcasted:
+                broadcasted.append(None)
+                raise ValueError("Connection reset")
+            broadcasted.append(tx["nonce"])
+            return bytes(32)
+
+        relayer._broadcast = broadcast
+        tx = {"to": relayer.address, "gas": 21_000, "gasPrice": 1, "value": 0}
+        with pytest.raises(ValueError):
+            await relayer.submit(tx)
+        assert relayer.released_nonces == [5]
+
+        # The next transactions fill the gap first
+        assert (await relayer.submit(tx)).nonce == 5
+        assert (await relayer.submit(tx)).nonce == 6
+
+    asyncio.run(run())
+
+
+def test_fill_nonce_gap():
+    async def run():
+        relayer = TransactionRelayer(AsyncWeb3(AsyncEthereumTesterProvider()), Account.create(), poll_interval=0.01)
+        await relayer.start()
+        broadcasted = []
+
+        async def broadcast(tx: dict) -> bytes:
+            if tx["nonce"] == 0 and not broadcasted:
+                # Fails after the next transaction has taken nonce 1
+                await asyncio.sleep(0.05)
+                broadcasted.append(None)
+                raise ValueError("Connection reset")
+            broadcasted.append(tx)
+            return tx["nonce"].to_bytes(32, "big")
+
+        relayer._broadcast = broadcast
+        tx = {"to": "0x0000000000000000000000000000000000000001", "gas": 50_000, "gasPrice": 1, "value": 0}
+        results = await asyncio.gather(relayer.submit(tx), relayer.submit(tx), return_exceptions=True)
+        assert isinstance(results[0], ValueError)
+        assert results[1].nonce == 1
+
+        # No further submissions, nonce 1 would wait for nonce 0 forever
+        await asyncio.sleep(0.1)
+        gap_fill = broadcasted[-1]
+        assert gap_fill["nonce"] == 0
+        assert gap_fill["to"] == relayer.address
+        assert gap_fill["value"] == 0
+        assert relayer.released_nonces == []
+        assert relayer.metrics.gaps_filled == 1
+
+        # The test chain never sees these transactions, stop() gives up waiting
+        await relayer.stop(timeout=0.1)
+        assert sorted(relayer.in_flight) == [0, 1]
+        assert not results[1].receipt.cancelled()
+
+    asyncio.run(run())
+
+
+def test_no_gap_fill_at_highest_nonce():
+    async def run():
+        relayer = TransactionRelayer(AsyncWeb3(AsyncEthereumTesterProvider()), Account.create(), poll_interval=0.01)
+        await relayer.start()
+
+        async def broadcast(tx: dict) -> bytes:
+            raise ValueError("Connection reset")
+
+        relayer._broadcast = broadcast
+        with pytest.raises(ValueError):
+            await relayer.submit({"to": relayer.address, "gas": 21_000, "gasPrice": 1, "value": 0})
+
+        # Nothing waits for nonce 0, it is left for the next submission
+        await asyncio.sleep(0.05)
+        assert relayer.released_nonces == [0]
+        assert relayer.metrics.gaps_filled == 0
+        await relayer.stop()
+
+    asyncio.run(run())
@@ -3,7 +3,6 @@
 import datetime
 import random
 
-import pytest
 from ape import reverts
 from ape.contracts import ContractInstance
 from ape_test import TestAccount
@@ -11,22 +10,6 @@ from ape_test import TestAccount
 from terms_of_service.acceptance_message import generate_acceptance_message, get_signing_hash
 
 
-@pytest.fixture(scope="module")
-def deployer(accounts):
-    return accounts[0]
-
-
-@pytest.fixture(scope="module")
-def random_user(accounts):
-    return accounts[1]
-
-
-@pytest.fixture()
-def tos(networks, project, deployer):
-    with networks.parse_network_choice("ethereum:local"):
-        yield deployer.deploy(project.TermsOfService, sender=deployer)
-
-
 def test_not_signed(
     tos: ContractInstance,
     deployer: TestAccount,
@@ -149,3 +132,115 @@ def test_sign_wrong_signature(
 
     with reverts("Signature is not valid"):
         tos.signTermsOfServiceOwn(new_hash, random.randbytes(32), b"", sender=random_user)
+
+
+def test_sign_batch(
+    tos: ContractInstance,
+    deployer: TestAccount,
+    accounts,
+):
+    new_version = 1
+
+    signing_content = generate_acceptance_message(
+        1,
+        datetime.datetime.utcnow(),
+        "http://example.com/terms-of-service",
+        random.randbytes(32),
+    )
+    new_hash = get_signing_hash(signing_content)
+
+    tos.updateTermsOfService(new_version, new_hash, signing_content, sender=deployer)
+
+    signers = accounts[1:4]
+    signatures = [s.sign_message(signing_content).encode_rsv() for s in signers]
+
+    # First signer has already signed and is skipped
+    tos.signTermsOfServiceOwn(new_hash, signatures[0], b"", sender=signers[0])
+
+    tx = tos.signTermsOfServiceBehalfBatch(
+        [s.address for s in signers],
+        new_hash,
+        signatures,
+        [b"1", b"2", b"3"],
+        sender=deployer,
+    )
+
+    logs = list(tx.decode_logs(tos.Signed))
+    assert len(logs) == 2
+    assert logs[0].signer == signers[1].address
+    assert logs[0].version == new_version
+    assert logs[0].hash == new_hash
+    assert logs[0].metadata == b"2"
+    assert logs[1].signer == signers[2].address
+
+    for s in signers:
+        assert tos.canProceed(sender=s)
+
+
+def test_sign_batch_wrong_signature(
+    tos: ContractInstance,
+    deployer: TestAccount,
+    accounts,
+):
+    signing_content = generate_acceptance_message(
+        1,
+        datetime.datetime.utcnow(),
+        "http://example.com/terms-of-service",
+        random.randbytes(32),
+    )
+    new_hash = get_signing_hash(signing_content)
+
+    tos.updateTermsOfService(1, new_hash, signing_content, sender=deployer)
+
+    signers = accounts[1:3]
+    signatures = [signers[0].sign_message(signing_content).encode_rsv(), random.randbytes(65)]
+
+    with reverts("Signature is not valid"):
+        tos.signTermsOfServiceBehalfBatch([s.address for s in signers], new_hash, signatures, [b"", b""], sender=deployer)
+
+    with reverts("Array length mismatch"):
+        tos.signTermsOfServiceBehalfBatch([s.address for s in signers], new_hash, signatures[0:1], [b"", b""], sender=deployer)
+
+    with reverts("Cannot sign older or unknown versions terms of services"):
+        tos.signTermsOfServiceBehalfBatch([s.address for s in signers], random.randbytes(32), signatures, [b"", b""], sender=deployer)
+
+
+def test_sign_batch_gas(
+    tos: ContractInstance,
+    deployer: TestAccount,
+    accounts,
+):
+    """Batch signing must be cheaper per signer than one transaction per signer."""
+    signing_content = generate_acceptance_message(
+        1,
+        datetime.datetime.utcnow(),
+        "http://example.com/terms-of-service",
+        random.randbytes(32),
+    )
+    new_hash = get_signing_hash(signing_content)
+
+    tos.updateTermsOfService(1, new_hash, signing_content, sender=deployer)
+
+    single_signers = accounts[1:5]
+    batch_signers = accounts[5:9]
+
+    single_gas = 0
+    for s in single_signers:
+        signature = s.sign_message(signing_content).encode_rsv()
+        tx = tos.signTermsOfServiceBehalf(s.address, new_hash, signature, b"", sender=deployer)
+        single_gas += tx.gas_used
+
+    tx = tos.signTermsOfServiceBehalfBatch(
+        [s.address for s in batch_signers],
+        new_hash,
+        [s.sign_message(signing_content).encode_rsv() for s in batch_signers],
+        [b""] * len(batch_signers),
+        sender=deployer,
+    )
+    batch_gas = tx.gas_used
+
+    per_signer_single = single_gas / len(single_signers)
+    per_signer_batch = batch_gas / len(batch_signers)
+    assert per_signer_batch < per_signer_single
+    # One 21k transaction overhead shared by the batch, a fresh bitmap slot and the Signed event per signer
+    assert per_signer_batch < 50_000
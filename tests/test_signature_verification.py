@@ -0,0 +1,128 @@
+"""Tests covering off-chain signature pre-verification."""
+
+import random
+
+import pytest
+from eth_account import Account
+from web3 import EthereumTesterProvider, Web3
+
+from terms_of_service.acceptance_message import INITIAL_ACCEPTANCE_MESSAGE, get_signing_hash, sign_terms_of_service
+from terms_of_service.metrics import EIP_1271_CALLS_SAVED, REGISTRY, disable_metrics, enable_metrics
+from terms_of_service.signature_verification import SECP256K1_N, EIP1271VerificationCache, SignatureStatus, recover_signer, recover_signers, verify_signatures
+
+#: Init code deploying a contract whose runtime code is a single STOP
+STOP_CONTRACT_INIT_CODE = "0x6001600c60003960016000f300"
+
+#: Init code deploying an EIP-1271 wallet whose `isValidSignature` always returns the magic value
+ACCEPT_ALL_WALLET_INIT_CODE = "0x6010600c60003960106000f3631626ba7e60e01b60005260206000f3"
+
+
+@pytest.fixture()
+def signers():
+    return [Account.create() for _ in range(4)]
+
+
+def test_recover_signer(signers):
+    user = signers[0]
+    message_hash, signature = sign_terms_of_service(user, INITIAL_ACCEPTANCE_MESSAGE)
+    assert recover_signer(message_hash, signature) == user.address
+
+
+def test_recover_signer_malformed(signers):
+    message_hash, signature = sign_terms_of_service(signers[0], INITIAL_ACCEPTANCE_MESSAGE)
+
+    # Wrong length
+    assert recover_signer(message_hash, signature[0:64]) is None
+
+    # Bad v
+    assert recover_signer(message_hash, signature[0:64] + bytes([1])) is None
+
+    # Malleable high s is rejected by ECDSA.tryRecover
+    s = int.from_bytes(signature[32:64], "big")
+    high_s = (SECP256K1_N - s).to_bytes(32, "big")
+    assert recover_signer(message_hash, signature[0:32] + high_s + signature[64:]) is None
+
+
+def test_recover_signers_process_pool(signers):
+    message_hash = get_signing_hash(INITIAL_ACCEPTANCE_MESSAGE)
+    batch = [sign_terms_of_service(user, INITIAL_ACCEPTANCE_MESSAGE) for user in signers]
+    batch.append((message_hash, random.randbytes(65)))
+
+    expected = [user.address for user in signers]
+    assert recover_signers(batch, max_workers=2, chunk_size=2)[0:4] == expected
+    assert recover_signers(batch)[0:4] == expected
+
+
+def test_verify_signatures(signers):
+    web3 = Web3(EthereumTesterProvider())
+    deployer = web3.eth.accounts[0]
+    tx_hash = web3.eth.send_transaction({"from": deployer, "data": STOP_CONTRACT_INIT_CODE})
+    smart_wallet = web3.eth.wait_for_transaction_receipt(tx_hash).contractAddress
+
+    good_hash, good_signature = sign_terms_of_service(signers[0], INITIAL_ACCEPTANCE_MESSAGE)
+    _, other_signature = sign_terms_of_service(signers[1], INITIAL_ACCEPTANCE_MESSAGE)
+
+    submissions = [
+        (signers[0].address, good_hash, good_signature),
+        (signers[0].address, good_hash, other_signature),
+        (smart_wallet, good_hash, b"\x01" * 96),
+    ]
+
+    assert verify_signatures(submissions, web3=web3) == [
+        SignatureStatus.valid,
+        SignatureStatus.invalid,
+        SignatureStatus.eip_1271,
+    ]
+
+    # Without web3 we cannot tell smart contract signers apart
+    assert verify_signatures(submissions)[2] == SignatureStatus.invalid
+
+
+def test_eip_1271_cache(signers):
+    web3 = Web3(EthereumTesterProvider())
+    deployer = web3.eth.accounts[0]
+    wallets = []
+    for init_code in [STOP_CONTRACT_INIT_CODE, ACCEPT_ALL_WALLET_INIT_CODE]:
+        tx_hash = web3.eth.send_transaction({"from": deployer, "data": init_code})
+        wallets.append(web3.eth.wait_for_transaction_receipt(tx_hash).contractAddress)
+    rejecting_wallet, accepting_wallet = wallets
+
+    message_hash = get_signing_hash(INITIAL_ACCEPTANCE_MESSAGE)
+    signature = b"\x01" * 65
+    cache = EIP1271VerificationCache(max_size=2, max_age_blocks=2)
+
+    enable_metrics()
+    try:
+        REGISTRY.clear()
+        assert cache.verify(web3, accepting_wallet, message_hash, signature)
+        assert cache.verify(web3, accepting_wallet, message_hash, signature)
+        assert cache.hits == 1
+        assert cache.misses == 1
+        assert EIP_1271_CALLS_SAVED.get() == 1
+    finally:
+        disable_metrics()
+
+    # A different signature is a different entry
+    assert cache.get(accepting_wallet, message_hash, b"\x02" * 65, web3.eth.block_number) is None
+
+    # Expires after max_age_blocks
+    block_number = web3.eth.block_number
+    assert cache.get(accepting_wallet, message_hash, signature, block_number + 1) is True
+    assert cache.get(accepting_wallet, message_hash, signature, block_number + 2) is None
+
+    # Least recently used entries are evicted
+    for i in range(3):
+        cache.put(accepting_wallet, message_hash, bytes([i]) * 65, True, block_number)
+    assert len(cache) == 2
+    assert cache.get(accepting_wallet, message_hash, b"\x00" * 65, block_number) is None
+
+    submissions = [
+        (rejecting_wallet, message_hash, signature),
+        (accepting_wallet, message_hash, signature),
+        (signers[0].address, message_hash, signature),
+    ]
+    assert verify_signatures(submissions, web3=web3, eip_1271_cache=cache) == [
+        SignatureStatus.invalid,
+        SignatureStatus.valid,
+        SignatureStatus.invalid,
+    ]
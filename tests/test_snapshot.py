@@ -0,0 +1,121 @@
+"""Tests covering binary acceptance snapshots."""
+
+import pytest
+from eth_account import Account
+
+from terms_of_service.acceptance_message import get_signing_hash
+from terms_of_service.indexer import AcceptanceStore
+from terms_of_service.snapshot import AcceptanceSnapshot, append_snapshot_delta, write_snapshot
+
+
+def test_snapshot_and_delta(tmp_path):
+    path = tmp_path / "acceptances.snapshot"
+    store = AcceptanceStore()
+    users = [Account.create().address for _ in range(20)]
+    hash_1 = get_signing_hash("v1")
+    hash_2 = get_signing_hash("v2")
+
+    store.add_version(1, hash_1, "v1", 1)
+    for i, user in enumerate(users[:10]):
+        store.add_acceptance(user, hash_1, 1, f"meta {i}".encode(), 2)
+    store.add_checkpoint(2, b"\x01" * 32, keep=64)
+    assert write_snapshot(store, path) == 2
+
+    with AcceptanceSnapshot(path) as snapshot:
+        assert snapshot.last_block == 2
+        assert snapshot.get_latest_version() == 1
+        assert snapshot.get_signer_count(1) == 10
+        for i, user in enumerate(users):
+            assert snapshot.can_address_proceed(user) == (i < 10)
+            assert snapshot.can_address_proceed(user.lower()) == (i < 10)
+        assert snapshot.get_metadata(users[3], 1) == b"meta 3"
+        assert snapshot.get_metadata(users[15], 1) is None
+
+    # Nothing new indexed
+    assert append_snapshot_delta(store, path) == 0
+
+    store.add_version(2, hash_2, "v2", 3)
+    store.add_acceptance(users[0], hash_2, 2, b"", 3)
+    store.add_acceptance(users[10], hash_1, 1, b"late", 4)
+    store.add_checkpoint(4, b"\x02" * 32, keep=64)
+    assert append_snapshot_delta(store, path) == 2
+
+    with AcceptanceSnapshot(path) as snapshot:
+        assert snapshot.last_block == 4
+        assert snapshot.get_latest_version() == 2
+        assert snapshot.get_text_hash(2) == hash_2
+        assert snapshot.can_address_proceed(users[0])
+        assert not snapshot.can_address_proceed(users[1])
+        assert snapshot.has_accepted_version(users[10], 1)
+        assert snapshot.has_accepted_hash(users[10], hash_1)
+        assert snapshot.get_metadata(users[10], 1) == b"late"
+        assert snapshot.get_signer_count(1) == 11
+        for user in users:
+            for version in (1, 2):
+                assert snapshot.has_accepted_version(user, version) == store.has_accepted_version(user, version)
+
+    # Compacting gives the same answers from one segment
+    write_snapshot(store, path)
+    with AcceptanceSnapshot(path) as snapshot:
+        assert len(snapshot.ranges[1]) == 1
+        for user in users:
+            assert snapshot.can_address_proceed(user) == store.can_address_proceed(user)
+
+
+def test_delta_after_reorg(tmp_path):
+    path = tmp_path / "acceptances.snapshot"
+    store = AcceptanceStore()
+    users = [Account.create().address for _ in range(2)]
+    hash_1 = get_signing_hash("v1")
+
+    store.add_version(1, hash_1, "v1", 1)
+    store.add_acceptance(users[0], hash_1, 1, b"", 2)
+    store.add_checkpoint(1, b"\x01" * 32, keep=64)
+    store.add_checkpoint(2, b"\x02" * 32, keep=64)
+    write_snapshot(store, path)
+
+    # Block 2 is reorganised away and the store reindexes another chain past it
+    store.rewind(1)
+    store.add_acceptance(users[1], hash_1, 1, b"", 2)
+    store.add_checkpoint(2, b"\x03" * 32, keep=64)
+    store.add_checkpoint(3, b"\x04" * 32, keep=64)
+    with pytest.raises(AssertionError, match="not on the chain of the snapshot"):
+        append_snapshot_delta(store, path)
+
+    # A delta copied from another snapshot file does not match the base either
+    other = tmp_path / "other.snapshot"
+    write_snapshot(store, other)
+    with open(path, "ab") as f:
+        f.write(other.read_bytes())
+    with pytest.raises(AssertionError, match="is not based on block 2"):
+        AcceptanceSnapshot(path)
+
+
+def test_delta_after_pruned_checkpoints(tmp_path):
+    path = tmp_path / "acceptances.snapshot"
+    store = AcceptanceStore()
+    users = [Account.create().address for _ in range(2)]
+    hash_1 = get_signing_hash("v1")
+
+    store.add_version(1, hash_1, "v1", 1)
+    store.add_acceptance(users[0], hash_1, 1, b"", 1)
+    store.add_checkpoint(1, b"\x01" * 32, keep=64)
+    write_snapshot(store, path)
+
+    # An indexer that has caught up writes one checkpoint per block
+    for block_number in range(2, 200):
+        store.add_checkpoint(block_number, block_number.to_bytes(32, "big"), keep=64)
+    store.add_acceptance(users[1], hash_1, 1, b"", 150)
+    assert len(store.get_checkpoints()) == 65
+
+    assert append_snapshot_delta(store, path) == 1
+
+    # The pin moves to the last block of the delta
+    for block_number in range(200, 300):
+        store.add_checkpoint(block_number, block_number.to_bytes(32, "big"), keep=64)
+    assert [b for b, _ in store.get_checkpoints()][-2:] == [236, 199]
+    assert append_snapshot_delta(store, path) == 0
+
+    with AcceptanceSnapshot(path) as snapshot:
+        assert snapshot.last_block == 299
+        assert snapshot.can_address_proceed(users[1])
@@ -1,28 +1,16 @@
 """Tests covering Terms of Service module."""
 
+import datetime
 import random
 
 import pytest
 from ape.contracts import ContractInstance
 from ape.exceptions import ContractLogicError
 from ape_test import TestAccount
+from eth_account.messages import encode_typed_data
 from hexbytes import HexBytes
 
-
-@pytest.fixture(scope="module")
-def deployer(accounts):
-    return accounts[0]
-
-
-@pytest.fixture(scope="module")
-def random_user(accounts):
-    return accounts[1]
-
-
-@pytest.fixture()
-def tos(networks, project, deployer):
-    with networks.parse_network_choice("ethereum:local"):
-        yield deployer.deploy(project.TermsOfService, sender=deployer)
+from terms_of_service.acceptance_message import get_signing_hash, get_typed_acceptance_data, get_typed_signing_hash
 
 
 def test_start_zero_version(tos: ContractInstance):
@@ -98,3 +86,50 @@ def test_transfer_ownership(tos: ContractInstance, deployer: TestAccount, random
 def test_transfer_ownership_only_owner(tos: ContractInstance, deployer: TestAccount, random_user: TestAccount):
     with pytest.raises(ContractLogicError):
         tos.transferOwnership(random_user, sender=random_user)
+
+
+def test_old_hash_reuse(tos: ContractInstance, deployer: TestAccount, random_user: TestAccount):
+    """An earlier hash can be published again, as with the earlier deployments."""
+    message = "Terms of service v1"
+    first_hash = get_signing_hash(message)
+    tos.updateTermsOfService(1, first_hash, message, sender=deployer)
+    signature = random_user.sign_message(message).encode_rsv()
+    tos.signTermsOfServiceBehalf(random_user, first_hash, signature, b"", sender=deployer)
+
+    tos.updateTermsOfService(2, random.randbytes(32), "", sender=deployer)
+    tos.updateTermsOfService(3, first_hash, message, sender=deployer)
+    assert tos.getTextHash(3) == first_hash
+
+    # The acceptance of version 1 is not carried over to version 3
+    assert tos.hasAcceptedHash(random_user, first_hash)
+    assert not tos.canAddressProceed(random_user)
+
+    tos.signTermsOfServiceBehalf(random_user, first_hash, signature, b"", sender=deployer)
+    assert tos.canAddressProceed(random_user)
+
+
+def test_empty_hash(tos: ContractInstance, deployer: TestAccount):
+    with pytest.raises(ContractLogicError):
+        tos.updateTermsOfService(1, b"\x00" * 32, "", sender=deployer)
+
+
+def test_typed_terms_of_service(tos: ContractInstance, deployer: TestAccount, random_user: TestAccount, chain):
+    text_hash = random.randbytes(32)
+    date = datetime.datetime(2024, 3, 20)
+    link = "https://example.com/tos/2024-03-20.txt"
+    typed_data = get_typed_acceptance_data(1, text_hash, date, link, chain.chain_id, tos.address)
+    acceptance_message_hash = get_typed_signing_hash(1, text_hash, date, link, chain.chain_id, tos.address)
+
+    link_hash = HexBytes(typed_data["message"]["linkHash"])
+    assert tos.getTypedAcceptanceHash(1, text_hash, typed_data["message"]["date"], link_hash) == acceptance_message_hash
+
+    tx = tos.updateTermsOfServiceTyped(1, text_hash, typed_data["message"]["date"], link_hash, sender=deployer)
+    logs = list(tx.decode_logs(tos.UpdateTermsOfServiceTyped))
+    assert logs[0].acceptanceMessageHash == acceptance_message_hash
+    assert tos.latestAcceptanceMessageHash() == acceptance_message_hash
+    assert tos.getTextHash(1) == acceptance_message_hash
+
+    # Typed acceptances are signed with the usual function
+    signature = random_user.sign_message(encode_typed_data(full_message=typed_data)).encode_rsv()
+    tos.signTermsOfServiceBehalf(random_user, acceptance_message_hash, signature, b"", sender=deployer)
+    assert tos.canAddressProceed(random_user)